@@ -0,0 +1,208 @@
+# admission.py
+# Controle de admissão da API: limita quantas requisições de cada classe
+# rodam ao mesmo tempo e quantas podem esperar na fila. Num pico, o que não
+# cabe recebe 503 com Retry-After na hora, em vez de se acumular atrás das
+# listagens lentas até tudo estourar o tempo limite.
+#
+# Classes de rota (ver classify):
+#   lookup: leituras pontuais (GET /produtos/{id}, stats)
+#   scan:   listagens e varreduras (GET /produtos/, /categorias/, search,
+#           export, /changes)
+#   write:  POST/PUT/DELETE
+#
+# Cada classe tem um limite de requisições em andamento, um tamanho máximo
+# de fila e um orçamento de espera. Uma requisição é recusada se a fila
+# estiver cheia, se a espera estimada (posição na fila x duração média das
+# requisições da classe / limite) passar do orçamento, ou se ela de fato
+# esperar mais que o orçamento.
+import asyncio
+import collections
+import json
+import math
+import time
+
+import metrics
+
+# classe -> (em andamento, fila, orçamento de espera em ms)
+DEFAULT_LIMITS = {
+    "lookup": (32, 256, 500.0),
+    "scan": (4, 32, 2000.0),
+    "write": (4, 64, 2000.0),
+}
+
+# Rotas que nunca são recusadas: monitoração, documentação e o stream de
+# alterações (uma conexão longa ocuparia uma vaga para sempre).
+EXEMPT_PATHS = ("/metrics", "/docs", "/redoc", "/openapi.json", "/changes/stream")
+
+SCAN_PATHS = ("/produtos/", "/categorias/", "/produtos/search", "/produtos/export", "/changes")
+
+# Peso da última medição na duração média (média móvel exponencial)
+_EWMA_ALPHA = 0.2
+
+
+def classify(method, path):
+    """Classe de uma requisição ('lookup', 'scan', 'write') ou None se for isenta."""
+    if path == "/" or path.startswith(EXEMPT_PATHS):
+        return None
+    if method not in ("GET", "HEAD", "OPTIONS"):
+        return "write"
+    if path in SCAN_PATHS:
+        return "scan"
+    return "lookup"
+
+
+def parse_limits(value):
+    """'16,128,500' (em andamento, fila, orçamento em ms) -> (16, 128, 500.0)."""
+    limit, queue, budget_ms = value.split(",")
+    return int(limit), int(queue), float(budget_ms)
+
+
+class Rejected(Exception):
+    """Requisição recusada; retry_after em segundos."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionClass:
+    """Vagas de uma classe de rota, com fila FIFO limitada."""
+
+    def __init__(self, name, limit, max_queue, budget_ms, registry=metrics.REGISTRY):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.budget = budget_ms / 1000
+        self.in_flight = 0
+        self._waiters = collections.deque() # Futures de quem espera uma vaga
+        self._service_time = None # duração média das requisições (segundos)
+
+        self._in_flight_gauge = registry.gauge(
+            "loja_admission_in_flight", "Requisições em andamento por classe.", ("classe",))
+        self._queue_gauge = registry.gauge(
+            "loja_admission_queue_depth", "Requisições esperando vaga por classe.", ("classe",))
+        self._rejected = registry.counter(
+            "loja_admission_rejected_total", "Requisições recusadas com 503.", ("classe", "motivo"))
+        self._wait = registry.histogram(
+            "loja_admission_wait_seconds", "Espera por uma vaga.", ("classe",))
+        self._in_flight_gauge.set(0, name)
+        self._queue_gauge.set(0, name)
+
+    @property
+    def queue_depth(self):
+        return len(self._waiters)
+
+    def expected_wait(self, position):
+        """Espera estimada de quem entra na posição 'position' da fila (segundos)."""
+        if self._service_time is None:
+            return 0.0
+        return position * self._service_time / self.limit
+
+    def _reject(self, reason, retry_after):
+        self._rejected.inc(self.name, reason)
+        raise Rejected(reason, max(1, math.ceil(retry_after)))
+
+    async def acquire(self):
+        """Espera uma vaga; levanta Rejected se não houver como atender no orçamento."""
+        if self.in_flight < self.limit and not self._waiters:
+            self._admit(0.0)
+            return
+
+        position = len(self._waiters) + 1
+        if position > self.max_queue:
+            self._reject("fila_cheia", self.expected_wait(position))
+        expected = self.expected_wait(position)
+        if expected > self.budget:
+            self._reject("espera_estimada", expected)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._queue_gauge.set(len(self._waiters), self.name)
+        start = time.perf_counter()
+        try:
+            # no tempo limite, wait_for cancela o waiter (release pula os cancelados)
+            await asyncio.wait_for(waiter, self.budget)
+        except asyncio.TimeoutError:
+            if waiter.cancelled():
+                self._reject("tempo_na_fila", self.expected_wait(len(self._waiters)))
+            # a vaga chegou junto com o tempo limite: fica com ela
+        except asyncio.CancelledError:
+            # cliente desconectou; se a vaga já tinha sido passada, devolve
+            if not waiter.cancelled():
+                self.release(None)
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._queue_gauge.set(len(self._waiters), self.name)
+        self._wait.observe(time.perf_counter() - start, self.name)
+
+    def _admit(self, wait):
+        self.in_flight += 1
+        self._in_flight_gauge.set(self.in_flight, self.name)
+        self._wait.observe(wait, self.name)
+
+    def release(self, elapsed):
+        """Libera a vaga (passando-a direto ao primeiro da fila) e registra a duração."""
+        if elapsed is not None:
+            if self._service_time is None:
+                self._service_time = elapsed
+            else:
+                self._service_time += _EWMA_ALPHA * (elapsed - self._service_time)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # a vaga passa adiante sem mudar in_flight
+                waiter.set_result(None)
+                self._queue_gauge.set(len(self._waiters), self.name)
+                return
+        self.in_flight -= 1
+        self._in_flight_gauge.set(self.in_flight, self.name)
+
+
+class AdmissionMiddleware:
+    """Middleware ASGI que aplica o controle de admissão por classe de rota."""
+
+    def __init__(self, app, limits=None, registry=metrics.REGISTRY):
+        """limits: {classe: (em andamento, fila, orçamento em ms)}; padrão DEFAULT_LIMITS."""
+        self.app = app
+        self.classes = {
+            name: AdmissionClass(name, *spec, registry=registry)
+            for name, spec in {**DEFAULT_LIMITS, **(limits or {})}.items()
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        name = classify(scope["method"], scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        admission = self.classes[name]
+        try:
+            await admission.acquire()
+        except Rejected as e:
+            await self._send_503(send, name, e)
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release(time.perf_counter() - start)
+
+    async def _send_503(self, send, name, rejected):
+        body = json.dumps({"detail": f"Servidor ocupado ({name}: {rejected.reason}). Tente novamente."}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(rejected.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,9 +1,24 @@
 # api.py
+import asyncio
+import base64
+import csv
+import io
+import json
+import os
 import sqlite3
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional
+import time
+import zlib
+from fastapi import Body, FastAPI, File, HTTPException, Query, Request, Response, UploadFile
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, StrictBool, StrictFloat, StrictInt, StrictStr
+from typing import List, Literal, Optional, Union
 from db import Database
+import async_db
+from async_db import AsyncDatabase
+import importer
+import metrics
+from admission import AdmissionMiddleware, parse_limits
+from metrics import MetricsMiddleware
 
 # --- Modelos de Dados (Pydantic) ---
 # Usados pelo FastAPI para validação, documentação e resposta.
@@ -17,6 +32,16 @@ class Categoria(CategoriaBase):
     class Config:
         orm_mode = True # Permite mapear de/para objetos do DB (ex: sqlite3.Row)
 
+class CategoriaStats(BaseModel):
+    # Estatísticas de preço de uma categoria (da tabela-resumo)
+    categoria_id: int
+    categoria_nome: str
+    quantidade: int
+    preco_min: Optional[float] = None
+    preco_max: Optional[float] = None
+    preco_medio: Optional[float] = None
+    preco_total: float
+
 class ProdutoBase(BaseModel):
     nome: str
     tamanho: Optional[str] = None
@@ -27,6 +52,10 @@ class ProdutoCreate(ProdutoBase):
     # Modelo para criar um produto (não tem ID ainda)
     pass
 
+class ProdutoUpdate(ProdutoBase):
+    # Modelo para atualizar produtos em lote (o ID vai no corpo)
+    id: int
+
 class Produto(ProdutoBase):
     id: int
     categoria_nome: Optional[str] = None # Incluindo nome da categoria (do JOIN)
@@ -34,6 +63,83 @@ class Produto(ProdutoBase):
     class Config:
         orm_mode = True
 
+class ResultadoLote(BaseModel):
+    # Resultado de um item numa operação em lote
+    index: int
+    id: Optional[int] = None
+    status: str # SUCCESS, INVALID_CATEGORY ou NOT_FOUND
+
+class RegraReajuste(BaseModel):
+    # Filtros (opcionais, combinados) e um ajuste: percentual ou valor
+    categoria_id: Optional[int] = None
+    tamanho: Optional[str] = None
+    nome: Optional[str] = None # padrão do LIKE, ex.: "Camiseta%"
+    preco_min: Optional[float] = None
+    preco_max: Optional[float] = None
+    percentual: Optional[float] = None # ex.: -15 = 15% de desconto
+    valor: Optional[float] = None # somado ao preço
+    terminacao: Optional[float] = None # ex.: 0.90 -> preços terminados em ,90
+
+class Reajuste(BaseModel):
+    regras: List[RegraReajuste]
+    dry_run: bool = False
+
+class FaixaPreco(BaseModel):
+    ate: Optional[float] = None # limite superior (None = sem limite)
+    quantidade: int
+
+class DistribuicaoPrecos(BaseModel):
+    quantidade: int
+    preco_min: Optional[float] = None
+    preco_max: Optional[float] = None
+    preco_medio: Optional[float] = None
+    faixas: List[FaixaPreco]
+
+class ResultadoReajuste(BaseModel):
+    dry_run: bool
+    afetados: int # produtos com o preço alterado (ou que seriam, no dry_run)
+    regras: List[int] # produtos atingidos por cada regra
+    antes: DistribuicaoPrecos
+    depois: DistribuicaoPrecos
+
+class OperacaoLote(BaseModel):
+    # Uma operação de POST /batch; os campos usados dependem de 'op'
+    # (ver BATCH_ARGS) e, exceto tamanho, são obrigatórios: null é
+    # rejeitado com 422. move_products usa categoria_id como origem, então
+    # não dá para mover produtos para "sem categoria" por aqui.
+    op: Literal["add_category", "update_category", "delete_category",
+                "add_product", "update_product", "delete_product", "move_products"]
+    id: Optional[int] = None
+    nome: Optional[str] = None
+    tamanho: Optional[str] = None
+    preco: Optional[float] = None
+    categoria_id: Optional[int] = None
+    para_categoria_id: Optional[int] = None
+
+class ResultadoOperacao(BaseModel):
+    index: int
+    op: str
+    # id criado, True/False, "SUCCESS"/"IN_USE"..., quantidade movida
+    resultado: Union[StrictBool, StrictInt, StrictFloat, StrictStr, None] = None
+
+class ResultadoBatch(BaseModel):
+    status: str # SUCCESS (tudo gravado) ou ROLLED_BACK (nada gravado)
+    index: Optional[int] = None # operação que falhou
+    resultados: List[ResultadoOperacao]
+
+class Alteracao(BaseModel):
+    # Uma entrada do registro de alterações, com o estado atual do registro
+    versao: int
+    tabela: str # produtos ou categorias
+    id: int
+    operacao: str # INSERT, UPDATE ou DELETE
+    dados: Optional[dict] = None # None se o registro já foi excluído
+
+class Alteracoes(BaseModel):
+    versao: int # passar como ?since= na próxima chamada
+    alteracoes: List[Alteracao]
+    mais: bool # True se ainda há alterações depois desta página
+
 # --- Inicialização ---
 app = FastAPI(
     title="API Loja de Roupas", 
@@ -41,35 +147,154 @@ app = FastAPI(
 )
 
 # Instancia o banco de dados
-db = Database("loja.db") # Conecta ao mesmo banco de dados!
+# As rotas usam a camada assíncrona (adb), que roda o SQLite num executor
+# próprio. Tamanho do executor e da fila configuráveis por variável de
+# ambiente, ex.: LOJA_DB_WORKERS=16 LOJA_DB_QUEUE=256 uvicorn api:app
+# LOJA_DB_FILE troca o arquivo do banco (usado pelos benchmarks).
+DB_FILE = os.environ.get("LOJA_DB_FILE", "loja.db")
+DB_WORKERS = int(os.environ.get("LOJA_DB_WORKERS", async_db.DEFAULT_WORKERS))
+DB_QUEUE = int(os.environ.get("LOJA_DB_QUEUE", async_db.DEFAULT_QUEUE_DEPTH))
+
+# LOJA_SNAPSHOT=1 responde as listagens de produtos por uma cópia do
+# catálogo em memória (ver snapshot.py).
+DB_SNAPSHOT = os.environ.get("LOJA_SNAPSHOT", "0") == "1"
+# LOJA_GROUP_COMMIT=1 passa todas as escritas por um escritor único que as
+# agrupa em transações (ver writer.py); LOJA_GROUP_COMMIT_WINDOW_MS é quanto
+# ele espera por mais escritas antes de cada commit.
+DB_GROUP_COMMIT = os.environ.get("LOJA_GROUP_COMMIT", "0") == "1"
+DB_GROUP_COMMIT_WINDOW_MS = float(os.environ.get("LOJA_GROUP_COMMIT_WINDOW_MS", "0"))
+# LOJA_REPLICA=1 lê listagens, busca e estatísticas de uma réplica em memória
+# (ver replica.py), no máximo LOJA_REPLICA_MAX_LAG_MS atrás do arquivo.
+DB_REPLICA = os.environ.get("LOJA_REPLICA", "0") == "1"
+DB_REPLICA_MAX_LAG_MS = float(os.environ.get("LOJA_REPLICA_MAX_LAG_MS", "1000"))
+
+db = Database(
+    DB_FILE,
+    pool_size=DB_WORKERS,
+    snapshot=DB_SNAPSHOT,
+    group_commit=DB_GROUP_COMMIT,
+    group_commit_window_ms=DB_GROUP_COMMIT_WINDOW_MS,
+    replica=DB_REPLICA,
+    replica_max_lag_ms=DB_REPLICA_MAX_LAG_MS,
+) # Conecta ao mesmo banco de dados!
+adb = AsyncDatabase(db, max_workers=DB_WORKERS, max_queue=DB_QUEUE)
+
+# Controle de admissão (ver admission.py): limita as requisições em
+# andamento e na fila por classe de rota e responde 503 com Retry-After ao
+# que não cabe. LOJA_ADMISSION=0 desliga; LOJA_ADMISSION_LOOKUP,
+# LOJA_ADMISSION_SCAN e LOJA_ADMISSION_WRITE trocam os limites de cada
+# classe, no formato "em_andamento,fila,orcamento_ms" (ex.: "4,32,2000").
+# Em andamento e fila de cada classe aparecem em GET /metrics.
+if os.environ.get("LOJA_ADMISSION", "1") != "0":
+    app.add_middleware(AdmissionMiddleware, limits={
+        classe: parse_limits(os.environ[f"LOJA_ADMISSION_{classe.upper()}"])
+        for classe in ("lookup", "scan", "write")
+        if os.environ.get(f"LOJA_ADMISSION_{classe.upper()}")
+    })
+
+# Mede a latência de cada rota (exposta em GET /metrics). Adicionado por
+# último, fica por fora da admissão e conta também as respostas 503.
+app.add_middleware(MetricsMiddleware)
+
+@app.on_event("shutdown")
+def shutdown_db():
+    adb.shutdown()
+
+# --- Serialização das Listas ---
+# Caminho rápido (padrão): as linhas do banco vão direto para JSON, com um
+# encoder pré-configurado, sem criar um objeto Pydantic por linha nem
+# revalidar a resposta. A saída é a mesma do caminho Pydantic (mesmos
+# campos, na mesma ordem) e o response_model continua documentando a rota
+# no OpenAPI. LOJA_FAST_JSON=0 volta para o caminho Pydantic.
+FAST_JSON = os.environ.get("LOJA_FAST_JSON", "1") != "0"
+
+# Mesmas opções do JSONResponse do Starlette
+_encode_json = json.JSONEncoder(
+    ensure_ascii=False, separators=(",", ":"), allow_nan=False, check_circular=False
+).encode
+
+def _model_fields(model):
+    """Nomes dos campos de um modelo Pydantic, na ordem de serialização."""
+    return tuple(getattr(model, "model_fields", None) or model.__fields__)
+
+_LIST_FIELDS = {Categoria: _model_fields(Categoria), Produto: _model_fields(Produto)}
+
+def rows_to_json(rows, model):
+    """Serializa linhas do banco (sqlite3.Row) como uma lista JSON de 'model'."""
+    if not rows:
+        return b"[]"
+    fields = _LIST_FIELDS[model]
+    # posição de cada campo na linha (acesso por índice é mais rápido que por nome)
+    columns = rows[0].keys()
+    indexes = [columns.index(f) for f in fields]
+    return _encode_json([
+        dict(zip(fields, [row[i] for i in indexes])) for row in rows
+    ]).encode("utf-8")
+
+def _list_response(rows, model, response: Response):
+    """Resposta de uma rota de lista, pelo caminho rápido ou pelo Pydantic."""
+    if not FAST_JSON:
+        return [model(**row) for row in rows]
+    # retornando um Response, os cabeçalhos de 'response' precisam ser copiados
+    headers = {k: v for k, v in response.headers.items() if k not in ("content-length", "content-type")}
+    return Response(content=rows_to_json(rows, model), media_type="application/json", headers=headers)
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Verifica se o If-None-Match do cliente contém o ETag atual."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags
 
 # --- Rotas da API ---
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Bem-vindo à API da Loja de Roupas. Acesse /docs para a documentação."}
 
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    """Métricas do processo no formato do Prometheus."""
+    return PlainTextResponse(metrics.REGISTRY.expose(), media_type=metrics.CONTENT_TYPE)
+
 # --- Rotas de Categorias (CRUD Completo) ---
 
 @app.post("/categorias/", response_model=Categoria, status_code=201)
-def create_category(categoria: CategoriaBase):
+async def create_category(categoria: CategoriaBase):
     """Cria uma nova categoria."""
-    cat_id = db.add_category(categoria.nome)
+    cat_id = await adb.add_category(categoria.nome)
     if cat_id is None:
         raise HTTPException(status_code=400, detail="Categoria já existe ou erro ao criar.")
     return Categoria(id=cat_id, nome=categoria.nome)
 
 @app.get("/categorias/", response_model=List[Categoria])
-def read_categories():
-    """Lista todas as categorias."""
-    categories_db = db.get_categories()
-    # Converte o resultado (sqlite3.Row) para o modelo Pydantic
-    return [Categoria.from_orm(cat) for cat in categories_db]
+async def read_categories(request: Request, response: Response):
+    """Lista todas as categorias (com ETag; responde 304 se não mudou)."""
+    categories_db, etag = await adb.get_categories(with_etag=True)
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return _list_response(categories_db, Categoria, response)
+
+@app.get("/categorias/stats", response_model=List[CategoriaStats])
+async def read_categories_stats():
+    """Quantidade de produtos e preço mínimo/máximo/médio/total por categoria."""
+    stats = await adb.get_category_stats()
+    return [CategoriaStats(**s) for s in stats]
+
+@app.get("/categorias/{categoria_id}/stats", response_model=CategoriaStats)
+async def read_category_stats(categoria_id: int):
+    """Estatísticas de preço de uma categoria."""
+    stats = await adb.get_category_stats(categoria_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail=f"Categoria com ID {categoria_id} não encontrada.")
+    return CategoriaStats(**stats)
 
 @app.put("/categorias/{categoria_id}", response_model=Categoria)
-def update_category(categoria_id: int, categoria: CategoriaBase):
+async def update_category(categoria_id: int, categoria: CategoriaBase):
     """Atualiza o nome de uma categoria."""
-    result = db.update_category(categoria_id, categoria.nome)
+    result = await adb.update_category(categoria_id, categoria.nome)
     
     if result == "UNIQUE_VIOLATION":
         raise HTTPException(status_code=400, detail=f"O nome '{categoria.nome}' já está em uso.")
@@ -79,9 +304,9 @@ def update_category(categoria_id: int, categoria: CategoriaBase):
     return Categoria(id=categoria_id, nome=categoria.nome)
 
 @app.delete("/categorias/{categoria_id}", response_model=dict)
-def delete_category(categoria_id: int):
+async def delete_category(categoria_id: int):
     """Exclui uma categoria (se não estiver em uso)."""
-    result = db.delete_category(categoria_id)
+    result = await adb.delete_category(categoria_id)
     
     if result == "IN_USE":
         raise HTTPException(status_code=400, detail="Categoria está em uso por produtos. Não pode ser excluída.")
@@ -95,24 +320,23 @@ def delete_category(categoria_id: int):
 
 # --- Rotas de Produtos (CRUD Completo) ---
 
-def _get_produto_or_404(produto_id: int):
+async def _get_produto_or_404(produto_id: int):
     """Função helper para buscar um produto pelo ID e formatá-lo."""
-    # (Ineficiente, mas simples para este projeto)
-    produtos = db.get_products() 
-    produto_db = next((p for p in produtos if p['id'] == produto_id), None)
+    # Busca pela chave primária (índice), sem carregar a lista inteira
+    produto_db = await adb.get_product_by_id(produto_id)
     
     if produto_db is None:
         return None
     
     # Converte sqlite3.Row para um objeto Pydantic
-    return Produto.from_orm(produto_db)
+    return Produto(**produto_db)
 
 
 @app.post("/produtos/", response_model=Produto, status_code=201)
-def create_product(produto: ProdutoCreate):
+async def create_product(produto: ProdutoCreate):
     """Cria um novo produto."""
     try:
-        produto_id = db.add_product(
+        produto_id = await adb.add_product(
             produto.nome,
             produto.tamanho,
             produto.preco,
@@ -122,25 +346,220 @@ def create_product(produto: ProdutoCreate):
             raise HTTPException(status_code=400, detail="Erro ao criar produto (verifique se a categoria_id existe).")
         
         # Para a resposta, buscamos o produto recém-criado para ter todos os dados
-        novo_produto = _get_produto_or_404(produto_id)
+        novo_produto = await _get_produto_or_404(produto_id)
         if novo_produto:
              return novo_produto
         else:
              raise HTTPException(status_code=404, detail="Produto criado mas não encontrado.")
              
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro interno: {e}")
 
+def _encode_cursor(nome: str, produto_id: int) -> str:
+    """Cursor opaco de paginação: (nome, id) do último item da página."""
+    raw = json.dumps([nome, produto_id], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def _decode_cursor(cursor: str):
+    try:
+        nome, produto_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(nome), int(produto_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido.")
+
 @app.get("/produtos/", response_model=List[Produto])
-def read_products():
-    """Lista todos os produtos (com detalhes da categoria)."""
-    products_db = db.get_products()
-    return [Produto.from_orm(p) for p in products_db]
+async def read_products(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    categoria_id: Optional[int] = None,
+    tamanho: Optional[str] = None,
+    preco_min: Optional[float] = None,
+    preco_max: Optional[float] = None,
+):
+    """
+    Lista os produtos (com detalhes da categoria), ordenados por nome.
+    Paginado por cursor: se houver mais itens, o cabeçalho X-Next-Cursor
+    traz o valor a ser passado em ?cursor= para buscar a próxima página.
+    Cada página tem ETag; com If-None-Match igual, responde 304.
+    """
+    after = _decode_cursor(cursor) if cursor else None
+    products_db, etag = await adb.get_products(
+        after=after,
+        limit=limit + 1, # um a mais para saber se existe próxima página
+        categoria_id=categoria_id,
+        tamanho=tamanho,
+        preco_min=preco_min,
+        preco_max=preco_max,
+        with_etag=True,
+    )
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    if len(products_db) > limit:
+        products_db = products_db[:limit]
+        last = products_db[-1]
+        response.headers["X-Next-Cursor"] = _encode_cursor(last['nome'], last['id'])
+    return _list_response(products_db, Produto, response)
+
+@app.get("/produtos/search", response_model=List[Produto])
+async def search_products(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """Busca produtos pelo nome ou categoria (por prefixo, ignorando acentos)."""
+    products_db = await adb.search_products(q, limit)
+    return _list_response(products_db, Produto, response)
+
+# --- Exportação do Catálogo ---
+# Os produtos saem do cursor em blocos direto para a resposta, sem montar
+# a lista inteira nem objetos Pydantic: a memória não cresce com o catálogo.
+
+EXPORT_COLUMNS = ["id", "nome", "tamanho", "preco", "categoria_id", "categoria_nome"]
+EXPORT_CHUNK_SIZE = 1000
+
+async def _export_ndjson(chunks):
+    async for rows in chunks:
+        yield "".join(
+            json.dumps({col: row[col] for col in EXPORT_COLUMNS}, ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode("utf-8")
+
+async def _export_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in chunks:
+        writer.writerows([row[col] for col in EXPORT_COLUMNS] for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    # cabeçalho de um catálogo vazio
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+async def _gzip_stream(blocks):
+    compressor = zlib.compressobj(wbits=31) # 31 = formato gzip
+    async for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+@app.get("/produtos/export")
+async def export_products(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+    categoria_id: Optional[int] = None,
+    tamanho: Optional[str] = None,
+    preco_min: Optional[float] = None,
+    preco_max: Optional[float] = None,
+):
+    """Exporta o catálogo (NDJSON ou CSV) em streaming, opcionalmente com gzip."""
+    chunks = adb.iter_products(
+        chunk_size=EXPORT_CHUNK_SIZE,
+        categoria_id=categoria_id,
+        tamanho=tamanho,
+        preco_min=preco_min,
+        preco_max=preco_max,
+    )
+    if format == "csv":
+        body, media_type, ext = _export_csv(chunks), "text/csv; charset=utf-8", "csv"
+    else:
+        body, media_type, ext = _export_ndjson(chunks), "application/x-ndjson", "ndjson"
+
+    headers = {"Content-Disposition": f'attachment; filename="produtos.{ext}"'}
+    if gzip:
+        body = _gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+# --- Importação de Catálogo ---
+
+@app.post("/produtos/import", response_model=dict)
+async def import_products(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = None,
+    chunk_size: int = Query(importer.DEFAULT_CHUNK_SIZE, ge=1, le=100000),
+):
+    """
+    Importa um catálogo (CSV ou NDJSON) enviado como upload.
+    O formato vem de ?format= ou da extensão do arquivo. Retorna o relatório.
+    """
+    return await adb.run(
+        importer.import_file,
+        db,
+        file.file,
+        format or importer.detect_format(file.filename),
+        chunk_size=chunk_size,
+    )
+
+# --- Rotas de Produtos em Lote ---
+# Declaradas antes de /produtos/{produto_id} para "bulk" não ser lido como ID.
+# Cada lote roda numa única transação; a resposta traz o status de cada item.
+
+@app.post("/produtos/bulk", response_model=List[ResultadoLote])
+async def create_products_bulk(produtos: List[ProdutoCreate]):
+    """Cria vários produtos de uma vez."""
+    results = await adb.add_products([
+        (p.nome, p.tamanho, p.preco, p.categoria_id) for p in produtos
+    ])
+    if results is None:
+        raise HTTPException(status_code=500, detail="Erro interno ao criar produtos em lote.")
+    return results
+
+@app.put("/produtos/bulk", response_model=List[ResultadoLote])
+async def update_products_bulk(produtos: List[ProdutoUpdate]):
+    """Atualiza vários produtos de uma vez."""
+    results = await adb.update_products([
+        (p.id, p.nome, p.tamanho, p.preco, p.categoria_id) for p in produtos
+    ])
+    if results is None:
+        raise HTTPException(status_code=500, detail="Erro interno ao atualizar produtos em lote.")
+    return results
+
+@app.delete("/produtos/bulk", response_model=List[ResultadoLote])
+async def delete_products_bulk(ids: List[int] = Body(...)):
+    """Exclui vários produtos de uma vez (corpo: lista de IDs)."""
+    results = await adb.delete_products(ids)
+    if results is None:
+        raise HTTPException(status_code=500, detail="Erro interno ao excluir produtos em lote.")
+    return results
+
+# --- Reajuste de Preços ---
+# Cada regra vira um único UPDATE no banco (sem buscar produto por produto);
+# todas as regras rodam numa transação. dry_run=true mostra o efeito sem gravar.
+
+@app.post("/produtos/reprice", response_model=ResultadoReajuste)
+async def reprice_products(reajuste: Reajuste):
+    """Reajusta preços por categoria, tamanho, nome ou faixa de preço."""
+    if not reajuste.regras:
+        raise HTTPException(status_code=422, detail="Informe ao menos uma regra.")
+    try:
+        result = await adb.reprice_products(
+            [r.dict(exclude_none=True) for r in reajuste.regras], reajuste.dry_run)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=500, detail="Erro interno ao reajustar preços.")
+    return result
+
+@app.get("/produtos/{produto_id}", response_model=Produto)
+async def read_product(produto_id: int):
+    """Busca um único produto pelo ID."""
+    produto = await _get_produto_or_404(produto_id)
+    if produto is None:
+        raise HTTPException(status_code=404, detail=f"Produto com ID {produto_id} não encontrado.")
+    return produto
 
 @app.put("/produtos/{produto_id}", response_model=Produto)
-def update_product(produto_id: int, produto: ProdutoCreate):
+async def update_product(produto_id: int, produto: ProdutoCreate):
     """Atualiza um produto existente."""
-    success = db.update_product(
+    success = await adb.update_product(
         produto_id,
         produto.nome,
         produto.tamanho,
@@ -151,20 +570,131 @@ def update_product(produto_id: int, produto: ProdutoCreate):
         raise HTTPException(status_code=404, detail=f"Produto com ID {produto_id} não encontrado ou erro ao atualizar.")
 
     # Busca o produto atualizado para retornar
-    produto_atualizado = _get_produto_or_404(produto_id)
+    produto_atualizado = await _get_produto_or_404(produto_id)
     if produto_atualizado:
          return produto_atualizado
     else:
          raise HTTPException(status_code=404, detail="Produto atualizado mas não encontrado.")
 
 @app.delete("/produtos/{produto_id}", response_model=dict)
-def delete_product(produto_id: int):
+async def delete_product(produto_id: int):
     """Exclui um produto."""
-    success = db.delete_product(produto_id)
+    success = await adb.delete_product(produto_id)
     if not success:
         raise HTTPException(status_code=404, detail=f"Produto com ID {produto_id} não encontrado.")
     
     return {"message": f"Produto ID {produto_id} excluído com sucesso."}
 
+# --- Lote Atômico de Operações ---
+# Várias operações de categorias e produtos, em ordem, numa só transação:
+# ou todas são gravadas ou nenhuma. Ex.: renomear uma categoria, mover os
+# produtos de outra para ela e excluir a outra, num único request.
+
+# campos de OperacaoLote passados ao Database, na ordem, para cada operação
+BATCH_ARGS = {
+    "add_category": ("nome",),
+    "update_category": ("id", "nome"),
+    "delete_category": ("id",),
+    "add_product": ("nome", "tamanho", "preco", "categoria_id"),
+    "update_product": ("id", "nome", "tamanho", "preco", "categoria_id"),
+    "delete_product": ("id",),
+    "move_products": ("categoria_id", "para_categoria_id"),
+}
+
+@app.post("/batch", response_model=ResultadoBatch)
+async def run_batch(operacoes: List[OperacaoLote] = Body(..., max_length=1000)):
+    """
+    Executa as operações em ordem, atomicamente. Se uma falhar (ex.: produto
+    inexistente, categoria em uso, nome repetido), nada é gravado e a
+    resposta é 409 com o índice da operação que falhou.
+    """
+    operations = []
+    for i, operacao in enumerate(operacoes):
+        campos = BATCH_ARGS[operacao.op]
+        faltando = [c for c in campos if c != "tamanho" and getattr(operacao, c) is None]
+        if faltando:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Operação {i} ({operacao.op}): campos obrigatórios ausentes: {', '.join(faltando)}.",
+            )
+        operations.append((operacao.op, [getattr(operacao, c) for c in campos]))
+
+    result = await adb.run_batch(operations)
+    if result is None:
+        raise HTTPException(status_code=500, detail="Erro interno ao executar o lote.")
+
+    resposta = {
+        "status": result["status"],
+        "index": result.get("index"),
+        "resultados": [
+            {"index": i, "op": operations[i][0], "resultado": r}
+            for i, r in enumerate(result["resultados"])
+        ],
+    }
+    if result["status"] != "SUCCESS":
+        raise HTTPException(status_code=409, detail=resposta)
+    return resposta
+
+# --- Alterações (sincronização incremental) ---
+# O cliente carrega as listas uma vez, guarda a versão de GET /changes e
+# depois busca só o que mudou desde ela: tráfego O(alterações), não
+# O(catálogo). Se a versão for antiga demais (registro podado), responde 410
+# e o cliente recarrega as listas.
+
+CHANGES_POLL_SECONDS = float(os.environ.get("LOJA_CHANGES_POLL", "0.5"))
+CHANGES_KEEPALIVE_SECONDS = 15.0
+CHANGES_PAGE_SIZE = 1000
+
+@app.get("/changes", response_model=Alteracoes)
+async def read_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(CHANGES_PAGE_SIZE, ge=1, le=10000),
+):
+    """Alterações em produtos e categorias com versão maior que ?since=."""
+    result = await adb.get_changes(since, limit)
+    if result == "EXPIRED":
+        raise HTTPException(status_code=410, detail=f"Versão {since} não está mais no registro de alterações.")
+    if result is None:
+        raise HTTPException(status_code=500, detail="Erro ao buscar alterações.")
+    return result
+
+async def _change_events(since):
+    """Eventos SSE: uma mensagem por alteração, conforme os commits aparecem."""
+    last_sent = time.monotonic()
+    while True:
+        result = await adb.get_changes(since, CHANGES_PAGE_SIZE)
+        if result == "EXPIRED":
+            yield f"event: expired\ndata: {_encode_json({'versao': since})}\n\n"
+            return
+        if result:
+            for alteracao in result["alteracoes"]:
+                # id = versão: o navegador reenvia no Last-Event-ID ao reconectar
+                yield f"id: {alteracao['versao']}\nevent: alteracao\ndata: {_encode_json(alteracao)}\n\n"
+                last_sent = time.monotonic()
+            since = result["versao"]
+            if result["mais"]:
+                continue
+        if time.monotonic() - last_sent >= CHANGES_KEEPALIVE_SECONDS:
+            yield ": keepalive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(CHANGES_POLL_SECONDS)
+
+@app.get("/changes/stream")
+async def stream_changes(request: Request, since: Optional[int] = Query(None, ge=0)):
+    """
+    Server-Sent Events com as alterações a partir de ?since= (ou do
+    cabeçalho Last-Event-ID; sem nenhum dos dois, só as novas).
+    """
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        since = max(since or 0, int(last_event_id))
+    if since is None:
+        since = await adb.get_change_version() or 0
+    return StreamingResponse(
+        _change_events(since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # --- Comando para rodar a API (no terminal) ---
 # uvicorn api:app --reload
\ No newline at end of file
@@ -0,0 +1,134 @@
+# async_db.py
+# Camada assíncrona sobre db.Database, para as rotas async da API.
+#
+# O SQLite é bloqueante: cada chamada roda num executor próprio (threads
+# dedicadas, separadas do threadpool padrão do Starlette), usando as
+# conexões do pool do Database. O event loop nunca espera pelo disco.
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 8
+DEFAULT_QUEUE_DEPTH = 64
+
+
+class AsyncDatabase:
+    """Mesma interface de CRUD do Database, com métodos 'async'."""
+
+    def __init__(self, db, max_workers=DEFAULT_WORKERS, max_queue=DEFAULT_QUEUE_DEPTH):
+        """
+        db: a instância do Database (o pool dele deve ter >= max_workers conexões).
+        max_workers: threads do executor (consultas rodando ao mesmo tempo).
+        max_queue: chamadas que podem esperar por uma thread livre; acima
+                   disso, quem chama espera no event loop (sem ocupar thread).
+        """
+        self.db = db
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="loja-db")
+        self._slots = None # criado no event loop, na primeira chamada
+
+    async def run(self, fn, *args, **kwargs):
+        """Roda uma função bloqueante no executor do banco."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers + self.max_queue)
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def write(self, name, *args):
+        """
+        Escrita 'name' do Database (add_product, update_category, ...). Com
+        group commit, espera o Future do escritor único direto no event
+        loop, sem ocupar uma thread do executor.
+        """
+        if self.db.writer is not None:
+            return await asyncio.wrap_future(self.db.writer.submit(name, args))
+        return await self.run(getattr(self.db, name), *args)
+
+    def shutdown(self):
+        """Encerra o executor e fecha as conexões ociosas."""
+        self._executor.shutdown(wait=True)
+        self.db.close()
+
+    # crud categorias ------------------------------------------------------------------------------------
+
+    async def add_category(self, nome):
+        return await self.write("add_category", nome)
+
+    async def get_categories(self, with_etag=False):
+        return await self.run(self.db.get_categories, with_etag=with_etag)
+
+    async def get_or_create_categories(self, nomes):
+        return await self.write("get_or_create_categories", nomes)
+
+    async def get_category_stats(self, categoria_id=None):
+        return await self.run(self.db.get_category_stats, categoria_id)
+
+    async def update_category(self, id, nome):
+        return await self.write("update_category", id, nome)
+
+    async def delete_category(self, id):
+        return await self.write("delete_category", id)
+
+    #  crud produtos ---------------------------------------------------------------------------------------------------
+
+    async def add_product(self, nome, tamanho, preco, categoria_id):
+        return await self.write("add_product", nome, tamanho, preco, categoria_id)
+
+    async def get_products(self, **filtros):
+        return await self.run(self.db.get_products, **filtros)
+
+    async def iter_products(self, **filtros):
+        """Versão assíncrona de Database.iter_products (gera blocos de linhas)."""
+        gen = self.db.iter_products(**filtros)
+        try:
+            while True:
+                rows = await self.run(next, gen, None)
+                if rows is None:
+                    break
+                yield rows
+        finally:
+            # fecha a conexão da exportação mesmo se o cliente desconectar
+            await self.run(gen.close)
+
+    async def search_products(self, query, limit=20):
+        return await self.run(self.db.search_products, query, limit)
+
+    async def get_product_by_id(self, id):
+        return await self.run(self.db.get_product_by_id, id)
+
+    async def update_product(self, id, nome, tamanho, preco, categoria_id):
+        return await self.write("update_product", id, nome, tamanho, preco, categoria_id)
+
+    async def delete_product(self, id):
+        return await self.write("delete_product", id)
+
+    # operações em lote -----------------------------------------------------------------------------------
+
+    async def add_products(self, produtos):
+        return await self.write("add_products", produtos)
+
+    async def update_products(self, produtos):
+        return await self.write("update_products", produtos)
+
+    async def delete_products(self, ids):
+        return await self.write("delete_products", ids)
+
+    async def move_products(self, de_categoria_id, para_categoria_id):
+        return await self.write("move_products", de_categoria_id, para_categoria_id)
+
+    async def reprice_products(self, regras, dry_run=False):
+        # as regras são validadas (uma vez só) dentro do Database.reprice_products
+        return await self.run(self.db.reprice_products, regras, dry_run)
+
+    async def run_batch(self, operations):
+        return await self.write("run_batch", self.db._check_batch(operations))
+
+    # registro de alterações -------------------------------------------------------------------------------
+
+    async def get_change_version(self):
+        return await self.run(self.db.get_change_version)
+
+    async def get_changes(self, since=0, limit=1000):
+        return await self.run(self.db.get_changes, since, limit)
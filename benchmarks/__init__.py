@@ -0,0 +1 @@
+# benchmarks da loja (rodar com: python -m benchmarks.<modulo>)
@@ -0,0 +1,77 @@
+# benchmarks/bench_api.py
+# Benchmarks ponta a ponta das rotas do api.py, chamando o app ASGI em
+# processo (sem rede). O banco usado vem de LOJA_DB_FILE.
+import asyncio
+import importlib
+import os
+import random
+
+from benchmarks.common import ASGIClient, measure
+
+
+def run(path, iterations=1000, max_seconds=2.0, seed=42):
+    """Roda os benchmarks das rotas sobre o banco em 'path'. Retorna {rota: estatísticas}."""
+    os.environ["LOJA_DB_FILE"] = path
+    import api
+    api = importlib.reload(api) # garante que o app use o banco pedido
+
+    rng = random.Random(seed)
+    loop = asyncio.new_event_loop()
+    client = ASGIClient(api.app, loop)
+    results = {}
+
+    conn = api.db.get_connection()
+    if conn is None:
+        raise RuntimeError("sem conexão com o banco (ver a mensagem acima)")
+    try:
+        max_id = conn.execute("SELECT MAX(id) FROM produtos").fetchone()[0] or 1
+        category_ids = [r[0] for r in conn.execute("SELECT id FROM categorias")]
+    finally:
+        api.db.release_connection(conn)
+    ids = [rng.randint(1, max_id) for _ in range(iterations)]
+    cats = [rng.choice(category_ids) for _ in range(iterations)]
+
+    def bench(name, fn, n=iterations):
+        def call(i):
+            status, _ = fn(i)
+            if status >= 500:
+                raise RuntimeError(f"{name}: HTTP {status}")
+        results[name] = measure(call, iterations=n, max_seconds=max_seconds)
+
+    bench("GET /", lambda i: client.request("GET", "/"))
+    bench("GET /categorias/", lambda i: client.request("GET", "/categorias/"))
+    bench("GET /produtos/?limit=100", lambda i: client.request("GET", "/produtos/", params={"limit": 100}))
+    bench("GET /produtos/?categoria_id&limit=100",
+          lambda i: client.request("GET", "/produtos/", params={"categoria_id": cats[i % len(cats)], "limit": 100}))
+    bench("GET /produtos/{id}", lambda i: client.request("GET", f"/produtos/{ids[i % len(ids)]}"))
+    bench("GET /produtos/search", lambda i: client.request("GET", "/produtos/search", params={"q": "camiseta azul"}))
+
+    def export(i):
+        status, body = client.request("GET", "/produtos/export", params={"categoria_id": cats[i % len(cats)]})
+        # corpo vazio = exportação abortada; mediria só o início da resposta
+        if status == 200 and not body:
+            raise RuntimeError("GET /produtos/export: corpo vazio")
+        return status, body
+
+    bench("GET /produtos/export?categoria_id", export, n=max(5, iterations // 50))
+
+    created = []
+
+    def create(i):
+        status, body = client.request("POST", "/produtos/", body={
+            "nome": "Bench", "tamanho": "M", "preco": 10.0, "categoria_id": cats[i % len(cats)]})
+        if status == 201:
+            created.append(int(body.split(b'"id":')[1].split(b",")[0].split(b"}")[0]))
+        return status, body
+
+    bench("POST /produtos/", create)
+    bench("PUT /produtos/{id}", lambda i: client.request("PUT", f"/produtos/{created[i % len(created)]}", body={
+        "nome": "Bench 2", "tamanho": "G", "preco": 11.0, "categoria_id": cats[0]}))
+    bench("DELETE /produtos/{id}",
+          lambda i: client.request("DELETE", f"/produtos/{created.pop()}") if created else (200, b""))
+    for produto_id in created:
+        api.db.delete_product(produto_id)
+
+    api.adb.shutdown()
+    loop.close()
+    return results
@@ -0,0 +1,53 @@
+# benchmarks/bench_bulk.py
+# Compara a inserção um a um (add_product) com a inserção em lote
+# (add_products, executemany numa única transação).
+#
+# Custo que sobra no lote: a partir de db.FTS_BULK_MIN_ROWS linhas a busca
+# textual é indexada com um comando só, mas os triggers por linha do resumo
+# por categoria (categorias_stats) e do registro de alterações (alteracoes)
+# continuam: juntos, ainda tomam mais da metade do tempo da inserção em
+# lote. O ganho sobre o um a um também depende do fsync do disco (num
+# tmpfs o commit de cada add_product é barato e o ganho cai).
+#
+#   python -m benchmarks.bench_bulk --rows 20000
+import argparse
+import os
+import tempfile
+import time
+
+from db import Database
+
+
+def _rows(n):
+    return [(f"Produto {i}", "M", 10.0 + i % 100, 1 + i % 4) for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de inserção em lote.")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--single-rows", type=int, default=2000,
+                        help="linhas do caminho um a um (mais lento)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        for nome in ("Camisetas", "Calças", "Calçados", "Acessórios"):
+            db.add_category(nome)
+
+        start = time.perf_counter()
+        for row in _rows(args.single_rows):
+            db.add_product(*row)
+        single = args.single_rows / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        db.add_products(_rows(args.rows))
+        bulk = args.rows / (time.perf_counter() - start)
+        db.close()
+
+    print(f"add_product (um a um): {single:12.0f} linhas/s")
+    print(f"add_products (lote):   {bulk:12.0f} linhas/s")
+    print(f"ganho: {bulk / single:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/bench_db.py
+# Micro-benchmarks de cada método do db.Database.
+# As escritas são feitas em pares (cria/exclui) para o banco não crescer.
+import random
+
+from db import Database
+from benchmarks.common import measure
+
+
+def run(path, iterations=1000, max_seconds=2.0, seed=42):
+    """Roda os micro-benchmarks sobre o banco em 'path'. Retorna {nome: estatísticas}."""
+    rng = random.Random(seed)
+    results = {}
+
+    # sem cache: mede o SQL de verdade
+    db = Database(path, pool_size=2, query_cache=False)
+    conn = db.get_connection()
+    if conn is None:
+        raise RuntimeError("sem conexão com o banco (ver a mensagem acima)")
+    try:
+        max_id = conn.execute("SELECT MAX(id) FROM produtos").fetchone()[0] or 1
+        total = conn.execute("SELECT COUNT(*) FROM produtos").fetchone()[0]
+        category_ids = [r[0] for r in conn.execute("SELECT id FROM categorias")]
+    finally:
+        db.release_connection(conn)
+    ids = [rng.randint(1, max_id) for _ in range(iterations)]
+    cats = [rng.choice(category_ids) for _ in range(iterations)]
+    words = ["cam", "calça jeans", "azul", "vestido estampado", "tenis", "moletom cinza"]
+
+    def bench(name, fn, n=iterations):
+        results[name] = measure(fn, iterations=n, max_seconds=max_seconds)
+
+    bench("get_categories", lambda i: db.get_categories())
+    bench("get_products[limit=100]", lambda i: db.get_products(limit=101))
+    bench("get_products[categoria_id,limit=100]",
+          lambda i: db.get_products(categoria_id=cats[i % len(cats)], limit=101))
+    bench("get_products[preco,limit=100]",
+          lambda i: db.get_products(preco_min=100, preco_max=120, limit=101))
+    bench("get_products[after,limit=100]",
+          lambda i: db.get_products(after=("Camiseta", ids[i % len(ids)]), limit=101))
+    if total <= 100000:
+        bench("get_products[todos]", lambda i: db.get_products(), n=max(5, iterations // 100))
+    bench("get_product_by_id", lambda i: db.get_product_by_id(ids[i % len(ids)]))
+    bench("search_products", lambda i: db.search_products(words[i % len(words)], 20))
+    bench("iter_products[categoria_id]",
+          lambda i: sum(len(rows) for rows in db.iter_products(categoria_id=cats[i % len(cats)])),
+          n=max(5, iterations // 50))
+
+    created = []
+    bench("add_product", lambda i: created.append(db.add_product("Bench", "M", 10.0, cats[i % len(cats)])))
+    bench("update_product", lambda i: db.update_product(created[i % len(created)], "Bench 2", "G", 11.0, cats[0]))
+    bench("delete_product", lambda i: db.delete_product(created.pop()) if created else None)
+    for produto_id in created:
+        db.delete_product(produto_id)
+
+    batch = [("Lote", "M", 10.0, cats[j % len(cats)]) for j in range(1000)]
+    batch_ids = []
+    bench("add_products[1000]", lambda i: batch_ids.append([r["id"] for r in db.add_products(batch)]),
+          n=max(5, iterations // 50))
+    bench("delete_products[1000]", lambda i: db.delete_products(batch_ids.pop()) if batch_ids else None,
+          n=max(5, iterations // 50))
+    for chunk in batch_ids:
+        db.delete_products(chunk)
+
+    cat_ids = []
+    bench("add_category", lambda i: cat_ids.append(db.add_category(f"Bench {rng.random()}")))
+    bench("update_category", lambda i: db.update_category(cat_ids[i % len(cat_ids)], f"Bench {rng.random()}"))
+    bench("delete_category", lambda i: db.delete_category(cat_ids.pop()) if cat_ids else None)
+    for cat_id in cat_ids:
+        db.delete_category(cat_id)
+    db.close()
+
+    # com o cache de listagens ligado (caso comum da API)
+    cached = Database(path, pool_size=2)
+    bench("get_categories[cache]", lambda i: cached.get_categories())
+    bench("get_products[cache,limit=100]", lambda i: cached.get_products(limit=101))
+    cached.close()
+
+    return results
@@ -0,0 +1,105 @@
+# benchmarks/bench_pool.py
+# Compara o pool de conexões com o comportamento antigo: abrir e fechar
+# uma conexão a cada chamada, sem os PRAGMAs (WAL, synchronous...), sem o
+# cache de listagens e com o banco no journal padrão (rollback), como o
+# código antes do pool. A linha "pool sem cache" separa o ganho de
+# reaproveitar as conexões (com os PRAGMAs) do ganho do cache.
+#
+#   python -m benchmarks.bench_pool --ops 5000 --threads 4
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from db import Database
+
+
+class _LegacyDatabase(Database):
+    """Conexões como antes do pool: só o row_factory, sem os PRAGMAs."""
+
+    def _new_connection(self):
+        conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+
+def _prepare(db_file, n_products=1000):
+    """Cria um banco temporário com algumas categorias e produtos."""
+    db = Database(db_file, pool_size=1)
+    conn = db.get_connection()
+    if conn is None:
+        raise RuntimeError("sem conexão com o banco (ver a mensagem acima)")
+    try:
+        conn.executemany("INSERT INTO categorias (nome) VALUES (?)",
+                         [(f"Categoria {i}",) for i in range(10)])
+        conn.executemany(
+            "INSERT INTO produtos (nome, tamanho, preco, categoria_id) VALUES (?, ?, ?, ?)",
+            [(f"Produto {i}", "M", 10.0 + i % 100, 1 + i % 10) for i in range(n_products)]
+        )
+        conn.commit()
+    finally:
+        db.release_connection(conn)
+    db.close()
+
+
+def _workload(db, ops):
+    """Mistura de leituras e escritas, parecida com o uso da API."""
+    for i in range(ops):
+        if i % 10 == 0:
+            db.update_product(1 + i % 100, f"Produto {i}", "G", 20.0, 1)
+        elif i % 2 == 0:
+            db.get_categories()
+        else:
+            db.delete_product(-1)  # consulta por chave primária, sem efeito
+
+
+def _legacy_copy(db_file, path):
+    """Cópia do banco no journal padrão (o WAL fica gravado no arquivo)."""
+    shutil.copy(db_file, path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.close()
+
+
+def run(db, ops, threads):
+    per_thread = ops // threads
+    workers = [threading.Thread(target=_workload, args=(db, per_thread)) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    db.close()
+    return per_thread * threads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pool de conexões.")
+    parser.add_argument("--ops", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--pool-size", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "bench.db")
+        _prepare(db_file)
+
+        legacy_file = os.path.join(tmp, "legacy.db")
+        _legacy_copy(db_file, legacy_file)
+
+        baseline = run(_LegacyDatabase(legacy_file, pool_size=0, query_cache=False), args.ops, args.threads)
+        no_cache = run(Database(db_file, pool_size=args.pool_size, query_cache=False), args.ops, args.threads)
+        pooled = run(Database(db_file, pool_size=args.pool_size), args.ops, args.threads)
+
+    pool = f"pool ({args.pool_size} conexões)"
+    print(f"{'sem pool (abre/fecha por chamada)':36} {baseline:10.0f} ops/s")
+    print(f"{pool + ', sem cache':36} {no_cache:10.0f} ops/s  ({no_cache / baseline:.1f}x)")
+    print(f"{pool:36} {pooled:10.0f} ops/s  ({pooled / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
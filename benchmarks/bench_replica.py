@@ -0,0 +1,112 @@
+# benchmarks/bench_replica.py
+# Vazão de leitura com uma carga de escrita concorrente, lendo do arquivo
+# ou da réplica em memória (Database(replica=True)). Leitores pedem páginas
+# de produtos com filtros variados; um escritor atualiza produtos sem parar
+# (ou a --write-rate por segundo).
+#
+#   python -m benchmarks.bench_replica --products 100000 --readers 4
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from benchmarks import datagen
+from benchmarks.common import summarize
+from db import Database
+from metrics import Registry
+
+MODES = {
+    "arquivo": dict(),
+    "replica_1s": dict(replica=True, replica_max_lag_ms=1000),
+    "replica_100ms": dict(replica=True, replica_max_lag_ms=100),
+}
+
+
+def run(path, mode, readers, seconds, write_rate):
+    registry = Registry()
+    db = Database(path, pool_size=readers + 1, query_cache=False, slow_query_ms=10**9,
+                  registry=registry, **MODES[mode])
+    ids = [p["id"] for p in db.get_products(limit=1000)]
+    categorias = [c["id"] for c in db.get_categories()]
+    if db.replica is not None:
+        # espera a primeira cópia
+        while db.replica.refreshes == 0:
+            time.sleep(0.01)
+
+    stop = threading.Event()
+    read_latencies, writes = [], [0]
+    lock = threading.Lock()
+
+    def reader(n):
+        rng = random.Random(n)
+        local = []
+        while not stop.is_set():
+            filtros = rng.choice([
+                {},
+                {"categoria_id": rng.choice(categorias)},
+                {"preco_min": 100.0, "preco_max": 200.0},
+                {"tamanho": "M"},
+            ])
+            t0 = time.perf_counter()
+            db.get_products(limit=100, **filtros)
+            local.append(time.perf_counter() - t0)
+        with lock:
+            read_latencies.extend(local)
+
+    def writer():
+        rng = random.Random(0)
+        interval = 1 / write_rate if write_rate else 0
+        while not stop.is_set():
+            id = rng.choice(ids)
+            db.update_product(id, f"Produto {id}", "M", round(rng.uniform(10, 999), 2), rng.choice(categorias))
+            writes[0] += 1
+            if interval:
+                time.sleep(interval)
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    stats = summarize(read_latencies, elapsed)
+    stats["escritas_por_seg"] = round(writes[0] / elapsed, 1)
+    reads = registry.counter("loja_db_replica_reads_total", "", ("source",))
+    total = reads.value("replica") + reads.value("arquivo")
+    stats["da_replica"] = round(reads.value("replica") / total, 3) if total else 0.0
+    stats["copias"] = db.replica.refreshes if db.replica is not None else 0
+    db.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da réplica de leitura em memória.")
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-rate", type=float, default=0, help="escritas/s (0 = sem pausa)")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    args = parser.parse_args()
+
+    source = datagen.ensure(args.products, args.categories)
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            shutil.copy(source, path)
+            s = run(path, mode, args.readers, args.seconds, args.write_rate)
+        print(f"{mode:14} leituras: {s['ops_per_sec']:8.1f}/s p50={s['p50_ms']:7.3f}ms "
+              f"p99={s['p99_ms']:8.3f}ms | escritas: {s['escritas_por_seg']:7.1f}/s | "
+              f"da réplica: {s['da_replica'] * 100:5.1f}% ({s['copias']} cópias)")
+
+
+if __name__ == "__main__":
+    main()
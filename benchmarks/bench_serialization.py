@@ -0,0 +1,59 @@
+# benchmarks/bench_serialization.py
+# Compara a serialização das listas: caminho Pydantic (um modelo por linha,
+# validação do response_model e jsonable_encoder, como o FastAPI faz) contra
+# o caminho rápido (linhas direto para JSON).
+#
+#   python -m benchmarks.bench_serialization --rows 100000
+import argparse
+import os
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from benchmarks import datagen
+from db import Database
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialização das listas.")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    path = datagen.ensure(args.rows)
+    os.environ["LOJA_DB_FILE"] = path
+    import api
+
+    db = Database(path, query_cache=False)
+    rows = db.get_products()
+    db.close()
+
+    def pydantic_path():
+        models = [api.Produto(**p) for p in rows]
+        return JSONResponse(content=jsonable_encoder(models)).body
+
+    def fast_path():
+        return api.rows_to_json(rows, api.Produto)
+
+    assert pydantic_path() == fast_path(), "os dois caminhos geram JSON diferente"
+
+    def best(fn):
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    slow = best(pydantic_path)
+    fast = best(fast_path)
+    print(f"{len(rows)} produtos")
+    print(f"Pydantic + jsonable_encoder: {slow * 1000:9.1f} ms")
+    print(f"caminho rápido:              {fast * 1000:9.1f} ms")
+    print(f"ganho: {slow / fast:.1f}x")
+    api.adb.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_snapshot.py
+# Mede a cópia do catálogo em memória (snapshot.py): bytes por produto,
+# tempo da carga completa e da atualização incremental, e a latência das
+# listagens pela memória contra o SQL.
+#
+#   python -m benchmarks.bench_snapshot --products 10000 100000
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks import datagen
+from benchmarks.common import measure
+from db import Database
+
+QUERIES = {
+    "primeira_pagina": dict(limit=101),
+    "pagina_por_cursor": dict(after=("Camiseta", 0), limit=101),
+    "filtro_categoria": dict(categoria_id=7, limit=101),
+    "filtro_tamanho": dict(tamanho="GG", limit=101),
+    "faixa_de_preco": dict(preco_min=100.0, preco_max=110.0, limit=101),
+    "categoria_e_preco": dict(categoria_id=7, preco_min=500.0, limit=101),
+}
+
+
+def run(path, iterations, max_seconds, changes=100):
+    sql = Database(path, query_cache=False, metrics=False)
+    mem = Database(path, query_cache=False, metrics=False, snapshot=True)
+    snapshot = mem.snapshot
+
+    start = time.perf_counter()
+    snapshot.refresh()
+    load = time.perf_counter() - start
+    usage = snapshot.memory_usage()
+    print(f"  carga completa: {load * 1000:.1f} ms, {usage['produtos']} produtos, "
+          f"{usage['total'] / 2**20:.1f} MiB ({usage['bytes_por_produto']} bytes/produto)")
+    print(f"    colunas={usage['colunas']} textos={usage['textos']} indices={usage['indices']}")
+
+    # atualização incremental depois de 'changes' alterações
+    produtos = sql.get_products(limit=changes)
+    for p in produtos:
+        sql.update_product(p["id"], p["nome"] + " Nova", p["tamanho"], p["preco"] + 1, p["categoria_id"])
+    start = time.perf_counter()
+    snapshot.refresh()
+    refresh = time.perf_counter() - start
+    print(f"  atualização incremental ({changes} alterações): {refresh * 1000:.2f} ms "
+          f"(cargas completas: {snapshot.full_loads})")
+
+    for name, kwargs in QUERIES.items():
+        assert [tuple(r) for r in sql.get_products(**kwargs)] == \
+               [tuple(r) for r in mem.get_products(**kwargs)], name
+        a = measure(lambda i: sql.get_products(**kwargs), iterations, max_seconds)
+        b = measure(lambda i: mem.get_products(**kwargs), iterations, max_seconds)
+        print(f"  {name:20} SQL p50={a['p50_ms']:8.3f}ms  memória p50={b['p50_ms']:8.3f}ms  "
+              f"({a['p50_ms'] / b['p50_ms']:.1f}x)")
+
+    sql.close()
+    mem.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da cópia do catálogo em memória.")
+    parser.add_argument("--products", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--max-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    for n in args.products:
+        source = datagen.ensure(n, args.categories)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            shutil.copy(source, path)
+            print(f"{n} produtos")
+            run(path, args.iterations, args.max_seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# benchmarks/bench_startup.py
+# Tempo de inicialização de processos novos: importar o api.py (o que um
+# worker do uvicorn faz antes de atender), abrir a GUI (python main.py) e
+# só construir o Database. Cada execução é um processo Python novo, num
+# banco já migrado (a primeira execução, que migra, não entra na conta).
+#
+# Com --max-ms o comando falha (código 1) se a mediana passar do alvo ou se
+# algum alvo não conseguir iniciar (ex.: uma dependência faltando):
+#
+#   python -m benchmarks.bench_startup
+#   python -m benchmarks.bench_startup --runs 20 --max-ms api=800 main=600
+#
+# "main" precisa de uma tela (DISPLAY); sem ela, é pulado (e, com --max-ms,
+# conta como falha: use --targets para deixá-lo de fora).
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import datagen
+from benchmarks.common import summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    "python": [sys.executable, "-c", "pass"], # referência: o interpretador vazio
+    "db": [sys.executable, "-c", "import os, db; db.Database(os.environ['LOJA_DB_FILE'])"],
+    "api": [sys.executable, "-c", "import api"],
+    "main": [sys.executable, "main.py"],
+}
+
+# Alvos padrão (mediana, em ms) usados com --max-ms sem valores
+DEFAULT_MAX_MS = {"db": 300.0, "api": 1500.0, "main": 1000.0}
+
+
+def run_once(target, path):
+    """Roda o alvo num processo novo. Retorna (segundos, erro ou None)."""
+    env = dict(os.environ, LOJA_DB_FILE=path, LOJA_STARTUP_EXIT="1")
+    t0 = time.perf_counter()
+    proc = subprocess.run(TARGETS[target], cwd=ROOT, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - t0
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        return elapsed, lines[-1] if lines else f"código {proc.returncode}"
+    return elapsed, None
+
+
+def run(path, target, runs):
+    """Mede 'runs' inicializações do alvo. Retorna o resumo, ou None se o alvo falhar."""
+    _, error = run_once(target, path) # aquecimento (e migração do banco)
+    if error:
+        print(f"{target:8} pulado: {error}")
+        return None
+    latencies = []
+    for _ in range(runs):
+        elapsed, error = run_once(target, path)
+        if error:
+            print(f"{target:8} falhou: {error}")
+            return None
+        latencies.append(elapsed)
+    return summarize(latencies, sum(latencies))
+
+
+def parse_max_ms(values):
+    """['api=800', 'main=600'] -> {'api': 800.0, 'main': 600.0}; lista vazia = alvos padrão."""
+    if not values:
+        return dict(DEFAULT_MAX_MS)
+    limits = {}
+    for value in values:
+        target, _, ms = value.partition("=")
+        if target not in TARGETS or not ms:
+            raise SystemExit(f"--max-ms inválido: {value} (use alvo=ms, alvos: {', '.join(TARGETS)})")
+        limits[target] = float(ms)
+    return limits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do tempo de inicialização.")
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--max-ms", nargs="*", metavar="ALVO=MS",
+                        help="falha se a mediana passar do limite (sem valores: alvos padrão)")
+    args = parser.parse_args()
+    limits = parse_max_ms(args.max_ms) if args.max_ms is not None else {}
+
+    source = datagen.ensure(args.products, args.categories)
+    failed = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        shutil.copy(source, path)
+        for target in args.targets:
+            s = run(path, target, args.runs)
+            if s is None:
+                # com --max-ms, um alvo que nem inicia não pode passar no orçamento
+                if args.max_ms is not None:
+                    failed.append(target)
+                continue
+            limit = limits.get(target)
+            status = ""
+            if limit is not None:
+                ok = s["p50_ms"] <= limit
+                status = f"  alvo {limit:.0f}ms: {'ok' if ok else 'ACIMA'}"
+                if not ok:
+                    failed.append(target)
+            print(f"{target:8} p50={s['p50_ms']:8.1f}ms p95={s['p95_ms']:8.1f}ms "
+                  f"max={s['max_ms']:8.1f}ms{status}")
+
+    if failed:
+        print(f"Inicialização acima do alvo ou com falha: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# benchmarks/bench_writes.py
+# Vazão de escrita com clientes concorrentes: cada cliente (uma thread)
+# alterna add_product e update_product. Compara as escritas diretas (cada
+# chamada com a sua transação, disputando a trava do arquivo) com o escritor
+# único com group commit (Database(group_commit=True)).
+#
+# --processes N divide os clientes entre N processos, como vários workers
+# do uvicorn no mesmo arquivo: aí também há disputa entre processos.
+#
+#   python -m benchmarks.bench_writes --clients 1 8 64
+import argparse
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.common import summarize
+from db import Database
+
+MODES = {
+    "direto": dict(group_commit=False),
+    "group_commit": dict(group_commit=True),
+    "group_commit_1ms": dict(group_commit=True, group_commit_window_ms=1.0),
+}
+
+
+def _worker(path, mode, clients, seconds, results):
+    """Roda 'clients' threads escrevendo por 'seconds' e devolve as medições por 'results'."""
+    db = Database(path, pool_size=clients, query_cache=False, slow_query_ms=10**9, **MODES[mode])
+    categoria_id = db.get_or_create_categories(["Bench"])["Bench"]
+    retries = db._busy_retries.value() # o contador é do processo todo
+    latencies, failures = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(n):
+        local, failed, produto_id = [], 0, None
+        i = 0
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            if produto_id is None or i % 2 == 0:
+                produto_id = db.add_product(f"Produto {n}-{i}", "M", 10.0 + i % 100, categoria_id)
+                ok = produto_id is not None
+            else:
+                ok = db.update_product(produto_id, f"Produto {n}-{i}", "G", 20.0 + i % 100, categoria_id) is True
+            local.append(time.perf_counter() - t0)
+            failed += not ok
+            i += 1
+        with lock:
+            latencies.extend(local)
+            failures[0] += failed
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    retries = db._busy_retries.value() - retries
+    db.close()
+    results.put((latencies, failures[0], retries))
+
+
+def run(mode, clients, processes, seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        Database(path).close() # cria as tabelas antes dos workers
+        per_process = [clients // processes + (i < clients % processes) for i in range(processes)]
+        start = time.perf_counter()
+        if processes == 1:
+            results = _ListQueue()
+            _worker(path, mode, clients, seconds, results)
+        else:
+            results = multiprocessing.Queue()
+            workers = [multiprocessing.Process(target=_worker, args=(path, mode, n, seconds, results))
+                       for n in per_process if n]
+            for w in workers:
+                w.start()
+        outputs = [results.get() for n in per_process if n]
+        if processes > 1:
+            for w in workers:
+                w.join()
+        elapsed = time.perf_counter() - start
+
+    latencies = [lat for out in outputs for lat in out[0]]
+    stats = summarize(latencies, elapsed)
+    stats["falhas"] = sum(out[1] for out in outputs)
+    stats["retentativas_busy"] = sum(out[2] for out in outputs)
+    return stats
+
+
+class _ListQueue(list):
+    """Fila mínima para o caso de um processo só."""
+
+    def put(self, item):
+        self.append(item)
+
+    def get(self):
+        return self.pop(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de escritas concorrentes.")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    args = parser.parse_args()
+
+    for clients in args.clients:
+        for mode in args.modes:
+            s = run(mode, clients, min(args.processes, clients), args.seconds)
+            print(f"{clients:3d} clientes {mode:17} {s['ops_per_sec']:9.1f} escritas/s  "
+                  f"p50={s['p50_ms']:8.3f}ms p99={s['p99_ms']:8.3f}ms  "
+                  f"falhas={s['falhas']} retentativas={s['retentativas_busy']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# benchmarks/common.py
+# Funções compartilhadas pelos benchmarks: medição, estatísticas,
+# gravação/comparação de resultados em JSON e um cliente ASGI mínimo.
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import sys
+import time
+from urllib.parse import urlencode
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentile(sorted_values, p):
+    """Percentil (0-100) de uma lista já ordenada, por interpolação linear."""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(latencies, elapsed):
+    """Resumo de uma série de latências (em segundos) -> dict em milissegundos."""
+    values = sorted(latencies)
+    return {
+        "n": len(values),
+        "ops_per_sec": round(len(values) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 4),
+        "p95_ms": round(percentile(values, 95) * 1000, 4),
+        "p99_ms": round(percentile(values, 99) * 1000, 4),
+        "max_ms": round(values[-1] * 1000, 4) if values else 0.0,
+    }
+
+
+def measure(fn, iterations=1000, max_seconds=2.0, warmup=10):
+    """
+    Chama fn(i) até 'iterations' vezes (ou até estourar max_seconds) e
+    retorna o resumo das latências.
+    """
+    for i in range(warmup):
+        fn(i)
+    latencies = []
+    clock = time.perf_counter
+    start = clock()
+    for i in range(iterations):
+        t0 = clock()
+        fn(i)
+        latencies.append(clock() - t0)
+        if t0 - start > max_seconds:
+            break
+    return summarize(latencies, clock() - start)
+
+
+def environment():
+    """Informações da máquina, gravadas junto com os resultados."""
+    return {
+        "python": sys.version.split()[0],
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def save_results(results, path=None):
+    """Grava os resultados em JSON (padrão: benchmarks/results/<data>.json)."""
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def compare(old_path, new_path, metric="p50_ms"):
+    """Imprime a diferença entre duas execuções, benchmark a benchmark."""
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    print(f"{'benchmark':60} {'antes':>10} {'depois':>10} {'variação':>9}")
+    for suite, benches in new["benchmarks"].items():
+        for name, stats in benches.items():
+            before = old["benchmarks"].get(suite, {}).get(name)
+            key = f"{suite}/{name}"
+            if before is None:
+                print(f"{key:60} {'-':>10} {stats[metric]:>10.3f} {'novo':>9}")
+                continue
+            change = (stats[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+            print(f"{key:60} {before[metric]:>10.3f} {stats[metric]:>10.3f} {change:>+8.1f}%")
+
+
+class ASGIClient:
+    """
+    Cliente HTTP mínimo que chama o app ASGI direto, sem rede nem
+    dependências extras. Síncrono: cada request roda no event loop dado.
+    """
+
+    def __init__(self, app, loop):
+        self.app = app
+        self.loop = loop
+
+    async def _request(self, method, path, params=None, body=None, headers=None):
+        raw_headers = [(b"host", b"bench")]
+        payload = b""
+        if body is not None:
+            payload = json.dumps(body).encode("utf-8")
+            raw_headers.append((b"content-type", b"application/json"))
+        raw_headers.append((b"content-length", str(len(payload)).encode()))
+        for name, value in (headers or {}).items():
+            raw_headers.append((name.lower().encode(), value.encode()))
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": urlencode(params or {}).encode(),
+            "headers": raw_headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("bench", 80),
+        }
+        sent = False
+        # o "cliente" só desconecta depois de receber a resposta inteira: um
+        # http.disconnect antes disso faz o StreamingResponse abortar o corpo
+        finished = asyncio.Event()
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": payload, "more_body": False}
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        response = {"status": None, "body": bytearray()}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+                if not message.get("more_body", False):
+                    finished.set()
+
+        await self.app(scope, receive, send)
+        return response["status"], bytes(response["body"])
+
+    def request(self, method, path, **kwargs):
+        return self.loop.run_until_complete(self._request(method, path, **kwargs))
+
+    async def arequest(self, method, path, **kwargs):
+        """Versão assíncrona de request, para quem já está no event loop."""
+        return await self._request(method, path, **kwargs)
@@ -0,0 +1,93 @@
+# benchmarks/datagen.py
+# Gera bancos sintéticos compatíveis com o loja.db para os benchmarks.
+# Os dados são determinísticos (semente fixa): duas execuções com os mesmos
+# parâmetros geram o mesmo banco.
+#
+#   python -m benchmarks.datagen --products 100000 --categories 50
+import argparse
+import os
+import random
+import time
+
+from db import Database
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+TIPOS = ["Camiseta", "Calça", "Bermuda", "Vestido", "Saia", "Jaqueta", "Casaco",
+         "Camisa", "Blusa", "Moletom", "Tênis", "Sandália", "Boné", "Meia", "Cinto"]
+DETALHES = ["Básica", "Slim", "Oversized", "Estampada", "Listrada", "Jeans", "Social",
+            "Esportiva", "Gola V", "Manga Longa", "Com Bolsos", "Retrô", "Skinny"]
+CORES = ["Azul", "Preta", "Branca", "Vermelha", "Verde", "Cinza", "Bege", "Rosa",
+         "Amarela", "Marrom", "Vinho", "Off-White"]
+TAMANHOS = ["PP", "P", "M", "G", "GG", "XG", "36", "38", "40", "42", "U"]
+
+
+def db_path(products, categories):
+    return os.path.join(DATA_DIR, f"bench_{products}_{categories}.db")
+
+
+def generate(path, products, categories, seed=42, chunk_size=20000):
+    """Cria (ou recria) o banco em 'path' com os produtos e categorias pedidos."""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    rng = random.Random(seed)
+    db = Database(path, pool_size=1, query_cache=False)
+    mapa = db.get_or_create_categories([f"Categoria {i:03d}" for i in range(categories)])
+    category_ids = sorted(mapa.values())
+
+    start = time.perf_counter()
+    for first in range(0, products, chunk_size):
+        rows = []
+        for _ in range(min(chunk_size, products - first)):
+            nome = f"{rng.choice(TIPOS)} {rng.choice(DETALHES)} {rng.choice(CORES)}"
+            rows.append((
+                nome,
+                rng.choice(TAMANHOS),
+                round(rng.uniform(9.9, 999.9), 2),
+                rng.choice(category_ids),
+            ))
+        db.add_products(rows)
+
+    conn = db.get_connection()
+    if conn is None:
+        raise RuntimeError("sem conexão com o banco (ver a mensagem acima)")
+    try:
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        db.release_connection(conn)
+    db.close()
+    return time.perf_counter() - start
+
+
+def ensure(products, categories=50):
+    """Retorna o caminho de um banco gerado, gerando só se ainda não existir."""
+    path = db_path(products, categories)
+    if not os.path.exists(path):
+        print(f"Gerando banco com {products} produtos e {categories} categorias...")
+        elapsed = generate(path, products, categories)
+        print(f"  pronto em {elapsed:.1f}s: {path}")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera bancos sintéticos para benchmark.")
+    parser.add_argument("--products", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--force", action="store_true", help="recria mesmo se já existir")
+    args = parser.parse_args()
+
+    for n in args.products:
+        path = db_path(n, args.categories)
+        if args.force or not os.path.exists(path):
+            elapsed = generate(path, n, args.categories)
+            print(f"{path}: {n} produtos em {elapsed:.1f}s")
+        else:
+            print(f"{path}: já existe (use --force para recriar)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+# benchmarks/loadgen.py
+# Gerador de carga da API: dispara requisições a uma taxa alvo (carga
+# aberta: a próxima sai no horário dela, não quando a anterior termina) com
+# uma mistura configurável de leituras e escritas, e mostra a cada
+# intervalo a vazão, os percentis de latência, os erros e os incidentes de
+# "database is locked". Serve para ver até onde um nó com o SQLite aguenta.
+#
+# Em processo (padrão): chama o app ASGI do api.py direto, num banco
+# sintético copiado (como os outros benchmarks). Com --url: fala HTTP/1.1
+# com keep-alive com um uvicorn local (cliente asyncio próprio, sem
+# dependências extras), usando o banco do servidor.
+#
+#   python -m benchmarks.loadgen --rate 500 --seconds 30
+#   python -m benchmarks.loadgen --url http://127.0.0.1:8000 --rate 2000 \
+#       --mix list=50,categories=20,get=10,create=10,update=5,delete=5
+#
+# A latência é medida a partir do horário agendado da requisição: se o
+# cliente atrasar (todas as conexões ocupadas), o atraso entra na conta.
+# Os incidentes de trava vêm do GET /metrics (loja_db_locked_errors_total e
+# loja_db_busy_retries_total); com vários workers do uvicorn, cada leitura
+# do /metrics vê só o worker que atendeu.
+import argparse
+import asyncio
+import collections
+import importlib
+import json
+import math
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks import datagen
+from benchmarks.common import ASGIClient, environment, save_results, summarize
+
+WORKLOADS = ("list", "categories", "get", "create", "update", "delete")
+DEFAULT_MIX = "list=50,categories=20,get=15,create=5,update=5,delete=5"
+
+# Máximo de requisições atrasadas esperando conexão; acima disso, as novas
+# são descartadas (e contadas) para o gerador não crescer sem limite.
+MAX_PENDING = 10000
+
+
+def parse_mix(value):
+    """'list=50,get=10' -> {'list': 50.0, 'get': 10.0}."""
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in WORKLOADS or not weight:
+            raise SystemExit(f"--mix inválido: {item} (cargas: {', '.join(WORKLOADS)})")
+        mix[name] = float(weight)
+    return mix
+
+
+def _metric(text, name):
+    """Soma das séries de uma métrica no texto do /metrics."""
+    total = 0.0
+    for match in re.finditer(rf"^{name}(?:{{[^}}]*}})? (\S+)$", text, re.M):
+        total += float(match.group(1))
+    return total
+
+
+class HTTPClient:
+    """
+    Cliente HTTP/1.1 assíncrono mínimo, com um pool de conexões keep-alive
+    (no máximo 'connections' abertas). Só o necessário para a API:
+    corpo JSON na ida, Content-Length ou chunked na volta.
+    """
+
+    def __init__(self, url, connections):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self._idle = []
+        self._slots = asyncio.Semaphore(connections)
+
+    async def _read_response(self, reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("conexão fechada pelo servidor")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = bytearray()
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                body += await reader.readexactly(size)
+                await reader.readexactly(2)
+            body = bytes(body)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await reader.read()
+            headers["connection"] = "close"
+        return status, body, headers.get("connection", "").lower() != "close"
+
+    async def request(self, method, path, params=None, body=None):
+        target = self.prefix + path + ("?" + urlencode(params) if params else "")
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        head = (f"{method} {target} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Connection: keep-alive\r\nContent-Length: {len(payload)}\r\n")
+        if body is not None:
+            head += "Content-Type: application/json\r\n"
+
+        async with self._slots:
+            if self._idle:
+                reader, writer = self._idle.pop()
+            else:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                writer.write(head.encode("latin-1") + b"\r\n" + payload)
+                status, data, keep_alive = await self._read_response(reader)
+            except BaseException:
+                writer.close()
+                raise
+            if keep_alive:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+            return status, data
+
+    async def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+class InProcessClient:
+    """Mesma interface do HTTPClient, chamando o app ASGI em processo."""
+
+    def __init__(self, app, connections):
+        self._client = ASGIClient(app, None)
+        self._slots = asyncio.Semaphore(connections)
+
+    async def request(self, method, path, params=None, body=None):
+        async with self._slots:
+            return await self._client.arequest(method, path, params=params, body=body)
+
+    async def close(self):
+        pass
+
+
+class Workload:
+    """Sorteia as requisições conforme a mistura, sobre os ids conhecidos."""
+
+    def __init__(self, mix, produto_ids, categoria_ids, seed=42):
+        self.rng = random.Random(seed)
+        self.names = list(mix)
+        self.weights = [mix[n] for n in self.names]
+        self.produto_ids = produto_ids
+        self.categoria_ids = categoria_ids
+        self.created = [] # só os produtos criados pela carga são alterados/excluídos
+
+    def _produto(self):
+        return {
+            "nome": f"Carga {self.rng.randrange(10**6)}",
+            "tamanho": self.rng.choice(["P", "M", "G"]),
+            "preco": round(self.rng.uniform(10, 500), 2),
+            "categoria_id": self.rng.choice(self.categoria_ids),
+        }
+
+    def next(self):
+        """Retorna (nome, método, caminho, params, corpo)."""
+        name = self.rng.choices(self.names, self.weights)[0]
+        if name in ("update", "delete") and not self.created:
+            name = "create"
+        if name == "list":
+            params = {"limit": 100}
+            filtro = self.rng.random()
+            if filtro < 0.3:
+                params["categoria_id"] = self.rng.choice(self.categoria_ids)
+            elif filtro < 0.5:
+                params.update(preco_min=100, preco_max=200)
+            return name, "GET", "/produtos/", params, None
+        if name == "categories":
+            return name, "GET", "/categorias/", None, None
+        if name == "get":
+            return name, "GET", f"/produtos/{self.rng.choice(self.produto_ids)}", None, None
+        if name == "create":
+            return name, "POST", "/produtos/", None, self._produto()
+        if name == "update":
+            return name, "PUT", f"/produtos/{self.rng.choice(self.created)}", None, self._produto()
+        # delete: tira da lista já, para duas requisições não excluírem o mesmo
+        produto_id = self.created.pop(self.rng.randrange(len(self.created)))
+        return name, "DELETE", f"/produtos/{produto_id}", None, None
+
+    def done(self, name, status, body):
+        if name == "create" and status == 201:
+            self.created.append(json.loads(body)["id"])
+
+
+class Interval:
+    """Medições de um intervalo do relatório."""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.shed = 0 # 503 (controle de admissão)
+        self.dropped = 0 # descartadas pelo próprio gerador
+
+
+async def _load_ids(client):
+    status, body = await client.request("GET", "/produtos/", params={"limit": 1000})
+    if status != 200:
+        raise SystemExit(f"GET /produtos/ respondeu {status}")
+    produto_ids = [p["id"] for p in json.loads(body)]
+    status, body = await client.request("GET", "/categorias/")
+    categoria_ids = [c["id"] for c in json.loads(body)]
+    if not produto_ids or not categoria_ids:
+        raise SystemExit("O banco precisa ter produtos e categorias.")
+    return produto_ids, categoria_ids
+
+
+async def _locked_counters(client):
+    status, body = await client.request("GET", "/metrics")
+    if status != 200:
+        return 0.0, 0.0
+    text = body.decode("utf-8")
+    return _metric(text, "loja_db_locked_errors_total"), _metric(text, "loja_db_busy_retries_total")
+
+
+async def run_load(client, mix, rate, seconds, interval, seed=42):
+    """Roda a carga e imprime um relatório por intervalo. Retorna o resumo."""
+    workload = Workload(mix, *await _load_ids(client), seed=seed)
+    per_workload = collections.defaultdict(list)
+    statuses = collections.Counter()
+    intervals = collections.defaultdict(Interval)
+    pending = 0
+    tasks = set()
+
+    async def send(scheduled, request):
+        nonlocal pending
+        name, method, path, params, body = request
+        try:
+            status, data = await client.request(method, path, params=params, body=body)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            status, data = 0, b""
+        finally:
+            pending -= 1
+        now = time.perf_counter()
+        latency = now - scheduled
+        # cada linha do relatório conta o que terminou naquele intervalo
+        bucket = intervals[int((now - start) // interval)]
+        bucket.latencies.append(latency)
+        per_workload[name].append(latency)
+        statuses[status] += 1
+        if status == 503:
+            bucket.shed += 1
+        elif status == 0 or status >= 400:
+            bucket.errors += 1
+        workload.done(name, status, data)
+
+    locked_start = await _locked_counters(client)
+    start = time.perf_counter()
+    end = start + seconds
+    next_report = start + interval
+    report_index = 0
+    locked_last = locked_start
+    print(f"{'t':>5} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'erros':>6} {'503':>6} "
+          f"{'descart.':>8} {'locked':>7} {'retry':>7}")
+
+    i = 0
+    while True:
+        scheduled = start + i / rate
+        now = time.perf_counter()
+        if scheduled >= end:
+            break
+        if now >= next_report:
+            locked_last = await _report(client, intervals, report_index, interval, locked_last)
+            report_index += 1
+            next_report += interval
+            continue
+        if scheduled > now:
+            await asyncio.sleep(min(scheduled, next_report) - now)
+            continue
+        i += 1
+        if pending >= MAX_PENDING:
+            intervals[int((scheduled - start) // interval)].dropped += 1
+            continue
+        pending += 1
+        task = asyncio.ensure_future(send(scheduled, workload.next()))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.wait(tasks)
+    elapsed = time.perf_counter() - start
+    last_index = max(max(intervals, default=0), math.ceil(seconds / interval) - 1)
+    while report_index <= last_index:
+        locked_last = await _report(client, intervals, report_index, interval, locked_last)
+        report_index += 1
+
+    locked, retries = await _locked_counters(client)
+    all_latencies = [lat for b in intervals.values() for lat in b.latencies]
+    result = {
+        "total": summarize(all_latencies, elapsed),
+        "cargas": {name: summarize(lats, elapsed) for name, lats in per_workload.items()},
+        "status": {str(k): v for k, v in sorted(statuses.items())},
+        "erros": sum(b.errors for b in intervals.values()),
+        "recusadas_503": sum(b.shed for b in intervals.values()),
+        "descartadas": sum(b.dropped for b in intervals.values()),
+        "database_locked": int(locked - locked_start[0]),
+        "retentativas_busy": int(retries - locked_start[1]),
+    }
+    await client.close()
+    return result
+
+
+async def _report(client, intervals, index, interval, locked_last):
+    """Imprime a linha de um intervalo e retorna os contadores de trava atuais."""
+    bucket = intervals.get(index) or Interval()
+    s = summarize(bucket.latencies, interval)
+    locked, retries = await _locked_counters(client)
+    print(f"{(index + 1) * interval:>4g}s {s['ops_per_sec']:>8.1f} {s['p50_ms']:>7.1f}ms "
+          f"{s['p95_ms']:>7.1f}ms {s['p99_ms']:>7.1f}ms {bucket.errors:>6} {bucket.shed:>6} "
+          f"{bucket.dropped:>8} {locked - locked_last[0]:>7.0f} {retries - locked_last[1]:>7.0f}")
+    return locked, retries
+
+
+def _print_summary(result):
+    print("\nResumo por carga:")
+    for name, s in sorted(result["cargas"].items()):
+        print(f"  {name:11} n={s['n']:7d} p50={s['p50_ms']:8.2f}ms p95={s['p95_ms']:8.2f}ms "
+              f"p99={s['p99_ms']:8.2f}ms max={s['max_ms']:8.2f}ms")
+    t = result["total"]
+    print(f"  {'total':11} n={t['n']:7d} {t['ops_per_sec']:.1f} req/s p99={t['p99_ms']:.2f}ms")
+    print(f"Status: {result['status']}  erros={result['erros']} 503={result['recusadas_503']} "
+          f"descartadas={result['descartadas']} database_locked={result['database_locked']} "
+          f"retentativas_busy={result['retentativas_busy']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerador de carga da API.")
+    parser.add_argument("--url", default=None, help="API rodando (ex.: http://127.0.0.1:8000); sem isso, em processo")
+    parser.add_argument("--rate", type=float, default=200.0, help="requisições por segundo")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--interval", type=float, default=1.0, help="segundos por linha do relatório")
+    parser.add_argument("--connections", type=int, default=64, help="conexões keep-alive (requisições simultâneas)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"pesos por carga (padrão: {DEFAULT_MIX})")
+    parser.add_argument("--products", type=int, default=10000, help="tamanho do banco sintético (em processo)")
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=None, help="grava o resumo em JSON")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        api = None
+        if args.url:
+            client_factory = lambda: HTTPClient(args.url, args.connections)
+        else:
+            path = os.path.join(tmp, "bench.db")
+            shutil.copy(datagen.ensure(args.products, args.categories), path)
+            os.environ["LOJA_DB_FILE"] = path
+            import api
+            api = importlib.reload(api) # garante que o app use o banco copiado
+            client_factory = lambda: InProcessClient(api.app, args.connections)
+
+        async def go():
+            return await run_load(client_factory(), mix, args.rate, args.seconds, args.interval, args.seed)
+
+        result = asyncio.run(go())
+        if api is not None:
+            api.adb.shutdown()
+
+    _print_summary(result)
+    if args.out:
+        save_results({
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "environment": environment(),
+            "params": vars(args),
+            "loadgen": result,
+        }, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+# benchmarks/query_plans.py
+# Regressão de planos de consulta: roda os métodos do db.Database num banco
+# sintético populado, captura cada comando SQL que eles executam e passa
+# cada um por EXPLAIN QUERY PLAN. Falha (código 1) se algum comando fizer
+# varredura completa da tabela de produtos ("SCAN produtos", sem índice) ou
+# ordenar numa B-tree temporária ("USE TEMP B-TREE"), a não ser que o
+# cenário esteja em EXPECTED com o motivo.
+#
+# Com --advise, sugere índices: para cada consulta em produtos que não usa
+# um índice de cobertura, testa índices candidatos (igualdades, ORDER BY,
+# faixas e, para cobrir, as demais colunas usadas) criando cada um na
+# cópia do banco e comparando o plano antes e depois. Cada sugestão (e
+# depois o conjunto delas) é testada contra todos os comandos capturados:
+# um índice que troca outro e deixa alguma consulta com varredura ou
+# ordenação temporária (ex.: (nome, preco) no lugar de idx_produtos_nome
+# quebra a paginação por (nome, id)) é descartado. Os cenários de
+# EXPECTED não recebem sugestões.
+#
+#   python -m benchmarks.query_plans
+#   python -m benchmarks.query_plans --products 100000 --advise
+import argparse
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+from benchmarks import datagen
+from db import Database, _normalize_sql
+from metrics import Registry
+
+# Comandos sem plano a analisar
+_SKIP = re.compile(r"^\s*(--|BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE|PRAGMA|CREATE|DROP|EXPLAIN)", re.I)
+
+_TEMP_TABLE = re.compile(r"^\s*CREATE\s+TEMP(ORARY)?\s+TABLE\b", re.I)
+
+# Colunas de produtos que podem entrar num índice (o id já vem em todos)
+PRODUCT_COLUMNS = ("nome", "tamanho", "preco", "categoria_id")
+
+_NOT_ALIAS = {"WHERE", "SET", "JOIN", "LEFT", "INNER", "ON", "ORDER", "GROUP", "LIMIT", "VALUES", "AS"}
+
+# Cenários cujo plano pode ter varredura ou ordenação temporária: motivo
+EXPECTED = {
+    "search_products": "o FTS5 devolve por relevância (bm25); a ordenação é inerente",
+    "reprice_products(nome)": "LIKE não usa índice (sem distinção de maiúsculas); o reajuste por nome varre o catálogo",
+    "check_category_stats": "confere o resumo contra a tabela inteira, de propósito",
+}
+
+
+class _TracingDatabase(Database):
+    """Database que guarda (cenário, SQL) de cada comando executado."""
+
+    scenario = None
+
+    def __init__(self, *args, **kwargs):
+        self.captured = []
+        super().__init__(*args, trace_statements=True, **kwargs)
+
+    def _trace_statement(self, sql):
+        if self.scenario is not None:
+            self.captured.append((self.scenario, sql))
+
+
+def scenarios(db):
+    """Lista de (nome, função) cobrindo os métodos do Database."""
+    conn = db.get_connection()
+    if conn is None:
+        raise RuntimeError("sem conexão com o banco (ver a mensagem acima)")
+    try:
+        produto = dict(conn.execute("SELECT * FROM produtos ORDER BY id LIMIT 1").fetchone())
+        categoria_id = produto["categoria_id"]
+        tamanho = produto["tamanho"]
+    finally:
+        db.release_connection(conn)
+    novo = ("Plano", "M", 10.0, categoria_id)
+    state = {}
+
+    def add_product():
+        state["id"] = db.add_product(*novo)
+
+    def add_products():
+        state["ids"] = [r["id"] for r in db.add_products([novo, novo])]
+
+    def new_categories():
+        state["cats"] = [db.add_category("Plano A"), db.add_category("Plano B")]
+
+    return [
+        ("get_categories", db.get_categories),
+        ("get_products", lambda: db.get_products(limit=100)),
+        ("get_products(after)", lambda: db.get_products(after=(produto["nome"], produto["id"]), limit=100)),
+        ("get_products(categoria_id)", lambda: db.get_products(categoria_id=categoria_id, limit=100)),
+        ("get_products(tamanho)", lambda: db.get_products(tamanho=tamanho, limit=100)),
+        ("get_products(preco_min, preco_max)", lambda: db.get_products(preco_min=100, preco_max=110, limit=100)),
+        ("get_products(categoria_id, after)",
+         lambda: db.get_products(categoria_id=categoria_id, after=(produto["nome"], produto["id"]), limit=100)),
+        ("iter_products(categoria_id)", lambda: next(db.iter_products(categoria_id=categoria_id), None)),
+        ("search_products", lambda: db.search_products("camiseta azul")),
+        ("get_product_by_id", lambda: db.get_product_by_id(produto["id"])),
+        ("get_category_stats", db.get_category_stats),
+        ("get_category_stats(categoria_id)", lambda: db.get_category_stats(categoria_id)),
+        ("check_category_stats", db.check_category_stats),
+        ("get_or_create_categories", lambda: db.get_or_create_categories(["Plano", "Plano 2"])),
+        ("add_category", new_categories),
+        ("update_category", lambda: db.update_category(state["cats"][0], "Plano C")),
+        ("add_product", add_product),
+        ("update_product", lambda: db.update_product(state["id"], "Plano 2", "G", 11.0, categoria_id)),
+        ("delete_product", lambda: db.delete_product(state["id"])),
+        ("add_products", add_products),
+        ("update_products", lambda: db.update_products([(i, "Plano 3", "P", 12.0, categoria_id) for i in state["ids"]])),
+        ("move_products", lambda: db.move_products(state["cats"][0], state["cats"][1])),
+        ("delete_products", lambda: db.delete_products(state["ids"])),
+        ("delete_category", lambda: db.delete_category(state["cats"][1])),
+        ("delete_category(em uso)", lambda: db.delete_category(categoria_id)),
+        ("reprice_products(categoria_id)",
+         lambda: db.reprice_products([{"categoria_id": categoria_id, "percentual": -10}], dry_run=True)),
+        ("reprice_products(tamanho)", lambda: db.reprice_products([{"tamanho": tamanho, "valor": 1}], dry_run=True)),
+        ("reprice_products(nome)", lambda: db.reprice_products([{"nome": "Camiseta%", "valor": 1}], dry_run=True)),
+        ("run_batch", lambda: db.run_batch([("add_category", ("Plano D",)), ("delete_category", (-1,))])),
+        ("get_change_version", db.get_change_version),
+        ("get_changes", lambda: db.get_changes(0, 100)),
+        ("prune_changes", lambda: db.prune_changes(10**9)),
+    ]
+
+
+def capture(db):
+    """
+    Roda os cenários e retorna ([(cenário, sql)] sem repetições, na ordem;
+    [DDL das tabelas temporárias criadas]). As tabelas temporárias são de
+    cada conexão: para analisar os comandos que as usam (ex.: temp.reajuste
+    do reprice_products), a conexão do EXPLAIN precisa criá-las de novo.
+    """
+    for name, fn in scenarios(db):
+        db.scenario = name
+        fn()
+    db.scenario = None
+    seen, statements, temp_tables = set(), [], []
+    for name, sql in db.captured:
+        if _TEMP_TABLE.match(sql):
+            if sql not in temp_tables:
+                temp_tables.append(sql)
+            continue
+        key = (name, _normalize_sql(sql))
+        if key not in seen and not _SKIP.match(sql):
+            seen.add(key)
+            statements.append((name, sql))
+    return statements, temp_tables
+
+
+def product_names(sql):
+    """Nomes pelos quais a tabela produtos aparece no SQL (ela e os aliases)."""
+    names = {"produtos"}
+    for alias in re.findall(r"\bprodutos\s+(?:AS\s+)?(\w+)", sql, re.I):
+        if alias.upper() not in _NOT_ALIAS:
+            names.add(alias)
+    return names
+
+
+def explain(conn, sql):
+    """Linhas (detail) do EXPLAIN QUERY PLAN, ou None se não der para analisar."""
+    try:
+        return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+    except sqlite3.OperationalError:
+        return None
+
+
+def problems(plan, names):
+    """Problemas de um plano: varredura de produtos sem índice e B-tree temporária."""
+    found = []
+    for detail in plan:
+        match = re.match(r"SCAN (\S+)(.*)", detail)
+        if match and match.group(1).split(".")[-1] in names and "USING" not in match.group(2):
+            found.append(detail)
+        if "USE TEMP B-TREE" in detail:
+            found.append(detail)
+    return found
+
+
+def score(plan, names):
+    """Custo relativo de um plano, para comparar índices (menor é melhor)."""
+    total = 0
+    for detail in plan:
+        match = re.match(r"(SCAN|SEARCH) (\S+)(.*)", detail)
+        if match and match.group(2).split(".")[-1] in names:
+            rest = match.group(3)
+            if "USING" not in rest:
+                total += 4 # varredura da tabela
+            elif "COVERING INDEX" not in rest and "PRIMARY KEY" not in rest:
+                total += 1 # índice + leitura da linha na tabela
+        if "USE TEMP B-TREE" in detail:
+            total += 2
+    return total
+
+
+def candidates(sql, names):
+    """Índices candidatos (listas de colunas) para as condições e o ORDER BY do SQL."""
+    sql = " ".join(sql.split())
+    qualified = "|".join(re.escape(n) for n in names)
+    prefix = rf"(?<![\w.])(?:(?:{qualified})\.)?"
+    col = prefix + rf"({'|'.join(PRODUCT_COLUMNS)})\b"
+    body = sql.split(" ORDER BY ")[0]
+    where = body.split(" WHERE ", 1)[1] if " WHERE " in body else ""
+    # o id do desempate (ORDER BY ..., id) não entra: o rowid já fecha todo
+    # índice. Por isso um candidato de cobertura com colunas depois das da
+    # ordem não serve à paginação (nome, id) e não é sugerido para ela.
+    order = re.findall(col, sql.split(" ORDER BY ")[1]) if " ORDER BY " in sql else []
+
+    equal = re.findall(col + r"\s*=\s*", where)
+    ranges = re.findall(col + r"\s*(?:[<>]=?|LIKE)\s*", where)
+    ranges += re.findall(rf"\(\s*{col}\s*,", where) # cursor (nome, id) > (?, ?)
+    used = re.findall(col, sql)
+
+    def unique(cols):
+        return list(dict.fromkeys(c for c in cols if c))
+
+    keys = unique(equal + order + ranges[:1])
+    result = []
+    if keys:
+        result.append(keys)
+    covering = unique(keys + used)
+    if covering != keys:
+        result.append(covering)
+    return result
+
+
+def existing_indexes(conn):
+    """{tuple de colunas: nome} dos índices de produtos."""
+    indexes = {}
+    for row in conn.execute("PRAGMA index_list(produtos)"):
+        cols = tuple(r[2] for r in conn.execute(f"PRAGMA index_info({row[1]})"))
+        indexes[cols] = row[1]
+    return indexes
+
+
+def regressions(conn, indexes, plans):
+    """
+    Comandos cujo plano piora com os índices propostos, [(cenário, sql,
+    plano depois)]: mais varreduras ou ordenações temporárias que antes,
+    ou sem plano. indexes: [(ddl, índices substituídos)], aplicados juntos
+    numa transação desfeita no fim. plans: {(cenário, sql): plano atual}.
+    """
+    worse = []
+    conn.execute("BEGIN")
+    try:
+        for ddl, replaced in indexes:
+            for idx in replaced:
+                conn.execute(f"DROP INDEX IF EXISTS {idx}")
+            conn.execute(ddl)
+        for (name, sql), plan in plans.items():
+            names = product_names(sql)
+            after = explain(conn, sql)
+            if after is None or len(problems(after, names)) > len(problems(plan, names)):
+                worse.append((name, sql, after))
+    finally:
+        conn.rollback()
+    return worse
+
+
+def advise(conn, name, sql, plan, plans):
+    """
+    Sugestões de índice para um comando: [(ddl, índices substituídos, plano
+    depois)]. Cada candidato é testado numa transação desfeita no fim, sem
+    os índices existentes que são prefixo dele (o novo os substitui), e só
+    é sugerido se nenhum dos comandos em 'plans' piorar com ele.
+    """
+    if name in EXPECTED:
+        return []
+    names = product_names(sql)
+    before = score(plan, names)
+    if before == 0:
+        return []
+    existing = existing_indexes(conn)
+    suggestions = []
+    for cols in candidates(sql, names):
+        if any(idx_cols[:len(cols)] == tuple(cols) for idx_cols in existing):
+            continue # um índice existente já começa por estas colunas
+        index = "idx_produtos_" + "_".join(cols)
+        if index in existing.values():
+            index += "_cobertura"
+        ddl = f"CREATE INDEX {index} ON produtos ({', '.join(cols)})"
+        replaced = [idx for idx_cols, idx in existing.items() if tuple(cols[:len(idx_cols)]) == idx_cols]
+        conn.execute("BEGIN")
+        try:
+            for idx in replaced:
+                conn.execute(f"DROP INDEX {idx}")
+            conn.execute(ddl)
+            after = explain(conn, sql)
+        finally:
+            conn.rollback()
+        if after is None or score(after, names) >= before or not any(index in d for d in after):
+            continue
+        worse = regressions(conn, [(ddl, replaced)], plans)
+        if worse:
+            print(f"Descartado [{name}] {ddl}: piora {', '.join(sorted({w[0] for w in worse}))}")
+            continue
+        suggestions.append((ddl, replaced, after))
+    return suggestions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regressão de planos de consulta do Database.")
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--advise", action="store_true", help="sugere índices de cobertura")
+    parser.add_argument("--verbose", action="store_true", help="mostra o plano de todos os comandos")
+    args = parser.parse_args()
+
+    source = datagen.ensure(args.products, args.categories)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        shutil.copy(source, path)
+        db = _TracingDatabase(path, pool_size=1, query_cache=False, slow_query_ms=10**9, registry=Registry())
+        statements, temp_tables = capture(db)
+        db.close()
+
+        conn = sqlite3.connect(path)
+        for ddl in temp_tables:
+            conn.execute(ddl)
+        failures, unexplained, suggested, plans = [], [], {}, {}
+        for name, sql in statements:
+            plan = explain(conn, sql)
+            if plan is None:
+                # um comando sem plano não pode passar calado pela verificação
+                unexplained.append((name, sql))
+                print(f"[{name}] sem plano: {_normalize_sql(sql)}")
+                continue
+            plans[(name, sql)] = plan
+            names = product_names(sql)
+            found = problems(plan, names)
+            if found and name not in EXPECTED:
+                failures.append((name, sql, plan))
+            if args.verbose or (found and name not in EXPECTED):
+                print(f"[{name}] {_normalize_sql(sql)}")
+                for detail in plan:
+                    print(f"    {detail}")
+
+        if args.advise:
+            for (name, sql), plan in plans.items():
+                for ddl, replaced, after in advise(conn, name, sql, plan, plans):
+                    suggested.setdefault(ddl, replaced)
+                    print(f"Sugestão [{name}] {_normalize_sql(sql)}")
+                    print("    antes:  " + " | ".join(plan))
+                    print(f"    índice: {ddl}" + (f" (substitui {', '.join(replaced)})" if replaced else ""))
+                    print("    depois: " + " | ".join(after))
+            # as sugestões boas sozinhas podem piorar algo juntas (ex.: duas
+            # substituindo o mesmo índice): tira a última até o conjunto passar
+            while suggested and regressions(conn, list(suggested.items()), plans):
+                ddl, _ = suggested.popitem()
+                print(f"Descartado (em conjunto com as demais): {ddl}")
+        conn.close()
+
+    print(f"{len(statements)} comandos analisados, {len(unexplained)} sem plano, "
+          f"{len(failures)} com varredura ou ordenação inesperada.")
+    for name, reason in EXPECTED.items():
+        print(f"  esperado em {name}: {reason}")
+    if args.advise:
+        print(f"{len(suggested)} índice(s) sugerido(s) (cada índice a mais também custa nas escritas):")
+        for ddl, replaced in suggested.items():
+            print(f"  {ddl}" + (f"  -- substitui {', '.join(replaced)}" if replaced else ""))
+    if failures or unexplained:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/run.py
+# Suíte completa: gera (uma vez) os bancos sintéticos, roda os
+# micro-benchmarks do Database e os ponta a ponta da API, e grava tudo
+# em JSON para comparar execuções.
+#
+#   python -m benchmarks.run                       # 10k produtos
+#   python -m benchmarks.run --sizes 10000 100000 1000000
+#   python -m benchmarks.run --compare antes.json depois.json
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks import bench_api, bench_db, datagen
+from benchmarks.common import compare, environment, save_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suíte de benchmarks da loja.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000],
+                        help="quantidades de produtos (ex.: 10000 100000 1000000)")
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--max-seconds", type=float, default=2.0,
+                        help="tempo máximo por benchmark")
+    parser.add_argument("--suites", nargs="+", choices=["db", "api"], default=["db", "api"])
+    parser.add_argument("--out", default=None, help="arquivo JSON de saída")
+    parser.add_argument("--compare", nargs=2, metavar=("ANTES", "DEPOIS"),
+                        help="compara dois arquivos de resultados e sai")
+    parser.add_argument("--metric", default="p50_ms")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare, metric=args.metric)
+        return
+
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "params": vars(args),
+        "benchmarks": {},
+    }
+    for size in args.sizes:
+        source = datagen.ensure(size, args.categories)
+        for suite in args.suites:
+            # cada suíte roda numa cópia, para as execuções serem comparáveis
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "bench.db")
+                shutil.copy(source, path)
+                module = bench_db if suite == "db" else bench_api
+                print(f"[{suite}] {size} produtos...")
+                stats = module.run(path, args.iterations, args.max_seconds)
+            key = f"{suite}@{size}"
+            results["benchmarks"][key] = stats
+            for name, s in stats.items():
+                print(f"  {name:45} p50={s['p50_ms']:8.3f}ms p95={s['p95_ms']:8.3f}ms "
+                      f"p99={s['p99_ms']:8.3f}ms {s['ops_per_sec']:10.1f} ops/s")
+
+    print(f"Resultados gravados em {save_results(results, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,157 +1,1048 @@
 # db.py
 import sqlite3
+import contextlib
+import functools
+import hashlib
+import logging
 import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+# replica, snapshot e writer são importados só quando ligados (ver __init__)
+
+# Log de consultas lentas (ver slow_query_ms no Database)
+logger = logging.getLogger("loja.db")
+
+# Tamanho máximo das listas "IN (...)" nas operações em lote.
+BULK_CHUNK_SIZE = 500
+
+# SELECT base dos produtos, com JOIN para o nome da categoria.
+# Reaproveitado pelas consultas de lista e de produto único.
+PRODUCT_SELECT = """
+    SELECT 
+        p.id, 
+        p.nome, 
+        p.tamanho, 
+        p.preco, 
+        c.nome as categoria_nome,
+        p.categoria_id
+    FROM produtos p
+    LEFT JOIN categorias c ON p.categoria_id = c.id
+"""
+
+# Triggers que mantêm a busca textual (produtos_fts) em sincronia, por nome.
+# As escritas em lote com FTS_BULK_MIN_ROWS linhas ou mais desligam os de
+# produtos e atualizam o índice com um comando por bloco (ver _fts_bulk):
+# o trigger por linha deixava a inserção em lote ~6x mais lenta.
+FTS_TRIGGERS = {
+    "produtos_fts_insert": """
+        CREATE TRIGGER IF NOT EXISTS produtos_fts_insert AFTER INSERT ON produtos BEGIN
+            INSERT INTO produtos_fts (rowid, nome, categoria)
+            VALUES (new.id, new.nome, (SELECT nome FROM categorias WHERE id = new.categoria_id));
+        END
+    """,
+    "produtos_fts_update": """
+        CREATE TRIGGER IF NOT EXISTS produtos_fts_update AFTER UPDATE OF nome, categoria_id ON produtos BEGIN
+            UPDATE produtos_fts
+            SET nome = new.nome,
+                categoria = (SELECT nome FROM categorias WHERE id = new.categoria_id)
+            WHERE rowid = new.id;
+        END
+    """,
+    "produtos_fts_delete": """
+        CREATE TRIGGER IF NOT EXISTS produtos_fts_delete AFTER DELETE ON produtos BEGIN
+            DELETE FROM produtos_fts WHERE rowid = old.id;
+        END
+    """,
+    "categorias_fts_update": """
+        CREATE TRIGGER IF NOT EXISTS categorias_fts_update AFTER UPDATE OF nome ON categorias BEGIN
+            UPDATE produtos_fts SET categoria = new.nome
+            WHERE rowid IN (SELECT id FROM produtos WHERE categoria_id = new.id);
+        END
+    """,
+}
+FTS_BULK_MIN_ROWS = 500
+
+# Indexa no FTS os produtos de um filtro (completado por quem usa)
+FTS_INDEX_SELECT = """
+    INSERT INTO produtos_fts (rowid, nome, categoria)
+    SELECT p.id, p.nome, c.nome
+    FROM produtos p
+    LEFT JOIN categorias c ON p.categoria_id = c.id
+"""
+
+# Escritas: nome -> (mensagem de erro, valor retornado quando a escrita falha).
+# Cada nome tem um método público e um _op_<nome>(cursor, ...) que faz o
+# trabalho dentro de uma transação já aberta (ver Database._write).
+WRITE_OPERATIONS = {
+    "add_category": ("Erro ao adicionar categoria", None),
+    "get_or_create_categories": ("Erro ao criar categorias em lote", None),
+    "update_category": ("Erro ao atualizar categoria", False),
+    "delete_category": ("Erro ao deletar categoria", "ERROR"),
+    "add_product": ("Erro ao adicionar produto", None),
+    "update_product": ("Erro ao atualizar produto", False),
+    "delete_product": ("Erro ao deletar produto", False),
+    "add_products": ("Erro ao adicionar produtos em lote", None),
+    "update_products": ("Erro ao atualizar produtos em lote", None),
+    "delete_products": ("Erro ao deletar produtos em lote", None),
+    "move_products": ("Erro ao mover produtos", None),
+    "run_batch": ("Erro ao executar lote de operações", None),
+    "reprice_products": ("Erro ao reajustar preços", None),
+    "rebuild_category_stats": ("Erro ao recalcular estatísticas", False),
+    "prune_changes": ("Erro ao podar alterações", None),
+}
+
+# Migrações do esquema, em ordem: (versão, método que faz a DDL). Cada versão
+# aplicada é gravada na tabela 'versao_schema'; um banco em dia não executa
+# nenhuma DDL na inicialização. Migração nova = versão seguinte no fim da
+# lista (nunca alterar uma que já foi publicada).
+SCHEMA_MIGRATIONS = (
+    (1, "_create_base_tables"),
+    (2, "_create_search_index"),
+    (3, "_create_category_stats"),
+    (4, "_create_change_log"),
+)
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+# Faixas de preço (limite superior) da distribuição retornada pelo reajuste
+REPRICE_BUCKETS = (50, 100, 200, 500, 1000)
+
+# Recalcula o resumo por categoria (usado na criação e no rebuild)
+CATEGORY_STATS_REBUILD = """
+    INSERT INTO categorias_stats (categoria_id, quantidade, preco_total, preco_min, preco_max)
+    SELECT categoria_id, COUNT(*), SUM(preco), MIN(preco), MAX(preco)
+    FROM produtos
+    WHERE categoria_id IN (SELECT id FROM categorias)
+    GROUP BY categoria_id
+"""
+
+def _product_filters(categoria_id=None, tamanho=None, preco_min=None, preco_max=None, ordered=False):
+    """
+    Monta as condições WHERE (e os parâmetros) dos filtros de produtos.
+
+    ordered: a consulta sai em ordem de (nome, id). Aí o preço entra como
+    "+p.preco", que não usa idx_produtos_preco: o planner percorre um índice
+    que já está na ordem e para no LIMIT, em vez de ler a faixa de preço
+    inteira e ordená-la numa B-tree temporária a cada página.
+    """
+    preco = "+p.preco" if ordered else "p.preco"
+    where, params = [], []
+    if categoria_id is not None:
+        where.append("p.categoria_id = ?")
+        params.append(categoria_id)
+    if tamanho is not None:
+        where.append("p.tamanho = ?")
+        params.append(tamanho)
+    if preco_min is not None:
+        where.append(f"{preco} >= ?")
+        params.append(preco_min)
+    if preco_max is not None:
+        where.append(f"{preco} <= ?")
+        params.append(preco_max)
+    return where, params
+
+def _fts_query(texto):
+    """
+    Converte o texto digitado numa consulta FTS5 segura: cada palavra vira
+    um prefixo entre aspas ("palavra"*), todas obrigatórias. Operadores do
+    FTS5 digitados pelo usuário são tratados como texto comum.
+    """
+    palavras = re.findall(r"\w+", texto or "")
+    return " ".join('"' + p.replace('"', '""') + '"*' for p in palavras)
+
+def _etag(rows):
+    """ETag forte de uma listagem: hash do conteúdo das linhas."""
+    digest = hashlib.sha1(repr([tuple(row) for row in rows]).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+def _normalize_sql(sql):
+    """
+    Forma "genérica" de um comando para as métricas: o sqlite3 entrega o
+    SQL com os parâmetros já substituídos, então literais voltam a ser '?'
+    e listas IN (?, ?, ...) viram um único (?).
+    """
+    sql = re.sub(r"'(?:[^']|'')*'", "?", " ".join(sql.split()))
+    sql = re.sub(r"(?<![\w.])-?\d+(?:\.\d+)?(?:e[-+]?\d+)?\b", "?", sql)
+    return re.sub(r"\(\?(?:, \?)+\)", "(?)", sql)
+
+def _is_busy(error):
+    """True se o erro é o SQLITE_BUSY/SQLITE_LOCKED ("database is locked")."""
+    code = getattr(error, "sqlite_errorcode", None) # Python 3.11+
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return "locked" in str(error) or "busy" in str(error)
+
+def _write_succeeded(result):
+    """Se o resultado de uma escrita indica sucesso (usado para desfazer um lote)."""
+    if result is None or result is False:
+        return False
+    if isinstance(result, str):
+        return result == "SUCCESS"
+    if isinstance(result, list): # operações em lote: todos os itens
+        return all(item["status"] == "SUCCESS" for item in result)
+    return True
+
+def timed(method):
+    """Mede a duração de um método do Database (métricas e log de lentidão)."""
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.metrics:
+            return method(self, *args, **kwargs)
+        local = self._trace_local
+        outer = getattr(local, "statements", None)
+        local.statements = [] if self.trace_statements else None
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._call_seconds.observe(elapsed, name)
+            if elapsed * 1000 >= self.slow_query_ms:
+                self._slow_calls.inc(name)
+                args_repr = repr(args)
+                if len(args_repr) > 200:
+                    args_repr = args_repr[:200] + "..."
+                logger.warning("Consulta lenta: %s levou %.1f ms, args=%s, SQL=%s",
+                               name, elapsed * 1000, args_repr, local.statements)
+            local.statements = outer
+
+    return wrapper
 
 class Database:
     """Classe para gerenciar o banco de dados SQLite da loja."""
-    
-    def __init__(self, db_file="loja.db"):
+
+    def __init__(self, db_file="loja.db", pool_size=5, pool_timeout=5.0,
+                 busy_timeout=5000, cache_size=-16000, query_cache=True,
+                 query_cache_entries=128, query_cache_max_rows=10000,
+                 metrics=True, slow_query_ms=250, trace_statements=False,
+                 registry=metrics.REGISTRY, snapshot=False, group_commit=False,
+                 group_commit_window_ms=0.0, group_commit_max_batch=256,
+                 write_retries=5, write_backoff_ms=10.0, replica=False,
+                 replica_max_lag_ms=1000):
+        """
+        db_file: caminho do arquivo SQLite.
+        pool_size: máximo de conexões mantidas abertas (0 = abre e fecha
+                   uma conexão a cada chamada, como antes).
+        pool_timeout: segundos de espera por uma conexão livre do pool.
+        busy_timeout: milissegundos de espera quando o banco está travado.
+        cache_size: cache de páginas por conexão (negativo = KiB).
+        query_cache: guarda em memória o resultado das listagens
+                     (get_categories/get_products) até a próxima escrita.
+        query_cache_entries: máximo de listagens diferentes no cache (LRU).
+        query_cache_max_rows: listagens maiores que isso não são guardadas.
+        metrics: mede a duração de cada método (histograma por método).
+        slow_query_ms: chamadas mais lentas que isso vão para o log "loja.db".
+        trace_statements: captura cada comando SQL executado (contagem por
+                          comando e SQL incluído no log de lentidão).
+        registry: onde as métricas são registradas.
+        snapshot: mantém o catálogo em memória (snapshot.CatalogSnapshot) e
+                  responde get_products por ele, voltando ao SQL se a cópia
+                  não puder ser carregada.
+        group_commit: todas as escritas passam por uma única thread
+                      (writer.GroupCommitWriter), que junta as que chegam
+                      ao mesmo tempo numa só transação.
+        group_commit_window_ms: quanto o escritor espera por mais escritas
+                                antes de fechar o grupo (0 = só junta as
+                                que já estão na fila).
+        group_commit_max_batch: máximo de escritas por transação.
+        write_retries: novas tentativas quando o banco está travado
+                       (SQLITE_BUSY) depois do busy_timeout.
+        write_backoff_ms: espera antes da primeira nova tentativa (dobra a
+                          cada tentativa, com variação aleatória).
+        replica: lê listagens, busca e estatísticas de uma cópia do banco em
+                 memória (replica.ReadReplica), renovada em segundo plano.
+                 Desliga o query_cache (as linhas podem vir de cópias
+                 diferentes). get_product_by_id continua lendo o arquivo,
+                 para o produto recém-gravado ser encontrado.
+        replica_max_lag_ms: atraso máximo da réplica; mais atrasada que
+                            isso, a leitura vai para o arquivo.
+        """
         self.db_file = db_file
-        # tabelas criadas na inicialização
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self.busy_timeout = busy_timeout
+        self.cache_size = cache_size
+
+        # pool de conexões (checkout/checkin). LIFO reaproveita a conexão
+        # mais "quente", que ainda tem o cache de páginas preenchido.
+        self._pool = queue.LifoQueue(maxsize=max(pool_size, 1))
+        self._pool_lock = threading.Lock()
+        self._pool_created = 0
+
+        # cache das listagens: chave -> (versão, linhas, etag)
+        self.query_cache = query_cache and not replica
+        self.query_cache_entries = query_cache_entries
+        self.query_cache_max_rows = query_cache_max_rows
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_generation = 0 # incrementado a cada escrita deste processo
+        self._watch_conn = None # conexão só para ler o PRAGMA data_version
+        self._watch_lock = threading.Lock()
+
+        # instrumentação
+        self.metrics = metrics
+        self.slow_query_ms = slow_query_ms
+        self.trace_statements = trace_statements
+        self._trace_local = threading.local()
+        self._call_seconds = registry.histogram(
+            "loja_db_call_seconds", "Duração das chamadas ao Database.", ("method",))
+        self._slow_calls = registry.counter(
+            "loja_db_slow_calls_total", "Chamadas ao Database acima de slow_query_ms.", ("method",))
+        self._statements = registry.counter(
+            "loja_db_statements_total", "Comandos SQL executados (trace_statements).", ("statement",))
+        self._busy_retries = registry.counter(
+            "loja_db_busy_retries_total", "Novas tentativas de escrita com o banco travado.")
+        self._locked_errors = registry.counter(
+            "loja_db_locked_errors_total", "Escritas que falharam com 'database is locked'.")
+
+        # escritas
+        self.write_retries = write_retries
+        self.write_backoff_ms = write_backoff_ms
+
+        # migrações pendentes aplicadas na inicialização
         self.create_tables()
 
+        # cópia do catálogo em memória (carregada na primeira listagem)
+        self.snapshot = None
+        if snapshot:
+            from snapshot import CatalogSnapshot
+            self.snapshot = CatalogSnapshot(self)
+
+        # réplica em memória para as leituras (a primeira cópia é feita em segundo plano)
+        self.replica = None
+        if replica:
+            from replica import ReadReplica
+            self.replica = ReadReplica(self, replica_max_lag_ms, registry=registry)
+
+        # escritor único com group commit (a thread começa na primeira escrita)
+        self.writer = None
+        if group_commit:
+            from writer import GroupCommitWriter
+            self.writer = GroupCommitWriter(
+                self, window_ms=group_commit_window_ms, max_batch=group_commit_max_batch, registry=registry)
+
+    def _new_connection(self):
+        """Abre uma conexão nova, já configurada com os PRAGMAs da loja."""
+        # check_same_thread=False: a conexão pode ser devolvida ao pool por
+        # uma thread e usada por outra (nunca por duas ao mesmo tempo).
+        conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # colunas por nome
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        conn.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+        if self.trace_statements:
+            conn.set_trace_callback(self._trace_statement)
+        return conn
+
+    def _trace_statement(self, sql):
+        """Chamado pelo sqlite3 a cada comando executado (trace_statements=True)."""
+        sql = _normalize_sql(sql)
+        self._statements.inc(sql)
+        statements = getattr(self._trace_local, "statements", None)
+        if statements is not None and len(statements) < 50:
+            statements.append(sql)
+
     def get_connection(self):
-        """Retorna uma conexão com o banco de dados."""
+        """
+        Retorna uma conexão do pool (deve ser devolvida com release_connection),
+        ou None se não houver como conectar: pool esgotado por pool_timeout
+        segundos ou erro ao abrir o arquivo. Quem chama deve checar o None.
+        """
         try:
-            conn = sqlite3.connect(self.db_file)
-            conn.row_factory = sqlite3.Row  # colunas por nome
-            return conn
+            if self.pool_size <= 0:
+                return self._new_connection()
+
+            try:
+                return self._pool.get_nowait()
+            except queue.Empty:
+                pass
+
+            # pool vazio: cria uma nova se ainda não chegou no limite
+            with self._pool_lock:
+                if self._pool_created < self.pool_size:
+                    self._pool_created += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    return self._new_connection()
+                except sqlite3.Error:
+                    with self._pool_lock:
+                        self._pool_created -= 1
+                    raise
+
+            # limite atingido: espera alguém devolver uma conexão
+            return self._pool.get(timeout=self.pool_timeout)
+        except queue.Empty:
+            print("Erro ao conectar ao banco de dados: nenhuma conexão livre no pool.")
+            return None
         except sqlite3.Error as e:
             print(f"Erro ao conectar ao banco de dados: {e}")
             return None
 
+    def release_connection(self, conn):
+        """Devolve uma conexão ao pool (ou fecha, se o pool estiver desativado)."""
+        if self.pool_size <= 0:
+            conn.close()
+            return
+        try:
+            # nunca devolve uma transação pela metade para o próximo usuário
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put_nowait(conn)
+        except (sqlite3.Error, queue.Full):
+            conn.close()
+            with self._pool_lock:
+                self._pool_created -= 1
+
+    def _read_connection(self):
+        """Conexão para leitura: a da réplica, se estiver em dia, ou uma do pool (ou None)."""
+        if self.replica is not None:
+            conn = self.replica.acquire()
+            if conn is not None:
+                return conn
+        return self.get_connection()
+
+    def _release_read_connection(self, conn):
+        if self.replica is not None and self.replica.owns(conn):
+            self.replica.release(conn)
+        else:
+            self.release_connection(conn)
+
+    def close(self):
+        """Fecha todas as conexões ociosas do pool (e encerra o escritor)."""
+        if self.writer is not None:
+            self.writer.close()
+        if self.replica is not None:
+            self.replica.close()
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._pool_lock:
+                self._pool_created -= 1
+        with self._watch_lock:
+            if self._watch_conn is not None:
+                self._watch_conn.close()
+                self._watch_conn = None
+
+    # cache das listagens ----------------------------------------------------------------------------------
+    # As escritas deste objeto invalidam o cache na hora. Escritas de outros
+    # processos (ex.: a GUI e a API ao mesmo tempo) são detectadas pelo
+    # PRAGMA data_version, que muda numa conexão sempre que OUTRA conexão
+    # faz commit no arquivo. Usamos uma conexão dedicada que nunca escreve,
+    # então ela enxerga também os commits do próprio pool.
+
+    def _data_version(self):
+        with self._watch_lock:
+            try:
+                if self._watch_conn is None:
+                    self._watch_conn = sqlite3.connect(self.db_file, check_same_thread=False)
+                return self._watch_conn.execute("PRAGMA data_version").fetchone()[0]
+            except sqlite3.Error as e:
+                print(f"Erro ao verificar versão do banco: {e}")
+                return None
+
+    def _invalidate_cache(self):
+        """Descarta o cache das listagens (chamado após cada escrita)."""
+        with self._cache_lock:
+            self._cache_generation += 1
+            self._cache.clear()
+        if self.replica is not None:
+            self.replica.notify_write()
+
+    def _cached(self, key, loader):
+        """Retorna (linhas, etag) de uma listagem, do cache se ainda for válido."""
+        if not self.query_cache:
+            rows = loader()
+            rows = [] if rows is None else rows
+            return rows, _etag(rows)
+
+        data_version = self._data_version()
+        with self._cache_lock:
+            version = (self._cache_generation, data_version)
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] == version and data_version is not None:
+                self._cache.move_to_end(key)
+                return list(entry[1]), entry[2]
+
+        rows = loader()
+        if rows is None: # erro no banco: não guarda
+            return [], _etag([])
+        etag = _etag(rows)
+        # só guarda se nenhuma escrita aconteceu durante a consulta
+        if len(rows) <= self.query_cache_max_rows:
+            with self._cache_lock:
+                if version[0] == self._cache_generation:
+                    self._cache[key] = (version, rows, etag)
+                    self._cache.move_to_end(key)
+                    while len(self._cache) > self.query_cache_entries:
+                        self._cache.popitem(last=False)
+        return list(rows), etag
+
+    # escritas -------------------------------------------------------------------------------------------
+    # Toda escrita passa por _write: direto numa transação própria ou, com
+    # group_commit, pela fila do escritor único. O trabalho em si fica nos
+    # métodos _op_<nome>(cursor, ...), que não abrem nem fecham transação.
+
+    def _begin_write(self, cursor):
+        """BEGIN IMMEDIATE, tentando de novo (com backoff) se o banco estiver travado."""
+        for attempt in range(self.write_retries + 1):
+            try:
+                cursor.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if not _is_busy(e) or attempt == self.write_retries:
+                    raise
+                self._busy_retries.inc()
+                time.sleep(self.write_backoff_ms / 1000 * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    def _write_error(self, name, error):
+        """Imprime o erro de uma escrita e retorna o valor de falha dela."""
+        message, value = WRITE_OPERATIONS[name]
+        print(f"{message}: {error}")
+        if _is_busy(error):
+            self._locked_errors.inc()
+        # retorna uma string de erro se for violação de chave única (nome repetido)
+        if name == "update_category" and "UNIQUE" in str(error).upper():
+            return "UNIQUE_VIOLATION"
+        return value
+
+    def _write(self, name, *args, raise_errors=False):
+        """
+        Executa a escrita 'name' (ver WRITE_OPERATIONS) e retorna o resultado dela.
+        raise_errors: levanta o sqlite3.Error em vez de retornar o valor de
+        falha (para quem precisa saber o tipo do erro, ex.: o importador).
+        """
+        if self.writer is not None:
+            return self.writer.execute(name, args, raise_errors=raise_errors)
+
+        conn = self.get_connection()
+        if conn is None:
+            if raise_errors:
+                raise sqlite3.OperationalError("nenhuma conexão livre no pool")
+            return WRITE_OPERATIONS[name][1]
+        try:
+            cursor = conn.cursor()
+            self._begin_write(cursor)
+            result = getattr(self, "_op_" + name)(cursor, *args)
+            conn.commit()
+            self._invalidate_cache()
+            return result
+        except sqlite3.Error as e:
+            value = self._write_error(name, e)
+            if raise_errors:
+                raise
+            return value
+        finally:
+            self.release_connection(conn)
+
     def create_tables(self):
-        """Cria as tabelas 'categorias' e 'produtos' se não existirem."""
+        """
+        Aplica as migrações pendentes do esquema (SCHEMA_MIGRATIONS) numa
+        única transação. Com o banco em dia é só uma leitura da versão.
+        """
         conn = self.get_connection()
         if conn:
             try:
                 cursor = conn.cursor()
-                
-                # Tabela de Categorias
-                cursor.execute("""
-                CREATE TABLE IF NOT EXISTS categorias (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nome TEXT NOT NULL UNIQUE
-                )
-                """)
-                
-                # Tabela de Produtos
+                if self._schema_version(cursor) >= SCHEMA_VERSION:
+                    return
+
+                self._begin_write(cursor)
+                # outro processo pode ter migrado enquanto esperávamos a trava
+                version = self._schema_version(cursor)
                 cursor.execute("""
-                CREATE TABLE IF NOT EXISTS produtos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nome TEXT NOT NULL,
-                    tamanho TEXT,
-                    preco REAL NOT NULL,
-                    categoria_id INTEGER,
-                    FOREIGN KEY (categoria_id) REFERENCES categorias (id)
-                        ON DELETE SET NULL -- Se categoria for deletada, seta para NULL
+                CREATE TABLE IF NOT EXISTS versao_schema (
+                    versao INTEGER PRIMARY KEY,
+                    aplicada_em TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
                 )
                 """)
-                
+                # banco sem 'versao_schema' (novo ou anterior ao versionamento):
+                # todas rodam, e as DDL com IF NOT EXISTS não refazem o que já existe
+                for numero, metodo in SCHEMA_MIGRATIONS:
+                    if numero > version:
+                        getattr(self, metodo)(cursor)
+                        cursor.execute("INSERT INTO versao_schema (versao) VALUES (?)", (numero,))
+
                 conn.commit()
             except sqlite3.Error as e:
                 print(f"Erro ao criar tabelas: {e}")
             finally:
-                conn.close()
+                self.release_connection(conn)
+
+    def _schema_version(self, cursor):
+        """Última migração aplicada no banco (0 se nunca foi migrado)."""
+        try:
+            cursor.execute("SELECT MAX(versao) FROM versao_schema")
+        except sqlite3.OperationalError as e:
+            if "no such table" in str(e):
+                return 0
+            raise
+        return cursor.fetchone()[0] or 0
+
+    def _create_base_tables(self, cursor):
+        """Cria as tabelas 'categorias' e 'produtos' e os índices da listagem."""
+        # Tabela de Categorias
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS categorias (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL UNIQUE
+        )
+        """)
+
+        # Tabela de Produtos
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS produtos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            tamanho TEXT,
+            preco REAL NOT NULL,
+            categoria_id INTEGER,
+            FOREIGN KEY (categoria_id) REFERENCES categorias (id)
+                ON DELETE SET NULL -- Se categoria for deletada, seta para NULL
+        )
+        """)
+
+        # Índices para a paginação por cursor (nome, id) e os filtros
+        # da listagem. O id (rowid) já vem embutido em todo índice.
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_produtos_nome ON produtos (nome)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_produtos_categoria ON produtos (categoria_id, nome)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_produtos_tamanho ON produtos (tamanho, nome)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_produtos_preco ON produtos (preco)")
+
+    def _create_search_index(self, cursor):
+        """
+        Cria a busca textual (FTS5) sobre o nome do produto e o nome da
+        categoria, mantida em sincronia por triggers. O rowid do índice é
+        o id do produto. remove_diacritics ignora acentos ("calca" acha
+        "Calça") e o índice de prefixos acelera buscas por início de palavra.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'produtos_fts'")
+        exists = cursor.fetchone() is not None
+
+        cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS produtos_fts USING fts5(
+            nome,
+            categoria,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+        """)
+        for trigger in FTS_TRIGGERS.values():
+            cursor.execute(trigger)
+
+        # banco antigo: indexa os produtos que já existiam
+        if not exists:
+            cursor.execute(FTS_INDEX_SELECT)
+
+    def _create_category_stats(self, cursor):
+        """
+        Cria a tabela-resumo 'categorias_stats' (quantidade, soma, mínimo e
+        máximo de preço por categoria), mantida por triggers em 'produtos'.
+        Ler as estatísticas custa O(categorias), não O(produtos).
+
+        Mínimo e máximo são recalculados pelo índice (categoria_id, preco)
+        quando um produto sai da categoria: uma busca O(log n), não um scan.
+        Produtos sem categoria não entram no resumo.
+        """
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_produtos_categoria_preco ON produtos (categoria_id, preco)")
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'categorias_stats'")
+        exists = cursor.fetchone() is not None
+
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS categorias_stats (
+            categoria_id INTEGER PRIMARY KEY REFERENCES categorias (id) ON DELETE CASCADE,
+            quantidade INTEGER NOT NULL DEFAULT 0,
+            preco_total REAL NOT NULL DEFAULT 0,
+            preco_min REAL,
+            preco_max REAL
+        )
+        """)
+        cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS produtos_stats_insert AFTER INSERT ON produtos
+        WHEN new.categoria_id IS NOT NULL BEGIN
+            INSERT INTO categorias_stats (categoria_id, quantidade, preco_total, preco_min, preco_max)
+            VALUES (new.categoria_id, 1, new.preco, new.preco, new.preco)
+            ON CONFLICT (categoria_id) DO UPDATE SET
+                quantidade = quantidade + 1,
+                preco_total = preco_total + excluded.preco_total,
+                preco_min = MIN(COALESCE(preco_min, excluded.preco_min), excluded.preco_min),
+                preco_max = MAX(COALESCE(preco_max, excluded.preco_max), excluded.preco_max);
+        END
+        """)
+        cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS produtos_stats_delete AFTER DELETE ON produtos
+        WHEN old.categoria_id IS NOT NULL BEGIN
+            UPDATE categorias_stats SET
+                quantidade = quantidade - 1,
+                preco_total = preco_total - old.preco,
+                preco_min = (SELECT MIN(preco) FROM produtos WHERE categoria_id = old.categoria_id),
+                preco_max = (SELECT MAX(preco) FROM produtos WHERE categoria_id = old.categoria_id)
+            WHERE categoria_id = old.categoria_id;
+        END
+        """)
+        # update = sai da categoria antiga e entra na nova (podem ser a mesma)
+        cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS produtos_stats_update AFTER UPDATE OF preco, categoria_id ON produtos BEGIN
+            UPDATE categorias_stats SET
+                quantidade = quantidade - 1,
+                preco_total = preco_total - old.preco,
+                preco_min = (SELECT MIN(preco) FROM produtos WHERE categoria_id = old.categoria_id),
+                preco_max = (SELECT MAX(preco) FROM produtos WHERE categoria_id = old.categoria_id)
+            WHERE categoria_id = old.categoria_id;
+
+            INSERT INTO categorias_stats (categoria_id, quantidade, preco_total, preco_min, preco_max)
+            SELECT new.categoria_id, 1, new.preco, new.preco, new.preco
+            WHERE new.categoria_id IS NOT NULL
+            ON CONFLICT (categoria_id) DO UPDATE SET
+                quantidade = quantidade + 1,
+                preco_total = preco_total + excluded.preco_total,
+                preco_min = (SELECT MIN(preco) FROM produtos WHERE categoria_id = excluded.categoria_id),
+                preco_max = (SELECT MAX(preco) FROM produtos WHERE categoria_id = excluded.categoria_id);
+        END
+        """)
+        cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS categorias_stats_delete AFTER DELETE ON categorias BEGIN
+            DELETE FROM categorias_stats WHERE categoria_id = old.id;
+        END
+        """)
+
+        # banco antigo: calcula o resumo dos produtos que já existiam
+        if not exists:
+            cursor.execute(CATEGORY_STATS_REBUILD)
+
+    def _create_change_log(self, cursor):
+        """
+        Cria o registro de alterações 'alteracoes', preenchido por triggers:
+        cada insert/update/delete em 'produtos' ou 'categorias' acrescenta
+        uma linha com versão crescente. Quem guarda a última versão lida
+        (ex.: o CatalogSnapshot) relê só os registros alterados desde então.
+        """
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS alteracoes (
+            versao INTEGER PRIMARY KEY AUTOINCREMENT,
+            tabela TEXT NOT NULL,
+            registro_id INTEGER NOT NULL,
+            operacao TEXT NOT NULL -- INSERT, UPDATE ou DELETE
+        )
+        """)
+        for tabela in ("produtos", "categorias"):
+            cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {tabela}_log_insert AFTER INSERT ON {tabela} BEGIN
+                INSERT INTO alteracoes (tabela, registro_id, operacao) VALUES ('{tabela}', new.id, 'INSERT');
+            END
+            """)
+            # se o id mudar, o id antigo sai (DELETE) e o novo é gravado como UPDATE
+            cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {tabela}_log_update AFTER UPDATE ON {tabela} BEGIN
+                INSERT INTO alteracoes (tabela, registro_id, operacao)
+                SELECT '{tabela}', old.id, 'DELETE' WHERE old.id <> new.id;
+                INSERT INTO alteracoes (tabela, registro_id, operacao) VALUES ('{tabela}', new.id, 'UPDATE');
+            END
+            """)
+            cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {tabela}_log_delete AFTER DELETE ON {tabela} BEGIN
+                INSERT INTO alteracoes (tabela, registro_id, operacao) VALUES ('{tabela}', old.id, 'DELETE');
+            END
+            """)
 
     # crud categorias ------------------------------------------------------------------------------------
 
+    @timed
     def add_category(self, nome):
-        conn = self.get_connection()
+        return self._write("add_category", nome)
+
+    def _op_add_category(self, cursor, nome):
+        cursor.execute("INSERT INTO categorias (nome) VALUES (?)", (nome,))
+        return cursor.lastrowid
+
+    @timed
+    def get_categories(self, with_etag=False):
+        """
+        Retorna as categorias ordenadas por nome (do cache, se válido).
+        with_etag=True retorna (categorias, etag).
+        """
+        rows, etag = self._cached(("categorias",), self._load_categories)
+        return (rows, etag) if with_etag else rows
+
+    def _load_categories(self):
+        conn = self._read_connection()
+        if conn is None:
+            return None
         try:
             cursor = conn.cursor()
-            cursor.execute("INSERT INTO categorias (nome) VALUES (?)", (nome,))
-            conn.commit()
-            return cursor.lastrowid
+            cursor.execute("SELECT * FROM categorias ORDER BY nome")
+            return cursor.fetchall()
         except sqlite3.Error as e:
-            print(f"Erro ao adicionar categoria: {e}")
+            print(f"Erro ao buscar categorias: {e}")
             return None
         finally:
             if conn:
-                conn.close()
+                self._release_read_connection(conn)
 
-    def get_categories(self):
-        conn = self.get_connection()
+    @timed
+    def get_or_create_categories(self, nomes, with_created=False):
+        """
+        Retorna {nome: id} para os nomes dados, criando numa só transação
+        as categorias que ainda não existem. with_created=True retorna
+        (mapa, quantas foram criadas agora).
+        """
+        return self._write("get_or_create_categories", nomes, with_created)
+
+    def _op_get_or_create_categories(self, cursor, nomes, with_created=False):
+        nomes = list(set(nomes))
+        cursor.executemany("INSERT OR IGNORE INTO categorias (nome) VALUES (?)", [(n,) for n in nomes])
+        # só as inseridas contam (as ignoradas já existiam, talvez criadas por outra conexão)
+        criadas = cursor.rowcount
+        mapa = {}
+        for start in range(0, len(nomes), BULK_CHUNK_SIZE):
+            chunk = nomes[start:start + BULK_CHUNK_SIZE]
+            marks = ", ".join("?" * len(chunk))
+            cursor.execute(f"SELECT id, nome FROM categorias WHERE nome IN ({marks})", chunk)
+            mapa.update((row['nome'], row['id']) for row in cursor.fetchall())
+        return (mapa, criadas) if with_created else mapa
+
+    @timed
+    def get_category_stats(self, categoria_id=None):
+        """
+        Estatísticas de preço por categoria, lidas da tabela-resumo.
+        Com categoria_id, retorna só aquela categoria (ou None se não existir).
+        """
+        sql = """
+            SELECT
+                c.id AS categoria_id,
+                c.nome AS categoria_nome,
+                COALESCE(s.quantidade, 0) AS quantidade,
+                s.preco_min,
+                s.preco_max,
+                CASE WHEN s.quantidade > 0 THEN ROUND(s.preco_total / s.quantidade, 2) END AS preco_medio,
+                ROUND(COALESCE(s.preco_total, 0), 2) AS preco_total
+            FROM categorias c
+            LEFT JOIN categorias_stats s ON s.categoria_id = c.id
+        """
+        conn = self._read_connection()
+        if conn is None:
+            return None if categoria_id is not None else []
         try:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM categorias ORDER BY nome")
+            if categoria_id is not None:
+                cursor.execute(sql + " WHERE c.id = ?", (categoria_id,))
+                return cursor.fetchone()
+            cursor.execute(sql + " ORDER BY c.nome")
             return cursor.fetchall()
         except sqlite3.Error as e:
-            print(f"Erro ao buscar categorias: {e}")
-            return []
+            print(f"Erro ao buscar estatísticas: {e}")
+            return None if categoria_id is not None else []
         finally:
             if conn:
-                conn.close()
+                self._release_read_connection(conn)
 
-    def update_category(self, id, nome):
-        """Atualiza o nome de uma categoria existente."""
+    @timed
+    def check_category_stats(self):
+        """
+        Compara a tabela-resumo com os valores calculados direto de
+        'produtos'. Retorna a lista de divergências (vazia se estiver ok).
+        """
         conn = self.get_connection()
+        if conn is None:
+            return None
         try:
             cursor = conn.cursor()
-            cursor.execute("UPDATE categorias SET nome = ? WHERE id = ?", (nome, id))
-            conn.commit()
-            return cursor.rowcount > 0
+            cursor.execute("""
+                WITH real AS (
+                    SELECT categoria_id, COUNT(*) AS quantidade, SUM(preco) AS preco_total,
+                           MIN(preco) AS preco_min, MAX(preco) AS preco_max
+                    FROM produtos WHERE categoria_id IS NOT NULL
+                    GROUP BY categoria_id
+                )
+                SELECT c.id AS categoria_id,
+                       COALESCE(r.quantidade, 0) AS quantidade_real,
+                       COALESCE(s.quantidade, 0) AS quantidade_resumo,
+                       COALESCE(r.preco_total, 0) AS total_real,
+                       COALESCE(s.preco_total, 0) AS total_resumo,
+                       r.preco_min AS min_real, s.preco_min AS min_resumo,
+                       r.preco_max AS max_real, s.preco_max AS max_resumo
+                FROM categorias c
+                LEFT JOIN real r ON r.categoria_id = c.id
+                LEFT JOIN categorias_stats s ON s.categoria_id = c.id
+                WHERE COALESCE(r.quantidade, 0) != COALESCE(s.quantidade, 0)
+                   OR ABS(COALESCE(r.preco_total, 0) - COALESCE(s.preco_total, 0)) > 0.005
+                   OR r.preco_min IS NOT s.preco_min
+                   OR r.preco_max IS NOT s.preco_max
+            """)
+            return [dict(row) for row in cursor.fetchall()]
         except sqlite3.Error as e:
-            print(f"Erro ao atualizar categoria: {e}")
-            # retorna uma string de erro se for violação de chave única (nome repetido)
-            if "UNIQUE" in str(e).upper():
-                return "UNIQUE_VIOLATION"
-            return False
+            print(f"Erro ao verificar estatísticas: {e}")
+            return None
         finally:
             if conn:
-                conn.close()
+                self.release_connection(conn)
+
+    @timed
+    def rebuild_category_stats(self):
+        """Recalcula a tabela-resumo inteira a partir de 'produtos'."""
+        return self._write("rebuild_category_stats")
 
+    def _op_rebuild_category_stats(self, cursor):
+        cursor.execute("DELETE FROM categorias_stats")
+        cursor.execute(CATEGORY_STATS_REBUILD)
+        return True
+
+    @timed
+    def update_category(self, id, nome):
+        """Atualiza o nome de uma categoria existente."""
+        # nome repetido retorna "UNIQUE_VIOLATION" (ver _write_error)
+        return self._write("update_category", id, nome)
+
+    def _op_update_category(self, cursor, id, nome):
+        cursor.execute("UPDATE categorias SET nome = ? WHERE id = ?", (nome, id))
+        return cursor.rowcount > 0
+
+    @timed
     def delete_category(self, id):
         """Exclui uma categoria, se não estiver em uso por produtos."""
-        conn = self.get_connection()
+        return self._write("delete_category", id)
+
+    def _op_delete_category(self, cursor, id):
+        # verificação e exclusão no mesmo comando: nenhum produto pode entrar
+        # na categoria entre a checagem e o DELETE
+        cursor.execute("""
+            DELETE FROM categorias
+            WHERE id = ? AND NOT EXISTS (SELECT 1 FROM produtos WHERE categoria_id = ?)
+        """, (id, id))
+        if cursor.rowcount > 0:
+            return "SUCCESS"
+
+        # nada excluído: ou a categoria não existe ou está em uso
+        cursor.execute("SELECT 1 FROM categorias WHERE id = ?", (id,))
+        return "IN_USE" if cursor.fetchone() else "NOT_FOUND"
+
+    #  crud produtos ---------------------------------------------------------------------------------------------------
+
+    @timed
+    def add_product(self, nome, tamanho, preco, categoria_id):
+        return self._write("add_product", nome, tamanho, preco, categoria_id)
+
+    def _op_add_product(self, cursor, nome, tamanho, preco, categoria_id):
+        cursor.execute(
+            "INSERT INTO produtos (nome, tamanho, preco, categoria_id) VALUES (?, ?, ?, ?)",
+            (nome, tamanho, preco, categoria_id)
+        )
+        return cursor.lastrowid
+
+    @timed
+    def get_products(self, after=None, limit=None, categoria_id=None, tamanho=None,
+                     preco_min=None, preco_max=None, with_etag=False):
+        """
+        Retorna os produtos com o nome da categoria, ordenados por (nome, id).
+        Sem argumentos, retorna todos (comportamento original).
+
+        after: cursor (nome, id) do último produto da página anterior;
+               a consulta continua a partir dele (paginação por keyset).
+        limit: máximo de produtos retornados.
+        categoria_id, tamanho, preco_min, preco_max: filtros opcionais.
+        with_etag: se True, retorna (produtos, etag).
+        """
+        args = (after, limit, categoria_id, tamanho, preco_min, preco_max)
+        rows, etag = self._cached(("produtos",) + args, lambda: self._load_products(*args))
+        return (rows, etag) if with_etag else rows
+
+    def _load_products(self, after, limit, categoria_id, tamanho, preco_min, preco_max):
+        if self.snapshot is not None:
+            rows = self.snapshot.get_products(after, limit, categoria_id, tamanho, preco_min, preco_max)
+            if rows is not None:
+                return rows
+
+        where, params = _product_filters(categoria_id, tamanho, preco_min, preco_max, ordered=True)
+        if after is not None:
+            where.append("(p.nome, p.id) > (?, ?)")
+            params.extend(after)
+
+        sql = PRODUCT_SELECT
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY p.nome, p.id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        conn = self._read_connection()
+        if conn is None:
+            return None
         try:
             cursor = conn.cursor()
-            
-            # 1. Verifica se a categoria está em uso
-            cursor.execute("SELECT 1 FROM produtos WHERE categoria_id = ?", (id,))
-            if cursor.fetchone():
-                # Se encontrou (fetchone() não é None), a categoria está em uso
-                return "IN_USE"
-            
-            # 2. Se não estiver em uso, exclui
-            cursor.execute("DELETE FROM categorias WHERE id = ?", (id,))
-            conn.commit()
-            
-            # Retorna sucesso se uma linha foi afetada
-            return "SUCCESS" if cursor.rowcount > 0 else "NOT_FOUND"
-            
+            # JOIN para o nome da categoria----------------------------------
+            cursor.execute(sql, params)
+            return cursor.fetchall()
         except sqlite3.Error as e:
-            print(f"Erro ao deletar categoria: {e}")
-            return "ERROR"
+            print(f"Erro ao buscar produtos: {e}")
+            return None
         finally:
             if conn:
-                conn.close()
+                self._release_read_connection(conn)
 
-    #  crud produtos ---------------------------------------------------------------------------------------------------
+    def iter_products(self, chunk_size=1000, categoria_id=None, tamanho=None,
+                      preco_min=None, preco_max=None):
+        """
+        Gera os produtos em blocos de até chunk_size linhas (fetchmany),
+        sem carregar a tabela inteira na memória. Usa uma conexão própria,
+        fora do pool, aberta até o gerador terminar ou ser fechado: uma
+        exportação lenta (cliente lendo devagar) não tira conexões das
+        outras consultas.
+        """
+        where, params = _product_filters(categoria_id, tamanho, preco_min, preco_max, ordered=True)
+        sql = PRODUCT_SELECT
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY p.nome, p.id"
 
-    def add_product(self, nome, tamanho, preco, categoria_id):
-        conn = self.get_connection()
+        conn = None
         try:
+            conn = self._new_connection()
             cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO produtos (nome, tamanho, preco, categoria_id) VALUES (?, ?, ?, ?)",
-                (nome, tamanho, preco, categoria_id)
-            )
-            conn.commit()
-            return cursor.lastrowid
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
         except sqlite3.Error as e:
-            print(f"Erro ao adicionar produto: {e}")
-            return None
+            print(f"Erro ao exportar produtos: {e}")
         finally:
             if conn:
                 conn.close()
 
-    def get_products(self):
-        """Retorna todos os produtos com o nome da categoria."""
-        conn = self.get_connection()
+    @timed
+    def search_products(self, query, limit=20):
+        """
+        Busca produtos pelo nome (e nome da categoria) usando o índice FTS5.
+        Cada palavra da busca vale como prefixo ("cam azu" acha "Camiseta
+        Azul"), sem diferenciar acentos. Resultados ordenados por relevância
+        (bm25, com o nome do produto pesando mais que a categoria).
+        """
+        match = _fts_query(query)
+        if not match:
+            return []
+
+        conn = self._read_connection()
+        if conn is None:
+            return []
         try:
             cursor = conn.cursor()
-            # JOIN para o nome da categoria----------------------------------
             cursor.execute("""
                 SELECT 
                     p.id, 
@@ -160,57 +1051,503 @@ class Database:
                     p.preco, 
                     c.nome as categoria_nome,
                     p.categoria_id
-                FROM produtos p
+                FROM produtos_fts f
+                JOIN produtos p ON p.id = f.rowid
                 LEFT JOIN categorias c ON p.categoria_id = c.id
-                ORDER BY p.nome
-            """)
+                WHERE produtos_fts MATCH ?
+                ORDER BY bm25(produtos_fts, 10.0, 1.0)
+                LIMIT ?
+            """, (match, limit))
             return cursor.fetchall()
         except sqlite3.Error as e:
             print(f"Erro ao buscar produtos: {e}")
             return []
         finally:
             if conn:
-                conn.close()
+                self._release_read_connection(conn)
 
-    def update_product(self, id, nome, tamanho, preco, categoria_id):
+    @timed
+    def get_product_by_id(self, id):
+        """Retorna um produto (com o nome da categoria) pela chave primária, ou None."""
         conn = self.get_connection()
+        if conn is None:
+            return None
         try:
             cursor = conn.cursor()
-            cursor.execute(
+            cursor.execute(PRODUCT_SELECT + " WHERE p.id = ?", (id,))
+            return cursor.fetchone()
+        except sqlite3.Error as e:
+            print(f"Erro ao buscar produto: {e}")
+            return None
+        finally:
+            if conn:
+                self.release_connection(conn)
+
+    @timed
+    def update_product(self, id, nome, tamanho, preco, categoria_id):
+        return self._write("update_product", id, nome, tamanho, preco, categoria_id)
+
+    def _op_update_product(self, cursor, id, nome, tamanho, preco, categoria_id):
+        cursor.execute(
+            """
+            UPDATE produtos 
+            SET nome = ?, tamanho = ?, preco = ?, categoria_id = ?
+            WHERE id = ?
+            """,
+            (nome, tamanho, preco, categoria_id, id)
+        )
+        return cursor.rowcount > 0  #retorna true
+
+    @timed
+    def delete_product(self, id):
+        return self._write("delete_product", id)
+
+    def _op_delete_product(self, cursor, id):
+        cursor.execute("DELETE FROM produtos WHERE id = ?", (id,))
+        return cursor.rowcount > 0 #retorna valor true
+
+    # operações em lote -----------------------------------------------------------------------------------
+    # Cada método roda em UMA transação (um único commit/fsync) com
+    # executemany. Os itens inválidos são separados antes, para que o lote
+    # não seja abortado por uma única linha ruim; o retorno é uma lista de
+    # resultados na mesma ordem da entrada:
+    #   {"index": i, "id": id_ou_None, "status": "SUCCESS" | "INVALID_CATEGORY" | "NOT_FOUND"}
+    # Em caso de erro do banco o lote inteiro é desfeito e retorna None.
+
+    def _existing_ids(self, cursor, table, ids):
+        """Retorna o conjunto dos ids (de 'table') que existem no banco."""
+        found = set()
+        ids = list({i for i in ids if i is not None})
+        for start in range(0, len(ids), BULK_CHUNK_SIZE):
+            chunk = ids[start:start + BULK_CHUNK_SIZE]
+            marks = ", ".join("?" * len(chunk))
+            cursor.execute(f"SELECT id FROM {table} WHERE id IN ({marks})", chunk)
+            found.update(row[0] for row in cursor.fetchall())
+        return found
+
+    @contextlib.contextmanager
+    def _fts_bulk(self, cursor, count, *triggers):
+        """
+        Com 'count' linhas ou mais (FTS_BULK_MIN_ROWS), desliga os 'triggers'
+        do FTS durante o bloco e os recria no fim, na mesma transação.
+        Produz True se desligou: aí quem chamou atualiza produtos_fts por
+        conta própria (ver _fts_reindex). Se o bloco der erro, o rollback da
+        transação (ou do savepoint) desfaz o DROP.
+        """
+        if count < FTS_BULK_MIN_ROWS:
+            yield False
+            return
+        for name in triggers:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        yield True
+        for name in triggers:
+            cursor.execute(FTS_TRIGGERS[name])
+
+    def _fts_reindex(self, cursor, ids):
+        """Regrava no FTS os produtos 'ids' (os que não existem mais só saem)."""
+        ids = list(ids)
+        for start in range(0, len(ids), BULK_CHUNK_SIZE):
+            chunk = ids[start:start + BULK_CHUNK_SIZE]
+            marks = ", ".join("?" * len(chunk))
+            cursor.execute(f"DELETE FROM produtos_fts WHERE rowid IN ({marks})", chunk)
+            cursor.execute(f"{FTS_INDEX_SELECT} WHERE p.id IN ({marks})", chunk)
+
+    @timed
+    def add_products(self, produtos, raise_errors=False):
+        """
+        Insere vários produtos. produtos: lista de (nome, tamanho, preco, categoria_id).
+        raise_errors: levanta o erro do banco em vez de retornar None.
+        """
+        return self._write("add_products", produtos, raise_errors=raise_errors)
+
+    def _op_add_products(self, cursor, produtos):
+        categorias = self._existing_ids(cursor, "categorias", [p[3] for p in produtos])
+
+        results = []
+        rows = []
+        for i, (nome, tamanho, preco, categoria_id) in enumerate(produtos):
+            if categoria_id is not None and categoria_id not in categorias:
+                results.append({"index": i, "id": None, "status": "INVALID_CATEGORY"})
+            else:
+                results.append({"index": i, "id": None, "status": "SUCCESS"})
+                rows.append((nome, tamanho, preco, categoria_id))
+
+        if rows:
+            with self._fts_bulk(cursor, len(rows), "produtos_fts_insert") as bulk:
+                cursor.executemany(
+                    "INSERT INTO produtos (nome, tamanho, preco, categoria_id) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                # com a trava de escrita (BEGIN IMMEDIATE) os ids do lote são
+                # consecutivos, terminando em last_insert_rowid()
+                cursor.execute("SELECT last_insert_rowid()")
+                last_id = cursor.fetchone()[0]
+                next_id = last_id - len(rows) + 1
+                if bulk:
+                    cursor.execute(f"{FTS_INDEX_SELECT} WHERE p.id BETWEEN ? AND ?", (next_id, last_id))
+            for result in results:
+                if result["status"] == "SUCCESS":
+                    result["id"] = next_id
+                    next_id += 1
+        return results
+
+    @timed
+    def update_products(self, produtos):
+        """Atualiza vários produtos. produtos: lista de (id, nome, tamanho, preco, categoria_id)."""
+        return self._write("update_products", produtos)
+
+    def _op_update_products(self, cursor, produtos):
+        existentes = self._existing_ids(cursor, "produtos", [p[0] for p in produtos])
+        categorias = self._existing_ids(cursor, "categorias", [p[4] for p in produtos])
+
+        results = []
+        rows = []
+        for i, (id, nome, tamanho, preco, categoria_id) in enumerate(produtos):
+            if id not in existentes:
+                status = "NOT_FOUND"
+            elif categoria_id is not None and categoria_id not in categorias:
+                status = "INVALID_CATEGORY"
+            else:
+                status = "SUCCESS"
+                rows.append((nome, tamanho, preco, categoria_id, id))
+            results.append({"index": i, "id": id, "status": status})
+
+        with self._fts_bulk(cursor, len(rows), "produtos_fts_update") as bulk:
+            cursor.executemany(
                 """
                 UPDATE produtos 
                 SET nome = ?, tamanho = ?, preco = ?, categoria_id = ?
                 WHERE id = ?
                 """,
-                (nome, tamanho, preco, categoria_id, id)
+                rows
             )
-            conn.commit()
-            return cursor.rowcount > 0  #retorna true
+            if bulk:
+                self._fts_reindex(cursor, {row[4] for row in rows})
+        return results
+
+    @timed
+    def delete_products(self, ids):
+        """Exclui vários produtos pelo id."""
+        return self._write("delete_products", ids)
+
+    def _op_delete_products(self, cursor, ids):
+        existentes = self._existing_ids(cursor, "produtos", ids)
+
+        results = []
+        for i, id in enumerate(ids):
+            status = "SUCCESS" if id in existentes else "NOT_FOUND"
+            results.append({"index": i, "id": id, "status": status})
+            # um id repetido só é excluído uma vez
+            existentes.discard(id)
+
+        deleted = [r["id"] for r in results if r["status"] == "SUCCESS"]
+        with self._fts_bulk(cursor, len(deleted), "produtos_fts_delete") as bulk:
+            cursor.executemany("DELETE FROM produtos WHERE id = ?", [(id,) for id in deleted])
+            if bulk:
+                self._fts_reindex(cursor, deleted)
+        return results
+
+    @timed
+    def move_products(self, de_categoria_id, para_categoria_id):
+        """Move todos os produtos de uma categoria para outra. Retorna quantos foram movidos."""
+        return self._write("move_products", de_categoria_id, para_categoria_id)
+
+    def _op_move_products(self, cursor, de_categoria_id, para_categoria_id):
+        cursor.execute("SELECT id FROM produtos WHERE categoria_id = ?", (de_categoria_id,))
+        ids = [row[0] for row in cursor.fetchall()]
+        with self._fts_bulk(cursor, len(ids), "produtos_fts_update") as bulk:
+            cursor.execute(
+                "UPDATE produtos SET categoria_id = ? WHERE categoria_id = ?",
+                (para_categoria_id, de_categoria_id)
+            )
+            moved = cursor.rowcount
+            if bulk:
+                self._fts_reindex(cursor, ids)
+        return moved
+
+    # reajuste de preços -----------------------------------------------------------------------------------
+    # Cada regra é um único UPDATE com os filtros no WHERE (set-based, sem
+    # ler os produtos para o Python); todas as regras rodam na mesma
+    # transação. Os preços anteriores dos produtos afetados ficam numa
+    # tabela temporária, para a distribuição antes/depois.
+
+    @timed
+    def reprice_products(self, regras, dry_run=False):
+        """
+        Reajusta os preços por regras, aplicadas em ordem (um produto que
+        casa com duas regras recebe as duas). Cada regra é um dict com:
+
+        filtros (opcionais, todos combinados com AND): categoria_id,
+            tamanho, nome (padrão do LIKE, ex.: "Camiseta%"), preco_min,
+            preco_max. Sem filtros, a regra vale para o catálogo inteiro.
+        ajuste (exatamente um): percentual (ex.: -15 = 15% de desconto) ou
+            valor (somado ao preço, ex.: -5.0).
+        terminacao (opcional): centavos finais do preço, ex.: 0.90 arredonda
+            para o X,90 mais próximo (19,99 -> 19,90; 20,60 -> 20,90).
+
+        Nenhum preço fica abaixo de 0,01. Com dry_run=True nada é gravado.
+        Retorna {"dry_run", "afetados", "regras": [afetados por regra],
+        "antes", "depois"}, com a distribuição dos preços dos produtos
+        afetados (ver _price_distribution).
+        """
+        return self._write("reprice_products", self._check_reprice_rules(regras), dry_run)
+
+    def _check_reprice_rules(self, regras):
+        """Valida as regras de reajuste e normaliza para [(filtros, percentual, valor, terminacao)]."""
+        checked = []
+        for i, regra in enumerate(regras):
+            regra = dict(regra)
+            percentual, valor = regra.pop("percentual", None), regra.pop("valor", None)
+            terminacao = regra.pop("terminacao", None)
+            if (percentual is None) == (valor is None):
+                raise ValueError(f"Regra {i}: informe 'percentual' ou 'valor' (um dos dois).")
+            if percentual is not None and percentual <= -100:
+                raise ValueError(f"Regra {i}: percentual deve ser maior que -100.")
+            if terminacao is not None:
+                # entra no SQL como literal: só números
+                terminacao = float(terminacao)
+                if not 0 <= terminacao < 1:
+                    raise ValueError(f"Regra {i}: terminacao deve estar entre 0 e 0.99.")
+            filtros = {k: v for k, v in regra.items() if v is not None}
+            desconhecidos = set(filtros) - {"categoria_id", "tamanho", "nome", "preco_min", "preco_max"}
+            if desconhecidos:
+                raise ValueError(f"Regra {i}: campos desconhecidos: {', '.join(sorted(desconhecidos))}.")
+            checked.append((filtros, percentual, valor, terminacao))
+        return checked
+
+    def _op_reprice_products(self, cursor, regras, dry_run):
+        cursor.execute("SAVEPOINT reajuste")
+        cursor.execute("CREATE TEMP TABLE reajuste (id INTEGER PRIMARY KEY, preco_antes REAL NOT NULL)")
+
+        afetados = []
+        for filtros, percentual, valor, terminacao in regras:
+            nome = filtros.get("nome")
+            where, params = _product_filters(
+                filtros.get("categoria_id"), filtros.get("tamanho"),
+                filtros.get("preco_min"), filtros.get("preco_max"))
+            if nome is not None:
+                where.append("p.nome LIKE ?")
+                params.append(nome)
+            where_sql = " WHERE " + " AND ".join(where) if where else ""
+
+            if percentual is not None:
+                novo, ajuste = "p.preco * (1 + ? / 100.0)", percentual
+            else:
+                novo, ajuste = "p.preco + ?", valor
+            novo = f"ROUND({novo}, 2)"
+            if terminacao is not None:
+                # inteiro mais próximo de (preço - terminação), mais a terminação
+                novo = f"ROUND(ROUND({novo} - {terminacao!r}) + {terminacao!r}, 2)"
+
+            # guarda o preço original (a primeira regra que pegou o produto)
+            cursor.execute(f"INSERT OR IGNORE INTO temp.reajuste (id, preco_antes) "
+                           f"SELECT p.id, p.preco FROM produtos p{where_sql}", params)
+            cursor.execute(f"UPDATE produtos AS p SET preco = MAX({novo}, 0.01){where_sql}", [ajuste] + params)
+            afetados.append(cursor.rowcount)
+
+        antes = self._price_distribution(cursor, "r.preco_antes")
+        result = {
+            "dry_run": dry_run,
+            "afetados": antes["quantidade"],
+            "regras": afetados,
+            "antes": antes,
+            "depois": self._price_distribution(cursor, "p.preco"),
+        }
+        if dry_run:
+            # desfaz os UPDATEs (e a tabela temporária) sem desfazer o resto da transação
+            cursor.execute("ROLLBACK TO reajuste")
+        else:
+            cursor.execute("DROP TABLE temp.reajuste")
+        cursor.execute("RELEASE reajuste")
+        return result
+
+    def _price_distribution(self, cursor, column):
+        """
+        Distribuição de 'column' nos produtos da tabela temporária do
+        reajuste: quantidade, mínimo, máximo, média e quantos caem em cada
+        faixa de REPRICE_BUCKETS ({"ate": limite, "quantidade": n}; a
+        última faixa tem "ate": None).
+        """
+        faixas, anterior = [], None
+        for limite in REPRICE_BUCKETS + (None,):
+            cond = [f"{column} > {anterior!r}" if anterior is not None else None,
+                    f"{column} <= {limite!r}" if limite is not None else None]
+            faixas.append(f"SUM(CASE WHEN {' AND '.join(c for c in cond if c)} THEN 1 ELSE 0 END)")
+            anterior = limite
+        cursor.execute(f"""
+            SELECT COUNT(*), MIN({column}), MAX({column}), ROUND(AVG({column}), 2), {", ".join(faixas)}
+            FROM temp.reajuste r
+            JOIN produtos p ON p.id = r.id
+        """)
+        row = cursor.fetchone()
+        return {
+            "quantidade": row[0],
+            "preco_min": row[1],
+            "preco_max": row[2],
+            "preco_medio": row[3],
+            "faixas": [{"ate": limite, "quantidade": n or 0}
+                       for limite, n in zip(REPRICE_BUCKETS + (None,), row[4:])],
+        }
+
+    # lote de operações -----------------------------------------------------------------------------------
+
+    @timed
+    def run_batch(self, operations):
+        """
+        Executa uma lista ordenada de escritas [(nome, args), ...] (nomes de
+        WRITE_OPERATIONS) numa única transação: tudo ou nada. Retorna
+        {"status": "SUCCESS", "resultados": [...]} ou, se alguma operação
+        falhar (erro do banco ou resultado como False, "NOT_FOUND",
+        "IN_USE"), {"status": "ROLLED_BACK", "index": i, "resultados": [...]}
+        com os resultados até a operação que falhou, sem nada gravado.
+        """
+        return self._write("run_batch", self._check_batch(operations))
+
+    def _check_batch(self, operations):
+        """Valida os nomes das operações de um lote e normaliza para [(nome, args)]."""
+        checked = []
+        for name, args in operations:
+            if name not in WRITE_OPERATIONS or name == "run_batch":
+                raise ValueError(f"Operação desconhecida: {name}")
+            checked.append((name, tuple(args)))
+        return checked
+
+    def _op_run_batch(self, cursor, operations):
+        cursor.execute("SAVEPOINT lote")
+        results = []
+        for i, (name, args) in enumerate(operations):
+            try:
+                result = getattr(self, "_op_" + name)(cursor, *args)
+            except sqlite3.Error as e:
+                result = self._write_error(name, e)
+            results.append(result)
+            if not _write_succeeded(result):
+                cursor.execute("ROLLBACK TO lote")
+                cursor.execute("RELEASE lote")
+                return {"status": "ROLLED_BACK", "index": i, "resultados": results}
+        cursor.execute("RELEASE lote")
+        return {"status": "SUCCESS", "resultados": results}
+
+    # registro de alterações -------------------------------------------------------------------------------
+
+    def _change_version(self, cursor):
+        # sqlite_sequence guarda a maior versão já gravada, mesmo após a poda
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'alteracoes'")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    @timed
+    def get_change_version(self):
+        """Versão mais recente do registro de alterações (0 se vazio)."""
+        conn = self.get_connection()
+        if conn is None:
+            return None
+        try:
+            return self._change_version(conn.cursor())
         except sqlite3.Error as e:
-            print(f"Erro ao atualizar produto: {e}")
-            return False
+            print(f"Erro ao buscar versão das alterações: {e}")
+            return None
         finally:
             if conn:
-                conn.close()
+                self.release_connection(conn)
 
-    def delete_product(self, id):
+    @timed
+    def get_changes(self, since=0, limit=1000):
+        """
+        Alterações com versão maior que 'since', em ordem, até 'limit'.
+        Cada uma traz o estado atual do registro em 'dados' (None se ele já
+        foi excluído). Retorna {"versao", "alteracoes", "mais"}, onde
+        'versao' é o valor a passar como 'since' na próxima chamada, ou
+        "EXPIRED" se as versões depois de 'since' já foram podadas (o cliente
+        precisa recarregar as listas inteiras).
+        """
         conn = self.get_connection()
+        if conn is None:
+            return None
         try:
             cursor = conn.cursor()
-            cursor.execute("DELETE FROM produtos WHERE id = ?", (id,))
-            conn.commit()
-            return cursor.rowcount > 0 #retorna valor true
+            # uma transação só: o registro e os dados lidos no mesmo commit
+            cursor.execute("BEGIN")
+            ultima = self._change_version(cursor)
+            cursor.execute("SELECT MIN(versao) FROM alteracoes")
+            primeira = cursor.fetchone()[0]
+            if since < ultima and (primeira is None or since + 1 < primeira):
+                return "EXPIRED"
+
+            cursor.execute(
+                "SELECT versao, tabela, registro_id, operacao FROM alteracoes "
+                "WHERE versao > ? ORDER BY versao LIMIT ?",
+                (since, limit + 1)
+            )
+            rows = cursor.fetchall()
+            mais = len(rows) > limit
+            rows = rows[:limit]
+
+            dados = {"produtos": {}, "categorias": {}}
+            for tabela, select in (("produtos", PRODUCT_SELECT + " WHERE p.id IN ({})"),
+                                   ("categorias", "SELECT id, nome FROM categorias WHERE id IN ({})")):
+                ids = sorted({r["registro_id"] for r in rows if r["tabela"] == tabela})
+                for start in range(0, len(ids), BULK_CHUNK_SIZE):
+                    chunk = ids[start:start + BULK_CHUNK_SIZE]
+                    cursor.execute(select.format(", ".join("?" * len(chunk))), chunk)
+                    dados[tabela].update((row["id"], dict(row)) for row in cursor.fetchall())
+
+            alteracoes = [{
+                "versao": r["versao"],
+                "tabela": r["tabela"],
+                "id": r["registro_id"],
+                "operacao": r["operacao"],
+                "dados": dados[r["tabela"]].get(r["registro_id"]),
+            } for r in rows]
+            return {
+                "versao": rows[-1]["versao"] if rows else max(since, ultima),
+                "alteracoes": alteracoes,
+                "mais": mais,
+            }
         except sqlite3.Error as e:
-            print(f"Erro ao deletar produto: {e}")
-            return False
+            print(f"Erro ao buscar alterações: {e}")
+            return None
         finally:
             if conn:
-                conn.close()
+                self.release_connection(conn)
+
+    @timed
+    def prune_changes(self, keep=100000):
+        """Apaga as alterações antigas, mantendo as 'keep' mais recentes."""
+        return self._write("prune_changes", keep)
+
+    def _op_prune_changes(self, cursor, keep=100000):
+        cursor.execute("DELETE FROM alteracoes WHERE versao <= ?", (self._change_version(cursor) - keep,))
+        return cursor.rowcount
 
 #  iniciar o db: adicionar categorias
 if __name__ == "__main__":
+    import sys
+
     db = Database()
     print("Banco de dados e tabelas verificados/criados.")
+
+    # python db.py stats-check   -> verifica o resumo por categoria
+    # python db.py stats-rebuild -> recalcula o resumo por categoria
+    if len(sys.argv) > 1 and sys.argv[1] == "stats-check":
+        divergencias = db.check_category_stats()
+        if divergencias:
+            print(f"{len(divergencias)} categoria(s) com resumo divergente:")
+            for d in divergencias:
+                print(f"- {d}")
+            sys.exit(1)
+        print("Resumo por categoria consistente.")
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "stats-rebuild":
+        sys.exit(0 if db.rebuild_category_stats() else 1)
+
+    # python db.py changes-prune [N] -> mantém só as N alterações mais recentes
+    if len(sys.argv) > 1 and sys.argv[1] == "changes-prune":
+        removidas = db.prune_changes(int(sys.argv[2]) if len(sys.argv) > 2 else 100000)
+        if removidas is None:
+            sys.exit(1)
+        print(f"{removidas} alteração(ões) removida(s).")
+        sys.exit(0)
     
     # adicionando categorias padrão se não existirem
     if not db.get_categories():
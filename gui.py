@@ -1,8 +1,156 @@
 # gui.py
+import queue
+import threading
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from tkinter import ttk, messagebox
 from db import Database
 
+# Quantos produtos carregar por vez na lista principal. As próximas
+# páginas só são buscadas quando o usuário rola perto do fim da lista.
+PAGE_SIZE = 200
+
+
+def sync_treeview(tree, current, new_rows):
+    """
+    Atualiza uma Treeview por diferença, sem apagar e reinserir tudo.
+
+    tree: a Treeview (os itens usam o id do registro como iid).
+    current: dicionário {iid: values} com o que está na tela (é atualizado).
+    new_rows: lista ordenada de (iid, values) que a Treeview deve mostrar.
+
+    Só os itens que mudaram são inseridos, alterados, movidos ou excluídos.
+    Retorna o número de itens alterados.
+    """
+    changes = 0
+    new_ids = {iid for iid, _ in new_rows}
+
+    # 1. remove o que não existe mais
+    removed = [iid for iid in current if iid not in new_ids]
+    if removed:
+        tree.delete(*removed)
+        for iid in removed:
+            del current[iid]
+        changes += len(removed)
+
+    # 2. percorre na ordem nova; 'order' espelha a ordem atual da árvore
+    order = list(tree.get_children())
+    for index, (iid, values) in enumerate(new_rows):
+        if index < len(order) and order[index] == iid:
+            if current[iid] != values:
+                tree.item(iid, values=values)
+                current[iid] = values
+                changes += 1
+        elif iid in current:
+            # mudou de posição (ex.: produto renomeado)
+            tree.move(iid, "", index)
+            order.remove(iid)
+            order.insert(index, iid)
+            if current[iid] != values:
+                tree.item(iid, values=values)
+                current[iid] = values
+            changes += 1
+        else:
+            tree.insert("", index, iid=iid, values=values)
+            order.insert(index, iid)
+            current[iid] = values
+            changes += 1
+    return changes
+
+class DbWorker:
+    """
+    Executa as chamadas ao banco numa thread separada, para a janela não
+    congelar em consultas lentas ou esperando uma trava do SQLite (ex.: a
+    API gravando no mesmo loja.db).
+
+    Os resultados voltam por uma fila thread-safe, esvaziada no thread do
+    Tk por root.after(); os callbacks sempre rodam no thread do Tk.
+
+    Pedidos com a mesma 'key' (ex.: "produtos") são agrupados: se já existe
+    um igual esperando na fila, o novo só substitui os callbacks dele; e o
+    resultado de um pedido que ficou velho (chegou outro depois) é descartado.
+    """
+
+    POLL_MS = 50
+
+    def __init__(self, root, on_busy=None):
+        """
+        root: a janela Tk.
+        on_busy: função chamada com True/False quando o worker fica
+                 ocupado/livre (para o indicador de carregamento).
+        """
+        self.root = root
+        self.on_busy = on_busy
+        # uma thread só: as operações do banco rodam na ordem em que foram pedidas
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gui-db")
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._queued = {}  # key -> pedido ainda não iniciado
+        self._latest = {}  # key -> geração do pedido mais recente
+        self._pending = 0
+        self._closed = False
+        self.root.after(self.POLL_MS, self._poll)
+
+    def submit(self, fn, *args, on_done=None, on_error=None, key=None):
+        """Agenda fn(*args) no worker; on_done(resultado) / on_error(exc) rodam no Tk."""
+        with self._lock:
+            job = {"fn": fn, "args": args, "on_done": on_done, "on_error": on_error, "key": key}
+            if key is not None:
+                job["gen"] = self._latest.get(key, 0) + 1
+                self._latest[key] = job["gen"]
+                queued = self._queued.get(key)
+                if queued is not None:
+                    # já tem um igual esperando: ele roda com os dados novos
+                    queued.update(job)
+                    return
+                self._queued[key] = job
+
+        self._pending += 1
+        if self._pending == 1 and self.on_busy:
+            self.on_busy(True)
+        self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        """Roda no thread do worker."""
+        with self._lock:
+            if job["key"] is not None:
+                self._queued.pop(job["key"], None)
+            fn, args = job["fn"], job["args"]
+        try:
+            self._results.put((job, fn(*args), None))
+        except Exception as e:
+            self._results.put((job, None, e))
+
+    def _poll(self):
+        """Roda no thread do Tk: entrega os resultados prontos."""
+        if self._closed:
+            return
+        while True:
+            try:
+                job, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            if self._pending == 0 and self.on_busy:
+                self.on_busy(False)
+
+            # resultado velho: já existe um pedido mais novo com a mesma key
+            if job["key"] is not None and job["gen"] != self._latest.get(job["key"]):
+                continue
+            if error is not None:
+                if job["on_error"]:
+                    job["on_error"](error)
+            elif job["on_done"]:
+                job["on_done"](result)
+        self.root.after(self.POLL_MS, self._poll)
+
+    def shutdown(self):
+        """Para de entregar resultados e encerra a thread (sem esperar)."""
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
 #
 # pop up janelas-
 #
@@ -29,7 +177,9 @@ class CategoryWindow(tk.Toplevel):
         
         self.db = db
         self.main_app_ref = main_app_ref # Referência à 'App' principal
+        self.worker = main_app_ref.worker # Executa as chamadas ao banco
         self.selected_category_id = None
+        self.category_rows = {} # {iid: values} do que está na Treeview
 
         # wdgets --------------------------------------------------------------------
         form_frame = ttk.Frame(self, padding="10")
@@ -76,14 +226,27 @@ class CategoryWindow(tk.Toplevel):
 
     def load_categories_list(self):
         """Carrega as categorias do DB para a Treeview desta janela."""
-        # limpa a lista
-        for i in self.tree_cat.get_children():
-            self.tree_cat.delete(i)
-        
-        # busca e insere
-        categories = self.db.get_categories()
-        for cat in categories:
-            self.tree_cat.insert("", tk.END, values=(cat['id'], cat['nome']))
+        self.worker.submit(self.db.get_categories, on_done=self._apply_categories_list,
+                           on_error=self._db_error, key="categorias_janela")
+
+    def _apply_categories_list(self, categories):
+        # a janela pode ter sido fechada enquanto a consulta rodava
+        if not self.winfo_exists():
+            return
+        # aplica só as diferenças
+        sync_treeview(self.tree_cat, self.category_rows, [
+            (str(cat['id']), (cat['id'], cat['nome'])) for cat in categories
+        ])
+
+    def _db_error(self, error):
+        if self.winfo_exists():
+            messagebox.showerror("Erro", f"Erro no banco de dados: {error}", parent=self)
+
+    def _category_changed(self):
+        """Depois de uma alteração: recarrega a lista e o combobox principal."""
+        self.load_categories_list() # Att a lista nesta janela
+        self.clear_category_fields()
+        self.refresh_main_app_combobox() # att combobox principal
     
     def on_category_select(self, event):
         """Chamado quando um item é selecionado na Treeview."""
@@ -130,15 +293,16 @@ class CategoryWindow(tk.Toplevel):
             messagebox.showwarning("Campo Vazio", "O nome da categoria não pode estar vazio.", parent=self)
             return
         
-        new_id = self.db.add_category(nome)
-        
-        if new_id:
-            messagebox.showinfo("Sucesso", f"Categoria '{nome}' adicionada.", parent=self)
-            self.load_categories_list() # Att a lista nesta janela
-            self.clear_category_fields()
-            self.refresh_main_app_combobox() # att combobox principal
-        else:
-            messagebox.showerror("Erro", f"A categoria '{nome}' já existe ou ocorreu um erro.", parent=self)
+        def done(new_id):
+            if not self.winfo_exists():
+                return
+            if new_id:
+                messagebox.showinfo("Sucesso", f"Categoria '{nome}' adicionada.", parent=self)
+                self._category_changed()
+            else:
+                messagebox.showerror("Erro", f"A categoria '{nome}' já existe ou ocorreu um erro.", parent=self)
+
+        self.worker.submit(self.db.add_category, nome, on_done=done, on_error=self._db_error)
 
     def update_category_gui(self):
         """Botão Atualizar: Atualiza categoria selecionada."""
@@ -147,17 +311,21 @@ class CategoryWindow(tk.Toplevel):
             messagebox.showwarning("Dados Inválidos", "Selecione uma categoria e insira um novo nome.", parent=self)
             return
 
-        result = self.db.update_category(self.selected_category_id, nome)
-        
-        if result == "UNIQUE_VIOLATION":
-            messagebox.showerror("Erro", f"A categoria '{nome}' já existe.", parent=self)
-        elif result:
-            messagebox.showinfo("Sucesso", "Categoria atualizada.", parent=self)
-            self.load_categories_list() # Att a lista nesta janela
-            self.clear_category_fields()
-            self.refresh_main_app_combobox() # att combobox principal
-        else:
-            messagebox.showerror("Erro", "Não foi possível atualizar a categoria.", parent=self)
+        def done(result):
+            if not self.winfo_exists():
+                return
+            if result == "UNIQUE_VIOLATION":
+                messagebox.showerror("Erro", f"A categoria '{nome}' já existe.", parent=self)
+            elif result:
+                messagebox.showinfo("Sucesso", "Categoria atualizada.", parent=self)
+                self._category_changed()
+                # o nome da categoria aparece na lista de produtos
+                self.main_app_ref.load_products()
+            else:
+                messagebox.showerror("Erro", "Não foi possível atualizar a categoria.", parent=self)
+
+        self.worker.submit(self.db.update_category, self.selected_category_id, nome,
+                           on_done=done, on_error=self._db_error)
 
     def delete_category_gui(self):
         """Botão Excluir: Exclui categoria selecionada."""
@@ -169,17 +337,19 @@ class CategoryWindow(tk.Toplevel):
         if not messagebox.askyesno("Confirmar Exclusão", f"Tem certeza que deseja excluir a categoria ID {self.selected_category_id}?\n\n(Isso só funcionará se não houver produtos nela.)", parent=self):
             return
 
-        result = self.db.delete_category(self.selected_category_id)
-        
-        if result == "SUCCESS":
-            messagebox.showinfo("Sucesso", "Categoria excluída.", parent=self)
-            self.load_categories_list() # Att a lista nesta janela
-            self.clear_category_fields()
-            self.refresh_main_app_combobox() # Attt combobox principal
-        elif result == "IN_USE":
-            messagebox.showerror("Erro", "Não é possível excluir. Esta categoria está sendo usada por produtos.", parent=self)
-        else: # NOT_FOUND ou ERROR
-            messagebox.showerror("Erro", "Não foi possível excluir a categoria.", parent=self)
+        def done(result):
+            if not self.winfo_exists():
+                return
+            if result == "SUCCESS":
+                messagebox.showinfo("Sucesso", "Categoria excluída.", parent=self)
+                self._category_changed()
+            elif result == "IN_USE":
+                messagebox.showerror("Erro", "Não é possível excluir. Esta categoria está sendo usada por produtos.", parent=self)
+            else: # NOT_FOUND ou ERROR
+                messagebox.showerror("Erro", "Não foi possível excluir a categoria.", parent=self)
+
+        self.worker.submit(self.db.delete_category, self.selected_category_id,
+                           on_done=done, on_error=self._db_error)
 
 
 #
@@ -201,8 +371,18 @@ class App:
         # Referência para a janela de categorias (para evitar duplicação)
         self.category_win = None
 
+        # Estado da lista de produtos (carregada por páginas)
+        self.product_rows = {}   # {iid: values} do que está na Treeview
+        self.next_cursor = None  # (nome, id) do último produto carregado
+        self.has_more = False    # existem produtos além dos carregados?
+        self.loading_more = False # próxima página já agendada
+
         # --- Widgets ---
         self.create_widgets()
+
+        # --- Banco em segundo plano ---
+        self.worker = DbWorker(self.root, on_busy=self.set_busy)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # --- Carregamento Inicial ---
         self.load_categories()
@@ -280,7 +460,8 @@ class App:
 
         # Scrollbar
         scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscroll=scrollbar.set)
+        self.scrollbar = scrollbar
+        self.tree.configure(yscroll=self.on_tree_scroll)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
@@ -288,8 +469,14 @@ class App:
         self.tree.bind("<<TreeviewSelect>>", self.on_item_select)
 
         # --- Label de Feedback ---
-        self.status_label = ttk.Label(self.root, text="Bem-vindo!", relief=tk.SUNKEN, anchor=tk.W)
-        self.status_label.pack(side=tk.BOTTOM, fill=tk.X, ipady=5)
+        status_frame = ttk.Frame(self.root)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+
+        # Indicador de "carregando" (aparece enquanto o banco trabalha)
+        self.busy_bar = ttk.Progressbar(status_frame, mode="indeterminate", length=100)
+
+        self.status_label = ttk.Label(status_frame, text="Bem-vindo!", relief=tk.SUNKEN, anchor=tk.W)
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=5)
 
     # --- Funções de Evento e Lógica ---
 
@@ -303,11 +490,34 @@ class App:
             self.category_win.lift() # Traz a janela para frente se já estiver aberta
 
 
+    def set_busy(self, busy):
+        """Mostra/esconde o indicador de carregamento."""
+        if busy:
+            self.busy_bar.pack(side=tk.RIGHT, padx=5)
+            self.busy_bar.start(10)
+            self.root.config(cursor="watch")
+        else:
+            self.busy_bar.stop()
+            self.busy_bar.pack_forget()
+            self.root.config(cursor="")
+
+    def on_close(self):
+        """Fecha a janela sem esperar consultas em andamento."""
+        self.worker.shutdown()
+        self.root.destroy()
+
     def load_categories(self):
         """Carrega as categorias do DB para o Combobox."""
+        self.worker.submit(
+            self.db.get_categories,
+            on_done=self._apply_categories,
+            on_error=lambda e: self.show_feedback(f"Erro ao carregar categorias: {e}", "error"),
+            key="categorias"
+        )
+
+    def _apply_categories(self, categories_data):
         try:
             self.categories = {} # Limpa o dicionário
-            categories_data = self.db.get_categories()
             category_names = []
             
             for cat in categories_data:
@@ -323,34 +533,85 @@ class App:
         except Exception as e:
             self.show_feedback(f"Erro ao carregar categorias: {e}", "error")
 
+    def product_values(self, product):
+        """Formata um produto do DB como (iid, values) da Treeview."""
+        # Formata o preço
+        preco_formatado = f"{product['preco']:.2f}"
+        categoria_nome = product['categoria_nome'] if product['categoria_nome'] else "Sem Categoria"
+        return str(product['id']), (
+            product['id'],
+            product['nome'],
+            product['tamanho'] or "",
+            preco_formatado,
+            categoria_nome
+        )
+
     def load_products(self):
-        """Carrega os produtos do DB para a Treeview."""
+        """
+        Atualiza a Treeview com os produtos do DB.
+        Rebusca só a faixa já carregada (no mínimo uma página) e aplica as
+        diferenças, em vez de apagar e reinserir o catálogo inteiro.
+        """
+        count = max(PAGE_SIZE, len(self.product_rows))
+        self.worker.submit(
+            # Busca um a mais para saber se existe próxima página
+            partial(self.db.get_products, limit=count + 1),
+            on_done=lambda products: self._apply_products(products, count),
+            on_error=lambda e: self.show_feedback(f"Erro ao carregar produtos: {e}", "error"),
+            key="produtos"
+        )
+
+    def _apply_products(self, products, count):
         try:
-            # Limpa a lista atual
-            for i in self.tree.get_children():
-                self.tree.delete(i)
-                
-            # Busca novos dados
-            products = self.db.get_products()
-            
-            # Insere dados na lista
-            for product in products:
-                # Formata o preço
-                preco_formatado = f"{product['preco']:.2f}"
-                categoria_nome = product['categoria_nome'] if product['categoria_nome'] else "Sem Categoria"
-                
-                self.tree.insert("", tk.END, values=(
-                    product['id'],
-                    product['nome'],
-                    product['tamanho'],
-                    preco_formatado,
-                    categoria_nome
-                ))
-            
+            self.has_more = len(products) > count
+            products = products[:count]
+
+            sync_treeview(self.tree, self.product_rows, [self.product_values(p) for p in products])
+            self.next_cursor = (products[-1]['nome'], products[-1]['id']) if products else None
+
             self.show_feedback(f"{len(products)} produtos carregados.", "success")
         except Exception as e:
             self.show_feedback(f"Erro ao carregar produtos: {e}", "error")
 
+    def load_more_products(self):
+        """Carrega a próxima página de produtos (ao rolar até o fim)."""
+        if not self.has_more or self.next_cursor is None:
+            self.loading_more = False
+            return
+        self.worker.submit(
+            partial(self.db.get_products, after=self.next_cursor, limit=PAGE_SIZE + 1),
+            on_done=self._append_products,
+            on_error=self._load_more_failed,
+            key="produtos_mais"
+        )
+
+    def _load_more_failed(self, error):
+        self.loading_more = False
+        self.show_feedback(f"Erro ao carregar produtos: {error}", "error")
+
+    def _append_products(self, products):
+        self.loading_more = False
+        try:
+            self.has_more = len(products) > PAGE_SIZE
+            products = products[:PAGE_SIZE]
+            for product in products:
+                iid, values = self.product_values(product)
+                if iid not in self.product_rows:
+                    self.tree.insert("", tk.END, iid=iid, values=values)
+                    self.product_rows[iid] = values
+            if products:
+                self.next_cursor = (products[-1]['nome'], products[-1]['id'])
+            self.show_feedback(f"{len(self.product_rows)} produtos carregados.", "success")
+        except Exception as e:
+            self.show_feedback(f"Erro ao carregar produtos: {e}", "error")
+
+    def on_tree_scroll(self, first, last):
+        """Repassa a rolagem para a scrollbar e busca mais produtos perto do fim."""
+        self.scrollbar.set(first, last)
+        if self.has_more and not self.loading_more and float(last) >= 0.9:
+            self.loading_more = True
+            self.load_more_products()
+
     def get_form_data(self):
         """Valida e retorna os dados do formulário."""
         nome = self.entry_nome.get().strip()
@@ -389,13 +650,20 @@ class App:
         data = self.get_form_data()
         if data:
             nome, tamanho, preco, categoria_id = data
-            try:
-                self.db.add_product(nome, tamanho, preco, categoria_id)
-                self.show_feedback(f"Produto '{nome}' adicionado com sucesso!", "success")
+
+            def done(new_id):
+                if new_id is None:
+                    self.show_feedback(f"Erro ao adicionar produto '{nome}'.", "error")
+                    return
                 self.load_products()
                 self.clear_entries()
-            except Exception as e:
-                self.show_feedback(f"Erro ao adicionar produto: {e}", "error")
+                self.show_feedback(f"Produto '{nome}' adicionado com sucesso!", "success")
+
+            self.worker.submit(
+                self.db.add_product, nome, tamanho, preco, categoria_id,
+                on_done=done,
+                on_error=lambda e: self.show_feedback(f"Erro ao adicionar produto: {e}", "error")
+            )
 
     def update_product(self):
         """Atualiza um produto existente."""
@@ -406,13 +674,21 @@ class App:
         data = self.get_form_data()
         if data:
             nome, tamanho, preco, categoria_id = data
-            try:
-                self.db.update_product(self.selected_item_id, nome, tamanho, preco, categoria_id)
-                self.show_feedback(f"Produto ID {self.selected_item_id} atualizado!", "success")
+            produto_id = self.selected_item_id
+
+            def done(success):
+                if not success:
+                    self.show_feedback(f"Erro ao atualizar o produto ID {produto_id}.", "error")
+                    return
                 self.load_products()
                 self.clear_entries()
-            except Exception as e:
-                self.show_feedback(f"Erro ao atualizar produto: {e}", "error")
+                self.show_feedback(f"Produto ID {produto_id} atualizado!", "success")
+
+            self.worker.submit(
+                self.db.update_product, produto_id, nome, tamanho, preco, categoria_id,
+                on_done=done,
+                on_error=lambda e: self.show_feedback(f"Erro ao atualizar produto: {e}", "error")
+            )
 
     def delete_product(self):
         """Exclui um produto selecionado."""
@@ -422,13 +698,21 @@ class App:
         
         # Confirmação
         if messagebox.askyesno("Confirmar Exclusão", f"Tem certeza que deseja excluir o produto ID {self.selected_item_id}?"):
-            try:
-                self.db.delete_product(self.selected_item_id)
-                self.show_feedback(f"Produto ID {self.selected_item_id} excluído.", "success")
+            produto_id = self.selected_item_id
+
+            def done(success):
+                if not success:
+                    self.show_feedback(f"Erro ao excluir o produto ID {produto_id}.", "error")
+                    return
                 self.load_products()
                 self.clear_entries()
-            except Exception as e:
-                self.show_feedback(f"Erro ao excluir produto: {e}", "error")
+                self.show_feedback(f"Produto ID {produto_id} excluído.", "success")
+
+            self.worker.submit(
+                self.db.delete_product, produto_id,
+                on_done=done,
+                on_error=lambda e: self.show_feedback(f"Erro ao excluir produto: {e}", "error")
+            )
 
     def clear_entries(self):
         """Limpa os campos de entrada e a seleção."""
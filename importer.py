@@ -0,0 +1,245 @@
+# importer.py
+# Importação de catálogos de fornecedores (CSV ou NDJSON) para o banco.
+#
+# O arquivo é lido linha a linha e gravado em blocos: cada bloco resolve as
+# categorias pelo nome (criando as que faltam, em lote) e insere os produtos
+# numa única transação. A memória usada depende do tamanho do bloco, não do
+# tamanho do arquivo.
+#
+# Uso pela linha de comando:
+#   python importer.py fornecedor.csv
+#   python importer.py fornecedor.ndjson --db loja.db --chunk-size 5000
+#
+# Colunas/chaves aceitas: nome, tamanho, preco e categoria (nome) ou categoria_id
+# (uma das duas é obrigatória).
+import csv
+import io
+import json
+import math
+import sqlite3
+import time
+
+from db import Database
+
+DEFAULT_CHUNK_SIZE = 5000
+MAX_ERRORS_REPORTED = 100
+# tentativas de gravar um bloco quando o banco está ocupado (locked/busy),
+# com espera crescente entre elas; esgotadas, o bloco é descartado
+WRITE_RETRIES = 3
+WRITE_RETRY_DELAY = 0.2
+
+
+def detect_format(filename):
+    """Descobre o formato ('csv' ou 'ndjson') pela extensão do arquivo."""
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl", ".json")):
+        return "ndjson"
+    return "csv"
+
+
+def iter_records(stream, format="csv"):
+    """Gera (numero_da_linha, dict) a partir de um arquivo texto, sem ler tudo de uma vez."""
+    if format == "ndjson":
+        for line_no, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, e
+                continue
+            yield line_no, record
+    else:
+        reader = csv.DictReader(stream)
+        # linha 1 é o cabeçalho
+        for line_no, record in enumerate(reader, start=2):
+            yield line_no, record
+
+
+class CatalogImporter:
+    """Importa registros de produtos em blocos, com relatório de progresso."""
+
+    def __init__(self, db, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+        """
+        db: a instância do banco de dados.
+        chunk_size: produtos por transação.
+        progress: função opcional chamada a cada bloco com o relatório parcial.
+        """
+        self.db = db
+        self.chunk_size = chunk_size
+        self.progress = progress
+
+        # mapa {nome_categoria: id}, carregado uma vez e completado conforme
+        # novas categorias aparecem no arquivo
+        self.categories = {cat['nome']: cat['id'] for cat in db.get_categories()}
+
+        self.report = {
+            "linhas": 0,
+            "importados": 0,
+            "erros": 0,
+            "categorias_criadas": 0,
+            "segundos": 0.0,
+            "linhas_por_segundo": 0.0,
+            "detalhes_erros": [],
+        }
+        self._start = None
+
+    def _error(self, line_no, message):
+        self.report["erros"] += 1
+        if len(self.report["detalhes_erros"]) < MAX_ERRORS_REPORTED:
+            self.report["detalhes_erros"].append({"linha": line_no, "erro": message})
+
+    def _parse(self, record):
+        """Valida um registro; retorna (nome, tamanho, preco, categoria_id ou nome_categoria)."""
+        if isinstance(record, Exception):
+            raise ValueError(f"JSON inválido: {record}")
+        if not isinstance(record, dict):
+            raise ValueError("registro não é um objeto")
+
+        nome = str(record.get("nome") or "").strip()
+        if not nome:
+            raise ValueError("nome é obrigatório")
+
+        tamanho = record.get("tamanho")
+        if tamanho is not None:
+            tamanho = str(tamanho).strip() or None
+
+        try:
+            preco = float(str(record.get("preco")).replace(",", "."))
+        except (TypeError, ValueError):
+            raise ValueError(f"preço inválido: {record.get('preco')!r}")
+        if not math.isfinite(preco): # float() aceita "nan" e "inf"
+            raise ValueError(f"preço inválido: {record.get('preco')!r}")
+        if preco < 0:
+            raise ValueError("preço não pode ser negativo")
+
+        if record.get("categoria_id") not in (None, ""):
+            try:
+                return nome, tamanho, preco, int(record["categoria_id"])
+            except (TypeError, ValueError):
+                raise ValueError(f"categoria_id inválido: {record['categoria_id']!r}")
+
+        categoria = str(record.get("categoria") or "").strip()
+        if not categoria:
+            raise ValueError("categoria é obrigatória")
+        return nome, tamanho, preco, categoria
+
+    def _flush(self, chunk):
+        """Grava um bloco: resolve categorias pelo nome e insere os produtos."""
+        faltando = {c for _, (_, _, _, c) in chunk if isinstance(c, str) and c not in self.categories}
+        if faltando:
+            resultado = self.db.get_or_create_categories(faltando, with_created=True)
+            if resultado is None:
+                for line_no, _ in chunk:
+                    self._error(line_no, "erro ao criar categorias do bloco")
+                return
+            mapa, criadas = resultado
+            # só as que este bloco criou: outra importação pode ter criado as demais
+            self.report["categorias_criadas"] += criadas
+            self.categories.update(mapa)
+
+        rows = []
+        for line_no, (nome, tamanho, preco, categoria) in chunk:
+            if isinstance(categoria, str):
+                categoria = self.categories[categoria]
+            rows.append((line_no, (nome, tamanho, preco, categoria)))
+        self._insert(rows)
+
+    def _insert(self, rows):
+        """
+        Insere [(numero_da_linha, produto)] numa transação. Se o bloco falhar
+        por causa dos dados (IntegrityError/DataError), divide ao meio e tenta
+        cada metade, para que uma linha ruim não descarte as válidas (só ela
+        acaba reportada como erro). Outros erros (banco ocupado, disco) não
+        dependem das linhas: o bloco é tentado de novo e, se continuar
+        falhando, descartado inteiro.
+        """
+        produtos = [produto for _, produto in rows]
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                results = self.db.add_products(produtos, raise_errors=True)
+                break
+            except (sqlite3.IntegrityError, sqlite3.DataError) as e:
+                if len(rows) == 1:
+                    self._error(rows[0][0], f"erro ao gravar o produto: {e}")
+                    return
+                middle = len(rows) // 2
+                self._insert(rows[:middle])
+                self._insert(rows[middle:])
+                return
+            except sqlite3.Error as e:
+                if attempt == WRITE_RETRIES:
+                    for line_no, _ in rows:
+                        self._error(line_no, f"erro ao gravar o bloco: {e}")
+                    return
+                time.sleep(WRITE_RETRY_DELAY * (attempt + 1))
+        for (line_no, _), result in zip(rows, results):
+            if result["status"] == "SUCCESS":
+                self.report["importados"] += 1
+            else:
+                self._error(line_no, f"categoria_id inexistente ({result['status']})")
+
+    def _update_timing(self):
+        elapsed = time.perf_counter() - self._start
+        self.report["segundos"] = round(elapsed, 3)
+        self.report["linhas_por_segundo"] = round(self.report["linhas"] / elapsed, 1) if elapsed else 0.0
+
+    def run(self, records):
+        """Importa um iterável de (numero_da_linha, registro). Retorna o relatório."""
+        self._start = time.perf_counter()
+        chunk = []
+        for line_no, record in records:
+            self.report["linhas"] += 1
+            try:
+                chunk.append((line_no, self._parse(record)))
+            except ValueError as e:
+                self._error(line_no, str(e))
+
+            if len(chunk) >= self.chunk_size:
+                self._flush(chunk)
+                chunk = []
+                self._update_timing()
+                if self.progress:
+                    self.progress(self.report)
+
+        if chunk:
+            self._flush(chunk)
+        self._update_timing()
+        if self.progress:
+            self.progress(self.report)
+        return self.report
+
+
+def import_file(db, stream, format="csv", chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Importa um arquivo já aberto (texto ou binário UTF-8)."""
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    importer = CatalogImporter(db, chunk_size=chunk_size, progress=progress)
+    return importer.run(iter_records(stream, format))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Importa um catálogo de produtos (CSV ou NDJSON).")
+    parser.add_argument("arquivo")
+    parser.add_argument("--db", default="loja.db")
+    parser.add_argument("--format", choices=["csv", "ndjson"], default=None,
+                        help="padrão: pela extensão do arquivo")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    def mostrar_progresso(report):
+        print(f"{report['linhas']} linhas lidas, {report['importados']} importadas, "
+              f"{report['erros']} erros ({report['linhas_por_segundo']:.0f} linhas/s)")
+
+    db = Database(args.db)
+    with open(args.arquivo, encoding="utf-8-sig", newline="") as f:
+        report = import_file(db, f, args.format or detect_format(args.arquivo),
+                             chunk_size=args.chunk_size, progress=mostrar_progresso)
+
+    print(f"Concluído em {report['segundos']:.1f}s: {report['importados']} produtos importados, "
+          f"{report['categorias_criadas']} categorias criadas, {report['erros']} erros.")
+    for erro in report["detalhes_erros"]:
+        print(f"  linha {erro['linha']}: {erro['erro']}")
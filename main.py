@@ -1,17 +1,24 @@
 # main.py
+import os
 import tkinter as tk
 from db import Database
 from gui import App
 
 if __name__ == "__main__":
-    # 1. Inicializa o banco de dados (cria o arquivo .db e as tabelas)
-    db = Database(db_file="loja.db")
-    
+    # 1. Inicializa o banco de dados (cria o arquivo .db e aplica as migrações pendentes)
+    # LOJA_DB_FILE troca o arquivo do banco (usado pelos benchmarks).
+    db = Database(db_file=os.environ.get("LOJA_DB_FILE", "loja.db"))
+
     # 2. Cria a janela principal do Tkinter
     root = tk.Tk()
-    
+
     # 3. Inicializa a aplicação da GUI, passando a janela e o banco de dados
     app = App(root, db)
-    
+
+    # LOJA_STARTUP_EXIT=1 fecha a janela assim que ela fica pronta
+    # (mede o tempo de inicialização, ver benchmarks/bench_startup.py)
+    if os.environ.get("LOJA_STARTUP_EXIT", "0") == "1":
+        root.after_idle(app.on_close)
+
     # 4. Inicia o loop principal da interface gráfica
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
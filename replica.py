@@ -0,0 +1,192 @@
+# replica.py
+# Réplica do banco em memória (:memory:) para as leituras, ligada com
+# Database(replica=True).
+#
+# Uma thread copia o arquivo inteiro para um banco novo em memória com a
+# API de backup do SQLite e troca a réplica atual pela nova. O banco em
+# memória é aberto em modo "shared cache": cada leitura concorrente usa a
+# sua própria conexão, todas sobre a mesma cópia. As leituras
+# usam a réplica enquanto ela estiver no máximo 'max_lag_ms' atrás do
+# arquivo; passado isso (ou antes da primeira cópia), vão para o arquivo.
+# Escritas deste processo acordam a thread na hora; as de outros processos
+# são percebidas pelo PRAGMA data_version, verificado periodicamente.
+import itertools
+import sqlite3
+import threading
+import time
+
+_names = itertools.count()
+
+
+class _ReplicaConnection(sqlite3.Connection):
+    """Conexão com um banco da réplica (sabe a qual cópia pertence)."""
+
+    generation = None
+
+
+class _Generation:
+    """Uma cópia do banco em memória e as conexões ociosas abertas nela."""
+
+    def __init__(self, uri, holder):
+        self.uri = uri
+        # a conexão que recebeu o backup fica aberta enquanto a cópia for
+        # usada: um banco em memória some quando a última conexão fecha
+        self.holder = holder
+        self.idle = []
+        self.in_use = 0
+        self.retired = False
+
+    def close_idle(self):
+        for conn in self.idle:
+            conn.close()
+        self.idle = []
+        if self.in_use == 0 and self.holder is not None:
+            self.holder.close()
+            self.holder = None
+
+
+class ReadReplica:
+    """Cópia em memória do banco, renovada em segundo plano."""
+
+    def __init__(self, db, max_lag_ms=1000, registry=None):
+        """
+        db: o Database de origem.
+        max_lag_ms: atraso máximo aceito para ler da réplica.
+        """
+        self.db = db
+        self.max_lag = max_lag_ms / 1000
+        # verifica o data_version algumas vezes dentro do atraso permitido
+        self.check_interval = max(self.max_lag / 4, 0.01)
+        # com escritas contínuas, no máximo uma cópia a cada meio atraso
+        # permitido: o atraso fica abaixo de max_lag sem copiar sem parar
+        self.min_refresh_interval = self.max_lag / 2
+        self._refreshed_at = float("-inf")
+
+        self._current = None # _Generation em uso pelas leituras
+        self._lock = threading.Lock()
+        self._version = None # data_version do arquivo quando a cópia foi feita
+        self._fresh_at = float("-inf") # momento em que a réplica era igual ao arquivo
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.refreshes = 0
+
+        self._reads = self._refresh_seconds = None
+        if registry is not None:
+            self._reads = registry.counter(
+                "loja_db_replica_reads_total", "Leituras por origem (réplica ou arquivo).", ("source",))
+            self._refresh_seconds = registry.histogram(
+                "loja_db_replica_refresh_seconds", "Duração da cópia do banco para a réplica.")
+
+        self._thread = threading.Thread(target=self._run, name="loja-replica", daemon=True)
+        self._thread.start()
+
+    def lag(self):
+        """Segundos desde a última vez em que a réplica estava igual ao arquivo."""
+        return time.monotonic() - self._fresh_at
+
+    def notify_write(self):
+        """Chamado após uma escrita deste processo: renova a réplica logo."""
+        self._wake.set()
+
+    def acquire(self):
+        """
+        Conexão da réplica para uma leitura (devolver com release), ou None
+        se a réplica estiver atrasada demais ou ainda não existir.
+        """
+        if self.lag() > self.max_lag:
+            if self._reads is not None:
+                self._reads.inc("arquivo")
+            self._wake.set()
+            return None
+        with self._lock:
+            generation = self._current
+            if generation is None:
+                return None
+            conn = generation.idle.pop() if generation.idle else None
+            generation.in_use += 1
+        if conn is None:
+            conn = self._connect(generation.uri)
+            conn.generation = generation
+        if self._reads is not None:
+            self._reads.inc("replica")
+        return conn
+
+    def owns(self, conn):
+        return isinstance(conn, _ReplicaConnection)
+
+    def release(self, conn):
+        generation = conn.generation
+        with self._lock:
+            generation.in_use -= 1
+            generation.idle.append(conn)
+            if generation.retired:
+                # cópia antiga: a memória é liberada ao fechar a última conexão
+                generation.close_idle()
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        with self._lock:
+            if self._current is not None:
+                self._retire(self._current)
+                self._current = None
+
+    def _connect(self, uri):
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, factory=_ReplicaConnection)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _retire(self, generation):
+        generation.retired = True
+        generation.close_idle()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.check_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            checked_at = time.monotonic()
+            version = self.db._data_version()
+            if version is None:
+                continue
+            if version == self._version:
+                self._fresh_at = checked_at # nada mudou: a réplica continua atual
+                continue
+            wait = self._refreshed_at + self.min_refresh_interval - checked_at
+            if wait > 0 and self._stop.wait(wait):
+                return
+            try:
+                self._refresh(self.db._data_version(), time.monotonic())
+            except sqlite3.Error as e:
+                print(f"Erro ao atualizar a réplica em memória: {e}")
+
+    def _refresh(self, version, started_at):
+        """Copia o arquivo para um banco novo em memória e troca pelo atual."""
+        self._refreshed_at = started_at
+        start = time.perf_counter()
+        uri = f"file:loja-replica-{next(_names)}?mode=memory&cache=shared"
+        replica = self._connect(uri)
+        source = self.db._new_connection()
+        try:
+            # pages=-1: tudo num passo só, uma cópia consistente de um commit
+            source.backup(replica, pages=-1)
+        except sqlite3.Error:
+            replica.close()
+            raise
+        finally:
+            source.close()
+        generation = _Generation(uri, replica)
+
+        with self._lock:
+            old, self._current = self._current, generation
+            # o data_version foi lido antes da cópia: se houve commit durante
+            # ela, a próxima verificação vê versão diferente e copia de novo
+            self._version = version
+            self._fresh_at = started_at
+            if old is not None:
+                self._retire(old)
+        self.refreshes += 1
+        if self._refresh_seconds is not None:
+            self._refresh_seconds.observe(time.perf_counter() - start)
@@ -0,0 +1,358 @@
+# snapshot.py
+# Cópia do catálogo de produtos em memória, em colunas, para responder as
+# listagens sem ir ao SQLite. Ligada com Database(snapshot=True).
+#
+# Cada produto ocupa uma posição ("slot") nas colunas: ids, preços e
+# categorias ficam em arrays de tipo fixo (8 bytes por valor, sem um objeto
+# Python por número) e nomes/tamanhos são strings internadas, compartilhadas
+# entre os produtos que se repetem. Os índices secundários são arrays de
+# posições ordenadas: por (nome, id), por categoria e por preço.
+#
+# A cópia é atualizada quando o PRAGMA data_version muda, relendo só os
+# registros listados na tabela 'alteracoes' desde a última versão aplicada.
+import bisect
+import sqlite3
+import sys
+import threading
+from array import array
+
+# Colunas de cada linha retornada (mesma ordem do PRODUCT_SELECT do db.py)
+COLUMNS = ("id", "nome", "tamanho", "preco", "categoria_nome", "categoria_id")
+_COLUMN_INDEX = {name: i for i, name in enumerate(COLUMNS)}
+
+# Tamanho das listas "IN (...)" ao reler os registros alterados
+_CHUNK_SIZE = 500
+
+# Faixa de preço com menos candidatos que 1/8 da listagem: ordena só a
+# faixa por nome em vez de percorrer a listagem inteira filtrando.
+_PRICE_SELECTIVITY = 8
+
+
+class SnapshotRow(tuple):
+    """Linha de produto com a mesma interface do sqlite3.Row (índice, nome e keys())."""
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            key = _COLUMN_INDEX[key]
+        return tuple.__getitem__(self, key)
+
+    def keys(self):
+        return list(COLUMNS)
+
+
+class CatalogSnapshot:
+    """Catálogo de produtos em memória, atualizado de forma incremental."""
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._data_version = None
+        self._versao = 0 # última versão de 'alteracoes' aplicada
+        self.full_loads = 0
+        self.incremental_refreshes = 0
+        self._reset()
+
+    def _reset(self):
+        # colunas: uma posição por produto (posições livres têm id 0)
+        self._ids = array("q")
+        self._precos = array("d")
+        self._categoria_ids = array("q") # 0 = sem categoria
+        self._nomes = []
+        self._tamanhos = []
+        self._free = []
+        self._categorias = {} # id -> nome
+        # índices secundários (posições ordenadas)
+        self._by_id = array("q") # por id, para achar a posição de um produto
+        self._by_name = array("q") # por (nome, id), a ordem das listagens
+        self._by_category = {} # categoria_id -> posições por (nome, id)
+        self._by_price = array("q") # por preço
+
+    def _id_key(self, slot):
+        return self._ids[slot]
+
+    def _find(self, id):
+        """Posição do produto 'id' nas colunas (e no índice por id), ou (None, i)."""
+        i = bisect.bisect_left(self._by_id, id, key=self._id_key)
+        if i < len(self._by_id) and self._ids[self._by_id[i]] == id:
+            return self._by_id[i], i
+        return None, i
+
+    def _name_key(self, slot):
+        return (self._nomes[slot], self._ids[slot])
+
+    def _price_key(self, slot):
+        return self._precos[slot]
+
+    # atualização ----------------------------------------------------------------------------------------
+
+    def refresh(self):
+        """
+        Atualiza a cópia se o banco mudou desde a última leitura.
+        Retorna False se a cópia não pôde ser carregada (usar o SQL).
+        """
+        data_version = self.db._data_version()
+        if data_version is None:
+            return False
+        with self._lock:
+            if self._loaded and data_version == self._data_version:
+                return True
+            conn = self.db.get_connection()
+            if conn is None:
+                return False
+            try:
+                # uma transação só: todos os SELECTs enxergam o mesmo commit
+                conn.execute("BEGIN")
+                if self._loaded and self._apply_changes(conn):
+                    self.incremental_refreshes += 1
+                else:
+                    self._load(conn)
+                    self.full_loads += 1
+                self._data_version = data_version
+                self._loaded = True
+                return True
+            except sqlite3.Error as e:
+                print(f"Erro ao atualizar a cópia do catálogo: {e}")
+                self._loaded = False
+                self._reset()
+                return False
+            finally:
+                self.db.release_connection(conn)
+
+    def _load(self, conn):
+        """Carrega o catálogo inteiro (primeira leitura ou muitas alterações)."""
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        versao = cursor.execute("SELECT COALESCE(MAX(versao), 0) FROM alteracoes").fetchone()[0]
+        intern = sys.intern
+        categorias = {id: intern(nome) for id, nome in cursor.execute("SELECT id, nome FROM categorias")}
+
+        self._reset()
+        ids, precos, categoria_ids = self._ids, self._precos, self._categoria_ids
+        nomes, tamanhos = self._nomes, self._tamanhos
+        # já na ordem (nome, id): o índice por nome sai pronto
+        cursor.execute("SELECT id, nome, tamanho, preco, categoria_id FROM produtos ORDER BY nome, id")
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            for id, nome, tamanho, preco, categoria_id in rows:
+                ids.append(id)
+                nomes.append(intern(nome))
+                tamanhos.append(None if tamanho is None else intern(tamanho))
+                precos.append(preco)
+                categoria_ids.append(categoria_id or 0)
+
+        count = len(ids)
+        self._by_id = array("q", sorted(range(count), key=ids.__getitem__))
+        self._by_name = array("q", range(count))
+        for slot, categoria_id in enumerate(categoria_ids):
+            order = self._by_category.get(categoria_id)
+            if order is None:
+                order = self._by_category[categoria_id] = array("q")
+            order.append(slot)
+        self._by_price = array("q", sorted(range(count), key=precos.__getitem__))
+        self._categorias = categorias
+        self._versao = versao
+
+    def _apply_changes(self, conn):
+        """
+        Aplica só os registros alterados desde a última versão. Retorna False
+        quando recarregar tudo sai mais barato (ou o registro foi podado).
+        """
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        ultima = cursor.execute("SELECT COALESCE(MAX(versao), 0) FROM alteracoes").fetchone()[0]
+        if ultima == self._versao:
+            return True
+        if ultima - self._versao > max(1000, len(self._by_id) // 4):
+            return False
+        if len(self._free) > max(1000, len(self._by_id)):
+            return False # muitas posições livres: recarregar compacta as colunas
+        rows = cursor.execute(
+            "SELECT versao, tabela, registro_id FROM alteracoes WHERE versao > ? ORDER BY versao",
+            (self._versao,)
+        ).fetchall()
+        if not rows or rows[0][0] != self._versao + 1:
+            return False # versões antigas já foram apagadas do registro
+
+        produtos = {r[2] for r in rows if r[1] == "produtos"}
+        categorias = {r[2] for r in rows if r[1] == "categorias"}
+
+        for ids in _chunks(categorias):
+            placeholders = ", ".join("?" * len(ids))
+            found = dict(cursor.execute(
+                f"SELECT id, nome FROM categorias WHERE id IN ({placeholders})", ids
+            ).fetchall())
+            for id in ids:
+                if id in found:
+                    self._categorias[id] = sys.intern(found[id])
+                else:
+                    self._categorias.pop(id, None)
+
+        for ids in _chunks(produtos):
+            placeholders = ", ".join("?" * len(ids))
+            found = {row[0]: row for row in cursor.execute(
+                f"SELECT id, nome, tamanho, preco, categoria_id FROM produtos WHERE id IN ({placeholders})", ids
+            )}
+            for id in ids:
+                if id in found:
+                    self._upsert(*found[id])
+                else:
+                    self._remove(id)
+
+        self._versao = ultima
+        return True
+
+    def _upsert(self, id, nome, tamanho, preco, categoria_id):
+        slot, i = self._find(id)
+        if slot is not None:
+            self._unindex(slot)
+        else:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot = len(self._ids)
+                self._ids.append(0)
+                self._precos.append(0.0)
+                self._categoria_ids.append(0)
+                self._nomes.append(None)
+                self._tamanhos.append(None)
+            self._by_id.insert(i, slot)
+        self._ids[slot] = id
+        self._nomes[slot] = sys.intern(nome)
+        self._tamanhos[slot] = None if tamanho is None else sys.intern(tamanho)
+        self._precos[slot] = preco
+        self._categoria_ids[slot] = categoria_id or 0
+        self._index(slot)
+
+    def _remove(self, id):
+        slot, i = self._find(id)
+        if slot is None:
+            return
+        del self._by_id[i]
+        self._unindex(slot)
+        self._ids[slot] = 0
+        self._nomes[slot] = None
+        self._tamanhos[slot] = None
+        self._free.append(slot)
+
+    def _index(self, slot):
+        bisect.insort(self._by_name, slot, key=self._name_key)
+        categoria_id = self._categoria_ids[slot]
+        order = self._by_category.get(categoria_id)
+        if order is None:
+            order = self._by_category[categoria_id] = array("q")
+        bisect.insort(order, slot, key=self._name_key)
+        bisect.insort(self._by_price, slot, key=self._price_key)
+
+    def _unindex(self, slot):
+        # (nome, id) é único: a busca binária cai exatamente na posição
+        key = self._name_key(slot)
+        for order in (self._by_name, self._by_category[self._categoria_ids[slot]]):
+            del order[bisect.bisect_left(order, key, key=self._name_key)]
+        # preços se repetem: procura a posição entre os iguais
+        order = self._by_price
+        i = bisect.bisect_left(order, self._precos[slot], key=self._price_key)
+        while order[i] != slot:
+            i += 1
+        del order[i]
+
+    # consultas ------------------------------------------------------------------------------------------
+
+    def get_products(self, after=None, limit=None, categoria_id=None, tamanho=None,
+                     preco_min=None, preco_max=None):
+        """
+        Mesma consulta do Database.get_products (filtros, ordem por (nome, id)
+        e cursor 'after'), respondida pela memória. Retorna None se a cópia
+        não estiver disponível.
+        """
+        if not self.refresh():
+            return None
+        with self._lock:
+            slots = self._select(after, limit, categoria_id, tamanho, preco_min, preco_max)
+            return [self._row(slot) for slot in slots]
+
+    def _select(self, after, limit, categoria_id, tamanho, preco_min, preco_max):
+        if categoria_id is not None:
+            # 0 marca "sem categoria" nas colunas; no SQL, = 0 não acha nada
+            order = self._by_category.get(categoria_id) if categoria_id else None
+            if order is None:
+                return []
+        else:
+            order = self._by_name
+        after = tuple(after) if after is not None else None
+        precos, tamanhos = self._precos, self._tamanhos
+
+        if preco_min is not None or preco_max is not None:
+            by_price = self._by_price
+            lo = 0 if preco_min is None else bisect.bisect_left(by_price, preco_min, key=self._price_key)
+            hi = len(by_price) if preco_max is None else bisect.bisect_right(by_price, preco_max, key=self._price_key)
+            # faixa seletiva: parte dos candidatos do índice de preço
+            if (hi - lo) * _PRICE_SELECTIVITY < len(order):
+                slots = sorted(by_price[lo:hi], key=self._name_key)
+                if categoria_id is not None:
+                    slots = [s for s in slots if self._categoria_ids[s] == categoria_id]
+                if tamanho is not None:
+                    slots = [s for s in slots if tamanhos[s] == tamanho]
+                if after is not None:
+                    slots = slots[bisect.bisect_right(slots, after, key=self._name_key):]
+                return slots if limit is None else slots[:limit]
+
+        start = 0 if after is None else bisect.bisect_right(order, after, key=self._name_key)
+        result = []
+        for i in range(start, len(order)):
+            slot = order[i]
+            if tamanho is not None and tamanhos[slot] != tamanho:
+                continue
+            if preco_min is not None and precos[slot] < preco_min:
+                continue
+            if preco_max is not None and precos[slot] > preco_max:
+                continue
+            result.append(slot)
+            if limit is not None and len(result) >= limit:
+                break
+        return result
+
+    def _row(self, slot):
+        categoria_id = self._categoria_ids[slot] or None
+        return SnapshotRow((
+            self._ids[slot],
+            self._nomes[slot],
+            self._tamanhos[slot],
+            self._precos[slot],
+            self._categorias.get(categoria_id),
+            categoria_id,
+        ))
+
+    # memória --------------------------------------------------------------------------------------------
+
+    def memory_usage(self):
+        """Bytes aproximados ocupados pela cópia, por estrutura e por produto."""
+        getsizeof = sys.getsizeof
+        with self._lock:
+            colunas = sum(getsizeof(c) for c in (
+                self._ids, self._precos, self._categoria_ids, self._nomes, self._tamanhos))
+            textos = set(self._nomes) | set(self._tamanhos) | set(self._categorias.values())
+            textos.discard(None)
+            textos = sum(getsizeof(t) for t in textos)
+            indices = (getsizeof(self._by_id) + getsizeof(self._by_name) + getsizeof(self._by_price) + getsizeof(self._by_category)
+                       + sum(getsizeof(order) for order in self._by_category.values()))
+            produtos = len(self._by_id)
+        total = colunas + textos + indices
+        return {
+            "produtos": produtos,
+            "colunas": colunas,
+            "textos": textos,
+            "indices": indices,
+            "total": total,
+            "bytes_por_produto": round(total / produtos, 1) if produtos else 0.0,
+        }
+
+
+def _chunks(ids):
+    ids = sorted(ids)
+    for i in range(0, len(ids), _CHUNK_SIZE):
+        yield ids[i:i + _CHUNK_SIZE]
@@ -0,0 +1,110 @@
+# tests/test_admission.py
+import asyncio
+
+import pytest
+
+from admission import AdmissionClass, Rejected
+from metrics import Registry
+
+
+def _admission(limit=1, max_queue=4, budget_ms=1000.0):
+    return AdmissionClass("teste", limit, max_queue, budget_ms, registry=Registry())
+
+
+async def _queued(admission):
+    """Inicia um acquire que vai para a fila e espera ele entrar nela."""
+    depth = admission.queue_depth
+    task = asyncio.ensure_future(admission.acquire())
+    while admission.queue_depth == depth:
+        await asyncio.sleep(0)
+    return task
+
+
+def test_queue_full_is_rejected():
+    async def scenario():
+        admission = _admission(max_queue=1)
+        await admission.acquire()
+        waiting = await _queued(admission)
+        with pytest.raises(Rejected) as e:
+            await admission.acquire()
+        assert e.value.reason == "fila_cheia"
+        admission.release(0.01)
+        await waiting
+        admission.release(0.01)
+        assert admission.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_expected_wait_over_budget_is_rejected():
+    async def scenario():
+        admission = _admission(budget_ms=100.0)
+        await admission.acquire()
+        admission.release(1.0) # duração média: 1s, bem acima do orçamento
+        await admission.acquire()
+        with pytest.raises(Rejected) as e:
+            await admission.acquire()
+        assert e.value.reason == "espera_estimada"
+        assert e.value.retry_after == 1
+        assert admission.queue_depth == 0
+
+    asyncio.run(scenario())
+
+
+def test_waiting_past_the_budget_is_rejected():
+    async def scenario():
+        admission = _admission(budget_ms=10.0)
+        await admission.acquire()
+        with pytest.raises(Rejected) as e:
+            await admission.acquire()
+        assert e.value.reason == "tempo_na_fila"
+        assert admission.queue_depth == 0
+        admission.release(None)
+        assert admission.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_slot_is_handed_to_the_first_waiter():
+    async def scenario():
+        admission = _admission()
+        await admission.acquire()
+        first = await _queued(admission)
+        second = await _queued(admission)
+        assert admission.queue_depth == 2
+
+        admission.release(0.01)
+        await first
+        assert not second.done()
+        assert admission.in_flight == 1 # a vaga passou adiante, não foi devolvida
+
+        admission.release(0.01)
+        await second
+        admission.release(0.01)
+        assert admission.in_flight == 0
+        assert admission.queue_depth == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_releases_a_handed_slot():
+    async def scenario():
+        admission = _admission()
+        await admission.acquire()
+        waiting = await _queued(admission)
+
+        admission.release(0.01) # set_result no waiter: a vaga é dele
+        waiting.cancel() # ...mas o cliente desconecta antes de rodar
+        results = await asyncio.gather(waiting, return_exceptions=True)
+        if not isinstance(results[0], asyncio.CancelledError):
+            # o asyncio.wait_for do Python 3.11 entrega o resultado pronto em
+            # vez do cancelamento: a vaga é de quem chamou, que a devolve
+            admission.release(0.01)
+        assert admission.in_flight == 0
+        assert admission.queue_depth == 0
+
+        # a vaga devolvida serve a próxima requisição sem fila
+        await asyncio.wait_for(admission.acquire(), 1)
+        assert admission.in_flight == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,128 @@
+# tests/test_api.py
+import asyncio
+import importlib
+import json
+
+import pytest
+
+from benchmarks.common import ASGIClient
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOJA_DB_FILE", str(tmp_path / "teste.db"))
+    monkeypatch.delenv("LOJA_GROUP_COMMIT", raising=False)
+    try:
+        import api
+        api = importlib.reload(api) # usa o banco do teste
+    except (ImportError, RuntimeError) as e: # ex.: python-multipart ausente
+        pytest.skip(f"api indisponível: {e}")
+    yield api
+    api.adb.shutdown()
+
+
+def _raw_request(api, method, path, **kwargs):
+    loop = asyncio.new_event_loop()
+    try:
+        return ASGIClient(api.app, loop).request(method, path, **kwargs)
+    finally:
+        loop.close()
+
+
+def _request(api, method, path, **kwargs):
+    status, body = _raw_request(api, method, path, **kwargs)
+    return status, json.loads(body) if body else None
+
+
+def test_reprice_without_group_commit(api):
+    categoria_id = api.db.add_category("Camisetas")
+    api.db.add_products([("Camiseta", "M", 100.0, categoria_id), ("Regata", "M", 50.0, categoria_id)])
+
+    regras = [{"categoria_id": categoria_id, "percentual": -10}]
+    status, body = _request(api, "POST", "/produtos/reprice", body={"regras": regras, "dry_run": True})
+    assert status == 200, body
+    assert body["afetados"] == 2
+    assert body["depois"]["preco_max"] == 90.0
+    assert max(p["preco"] for p in api.db.get_products()) == 100.0
+
+    status, body = _request(api, "POST", "/produtos/reprice", body={"regras": regras})
+    assert status == 200, body
+    assert max(p["preco"] for p in api.db.get_products()) == 90.0
+
+
+def test_reprice_invalid_rule(api):
+    status, body = _request(api, "POST", "/produtos/reprice",
+                            body={"regras": [{"percentual": -10, "valor": 1}]})
+    assert status == 422
+
+
+def test_export_streams_the_whole_body(api):
+    categoria_id = api.db.add_category("Camisetas")
+    api.db.add_products([(f"Camiseta {i}", "M", 10.0 + i, categoria_id) for i in range(3)])
+
+    status, body = _raw_request(api, "GET", "/produtos/export")
+    assert status == 200
+    assert [json.loads(line)["nome"] for line in body.decode().splitlines()] == [
+        "Camiseta 0", "Camiseta 1", "Camiseta 2"]
+
+
+def test_batch_rejects_more_than_1000_operations(api):
+    status, body = _request(api, "POST", "/batch", body=[{"op": "add_category", "nome": "X"}] * 1001)
+    assert status == 422
+    assert api.db.get_categories() == []
+
+
+def test_batch_rejects_move_to_null_category(api):
+    categoria_id = api.db.add_category("Camisetas")
+    status, body = _request(api, "POST", "/batch", body=[
+        {"op": "move_products", "categoria_id": categoria_id, "para_categoria_id": None}])
+    assert status == 422
+    assert "para_categoria_id" in body["detail"]
+
+
+def test_changes_route(api):
+    categoria_id = api.db.add_category("Camisetas")
+    status, body = _request(api, "GET", "/changes", params={"since": 0})
+    assert status == 200, body
+    assert body["versao"] == 1
+    assert body["alteracoes"][0]["dados"] == {"id": categoria_id, "nome": "Camisetas"}
+
+    api.db.add_category("Calças")
+    api.db.prune_changes(keep=1)
+    status, body = _request(api, "GET", "/changes", params={"since": 0})
+    assert status == 410
+
+
+def test_changes_stream_events(api):
+    categoria_id = api.db.add_category("Camisetas")
+
+    async def first_events(since, n):
+        events = api._change_events(since)
+        try:
+            return [await events.__anext__() for _ in range(n)]
+        finally:
+            await events.aclose()
+
+    event, = asyncio.run(first_events(0, 1))
+    assert event.startswith("id: 1\nevent: alteracao\n")
+    assert json.loads(event.split("data: ", 1)[1])["id"] == categoria_id
+
+    # reconexão: continua do Last-Event-ID
+    from starlette.requests import Request
+    calcas_id = api.db.add_category("Calças")
+
+    async def resume(last_event_id):
+        request = Request({"type": "http", "headers": [(b"last-event-id", last_event_id.encode())]})
+        response = await api.stream_changes(request, None)
+        try:
+            return await response.body_iterator.__anext__()
+        finally:
+            await response.body_iterator.aclose()
+
+    event = asyncio.run(resume("1"))
+    assert event.startswith("id: 2\n")
+    assert json.loads(event.split("data: ", 1)[1])["id"] == calcas_id
+
+    api.db.prune_changes(keep=1)
+    event, = asyncio.run(first_events(0, 1))
+    assert event.startswith("event: expired\n")
@@ -0,0 +1,28 @@
+# tests/test_async_db.py
+import asyncio
+
+import pytest
+
+from async_db import AsyncDatabase
+from db import Database
+from metrics import Registry
+
+
+@pytest.fixture(params=[False, True], ids=["direto", "group_commit"])
+def adb(request, tmp_path):
+    db = Database(str(tmp_path / "teste.db"), group_commit=request.param, registry=Registry())
+    adb = AsyncDatabase(db)
+    yield adb
+    adb.shutdown()
+
+
+def test_reprice_products(adb):
+    categoria_id = adb.db.add_category("Camisetas")
+    adb.db.add_products([("Camiseta", "M", 100.0, categoria_id)])
+
+    result = asyncio.run(adb.reprice_products([{"categoria_id": categoria_id, "percentual": -10}]))
+    assert result["afetados"] == 1
+    assert adb.db.get_products()[0]["preco"] == 90.0
+
+    with pytest.raises(ValueError):
+        asyncio.run(adb.reprice_products([{"percentual": -10, "valor": 1}]))
@@ -0,0 +1,88 @@
+# tests/test_changes.py
+import pytest
+
+from db import Database
+from metrics import Registry
+
+
+@pytest.fixture(params=[False, True], ids=["direto", "group_commit"])
+def db(request, tmp_path):
+    database = Database(str(tmp_path / "teste.db"), group_commit=request.param, registry=Registry())
+    yield database
+    database.close()
+
+
+def _ops(result):
+    return [(a["tabela"], a["id"], a["operacao"]) for a in result["alteracoes"]]
+
+
+def test_changes_are_logged_in_order(db):
+    assert db.get_change_version() == 0
+    categoria_id = db.add_category("Camisetas")
+    produto_id = db.add_product("Camiseta", "M", 10.0, categoria_id)
+    db.update_product(produto_id, "Camiseta Azul", "M", 12.0, categoria_id)
+    db.delete_product(produto_id)
+
+    result = db.get_changes()
+    assert _ops(result) == [
+        ("categorias", categoria_id, "INSERT"),
+        ("produtos", produto_id, "INSERT"),
+        ("produtos", produto_id, "UPDATE"),
+        ("produtos", produto_id, "DELETE"),
+    ]
+    assert result["versao"] == db.get_change_version() == 4
+    assert result["mais"] is False
+    # estado atual: o produto já foi excluído
+    assert result["alteracoes"][0]["dados"] == {"id": categoria_id, "nome": "Camisetas"}
+    assert all(a["dados"] is None for a in result["alteracoes"][1:])
+
+
+def test_change_cursor_pages_and_resumes(db):
+    categoria_id = db.add_category("Camisetas")
+    ids = [r["id"] for r in db.add_products([(f"Produto {i}", "M", 1.0, categoria_id) for i in range(5)])]
+
+    first = db.get_changes(since=0, limit=4)
+    assert first["mais"] is True
+    assert first["versao"] == 4
+    second = db.get_changes(since=first["versao"], limit=4)
+    assert second["mais"] is False
+    assert [a["id"] for a in second["alteracoes"]] == ids[3:]
+
+    # sem novidades: a versão fica onde estava
+    assert db.get_changes(since=second["versao"]) == {"versao": second["versao"], "alteracoes": [], "mais": False}
+    db.update_category(categoria_id, "Camisas")
+    assert _ops(db.get_changes(since=second["versao"])) == [("categorias", categoria_id, "UPDATE")]
+
+
+def test_prune_changes_keeps_the_newest_and_expires_old_cursors(db):
+    categoria_id = db.add_category("Camisetas")
+    db.add_products([(f"Produto {i}", "M", 1.0, categoria_id) for i in range(5)])
+    assert db.get_change_version() == 6
+
+    assert db.prune_changes(keep=2) == 4
+    assert db.get_change_version() == 6 # a versão não volta depois da poda
+    assert db.get_changes(since=0) == "EXPIRED"
+    assert db.get_changes(since=3) == "EXPIRED"
+    assert [a["versao"] for a in db.get_changes(since=4)["alteracoes"]] == [5, 6]
+    assert db.get_changes(since=6)["alteracoes"] == []
+
+    assert db.prune_changes(keep=0) == 2
+    assert db.get_changes(since=6)["versao"] == 6
+    db.add_category("Calças")
+    assert db.get_changes(since=6)["versao"] == 7
+
+
+def test_maintenance_writes_use_begin_write(db, monkeypatch):
+    # _begin_write é o BEGIN IMMEDIATE com novas tentativas se o banco estiver travado
+    calls = []
+    begin = db._begin_write
+
+    def recording_begin(cursor):
+        calls.append(cursor)
+        return begin(cursor)
+
+    monkeypatch.setattr(db, "_begin_write", recording_begin)
+    db.add_category("Camisetas")
+    assert db.rebuild_category_stats() is True
+    assert db.prune_changes(keep=0) == 1
+    assert len(calls) == 3
@@ -0,0 +1,156 @@
+# tests/test_db.py
+import inspect
+import sqlite3
+
+import pytest
+
+from db import FTS_BULK_MIN_ROWS, Database
+from metrics import Registry
+
+# Métodos públicos que não passam pelo @timed: infraestrutura do próprio
+# Database e iter_products (gerador; o tempo ficaria só na criação dele).
+UNTIMED = {"close", "create_tables", "get_connection", "release_connection", "iter_products"}
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "teste.db"), registry=Registry())
+    yield database
+    database.close()
+
+
+def test_public_methods_are_timed():
+    missing = [
+        name for name, method in inspect.getmembers(Database, inspect.isfunction)
+        if not name.startswith("_") and name not in UNTIMED and not hasattr(method, "__wrapped__")
+    ]
+    assert missing == []
+
+
+def test_update_category_is_measured(db):
+    categoria_id = db.add_category("Camisetas")
+    db.update_category(categoria_id, "Camisas")
+    assert db._call_seconds.count("update_category") == 1
+
+
+def test_exhausted_pool_returns_failure_values(tmp_path):
+    db = Database(str(tmp_path / "teste.db"), pool_size=1, pool_timeout=0.01, registry=Registry())
+    categoria_id = db.add_category("Camisetas")
+    held = db.get_connection()
+    try:
+        assert db.get_connection() is None
+        assert db.get_categories() == []
+        assert db.get_products() == []
+        assert db.get_product_by_id(1) is None
+        assert db.search_products("camiseta") == []
+        assert db.get_category_stats() == []
+        assert db.get_category_stats(categoria_id) is None
+        assert db.check_category_stats() is None
+        assert db.rebuild_category_stats() is False
+        assert db.get_change_version() is None
+        assert db.get_changes() is None
+        assert db.prune_changes() is None
+        assert db.add_category("Calças") is None
+        assert db.update_category(categoria_id, "Camisas") is False
+        assert db.delete_category(categoria_id) == "ERROR"
+        assert db.add_product("Camiseta", "M", 10.0, categoria_id) is None
+        assert db.update_product(1, "Camiseta", "M", 10.0, categoria_id) is False
+        assert db.delete_product(1) is False
+        assert db.add_products([("Camiseta", "M", 10.0, categoria_id)]) is None
+        assert db.update_products([(1, "Camiseta", "M", 10.0, categoria_id)]) is None
+        assert db.delete_products([1]) is None
+        with pytest.raises(sqlite3.OperationalError):
+            db.add_products([("Camiseta", "M", 10.0, categoria_id)], raise_errors=True)
+    finally:
+        db.release_connection(held)
+        db.close()
+
+
+def test_export_does_not_use_the_pool(tmp_path):
+    db = Database(str(tmp_path / "teste.db"), pool_size=1, pool_timeout=0.01, registry=Registry())
+    categoria_id = db.add_category("Camisetas")
+    db.add_products([("Camiseta", "M", 10.0, categoria_id), ("Regata", "M", 5.0, categoria_id)])
+    held = db.get_connection()
+    try:
+        chunks = list(db.iter_products(chunk_size=1))
+        assert [row["nome"] for chunk in chunks for row in chunk] == ["Camiseta", "Regata"]
+    finally:
+        db.release_connection(held)
+        db.close()
+
+
+@pytest.mark.parametrize("n", [10, FTS_BULK_MIN_ROWS], ids=["linha_a_linha", "em_bloco"])
+def test_bulk_writes_keep_search_index(tmp_path, n):
+    db = Database(str(tmp_path / "teste.db"), registry=Registry())
+    try:
+        categoria_id = db.add_category("Camisetas")
+        ids = [r["id"] for r in db.add_products([(f"Regata {i}", "M", 10.0, categoria_id) for i in range(n)])]
+        assert len(db.search_products("regata", limit=n + 1)) == n
+
+        db.update_products([(id, f"Polo {id}", "M", 10.0, categoria_id) for id in ids])
+        assert db.search_products("regata") == []
+        assert len(db.search_products("polo camisetas", limit=n + 1)) == n
+
+        db.delete_products(ids)
+        assert db.search_products("polo") == []
+        # os triggers voltaram: escritas avulsas continuam indexadas
+        db.add_product("Boné", "U", 5.0, categoria_id)
+        assert [p["nome"] for p in db.search_products("bone")] == ["Boné"]
+    finally:
+        db.close()
+
+
+def _expected_stats(db, categoria_id):
+    precos = [p["preco"] for p in db.get_products(categoria_id=categoria_id)]
+    return {
+        "quantidade": len(precos),
+        "preco_min": min(precos, default=None),
+        "preco_max": max(precos, default=None),
+        "preco_total": round(sum(precos), 2),
+    }
+
+
+def _assert_stats(db, categorias):
+    assert db.check_category_stats() == []
+    for categoria_id in categorias:
+        stats = dict(db.get_category_stats(categoria_id))
+        assert {k: stats[k] for k in ("quantidade", "preco_min", "preco_max", "preco_total")} == \
+            _expected_stats(db, categoria_id)
+
+
+@pytest.mark.parametrize("n", [10, FTS_BULK_MIN_ROWS], ids=["linha_a_linha", "em_bloco"])
+def test_category_stats_follow_writes(db, n):
+    categorias = [db.add_category("Camisetas"), db.add_category("Calças")]
+    ids = [r["id"] for r in db.add_products(
+        [(f"Produto {i}", "M", float(i % 50), categorias[i % 2]) for i in range(n)])]
+    _assert_stats(db, categorias)
+
+    produto_id = db.add_product("Avulso", "G", 999.0, categorias[0])
+    db.update_product(produto_id, "Avulso", "G", 1.0, categorias[1])
+    db.update_products([(id, "Alterado", "P", 7.5, categorias[0]) for id in ids[:3]])
+    _assert_stats(db, categorias)
+
+    db.delete_product(produto_id)
+    db.delete_products(ids[3:6])
+    _assert_stats(db, categorias)
+
+    db.reprice_products([{"categoria_id": categorias[0], "percentual": 10}])
+    _assert_stats(db, categorias)
+
+    db.move_products(categorias[0], categorias[1])
+    _assert_stats(db, categorias)
+    assert dict(db.get_category_stats(categorias[0]))["quantidade"] == 0
+
+
+def test_rebuild_category_stats_fixes_divergence(db):
+    categoria_id = db.add_category("Camisetas")
+    db.add_products([("Camiseta", "M", 10.0, categoria_id), ("Regata", "M", 20.0, categoria_id)])
+    conn = db.get_connection()
+    conn.execute("UPDATE categorias_stats SET quantidade = 99")
+    conn.commit()
+    db.release_connection(conn)
+
+    assert [d["categoria_id"] for d in db.check_category_stats()] == [categoria_id]
+    assert db.rebuild_category_stats() is True
+    assert db.check_category_stats() == []
+    assert dict(db.get_category_stats(categoria_id))["quantidade"] == 2
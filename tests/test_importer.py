@@ -0,0 +1,94 @@
+# tests/test_importer.py
+import sqlite3
+
+import pytest
+
+import importer
+from db import Database
+from importer import CatalogImporter
+from metrics import Registry
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "teste.db"), registry=Registry())
+    yield database
+    database.close()
+
+
+def _records(*records):
+    return list(enumerate(records, start=2))
+
+
+def test_row_without_category_is_rejected(db):
+    report = CatalogImporter(db).run(_records(
+        {"nome": "Camiseta", "preco": "10", "categoria": "Camisetas"},
+        {"nome": "Regata", "preco": "10"},
+        {"nome": "Boné", "preco": "10", "categoria": "  ", "categoria_id": ""},
+    ))
+    assert report["importados"] == 1
+    assert [e["erro"] for e in report["detalhes_erros"]] == ["categoria é obrigatória"] * 2
+
+
+def test_categorias_criadas_counts_only_new_rows(db):
+    imp = CatalogImporter(db)
+    db.add_category("Camisetas") # criada por outro processo depois do carregamento do mapa
+    report = imp.run(_records(
+        {"nome": "Camiseta", "preco": "10", "categoria": "Camisetas"},
+        {"nome": "Calça", "preco": "10", "categoria": "Calças"},
+    ))
+    assert report["importados"] == 2
+    assert report["categorias_criadas"] == 1
+
+
+def test_integrity_error_isolates_the_bad_row(db, monkeypatch):
+    add_products = db.add_products
+
+    def failing_add_products(produtos, raise_errors=False):
+        if any(p[0] == "Ruim" for p in produtos):
+            raise sqlite3.IntegrityError("CHECK constraint failed")
+        return add_products(produtos, raise_errors=raise_errors)
+
+    monkeypatch.setattr(db, "add_products", failing_add_products)
+    report = CatalogImporter(db).run(_records(
+        *({"nome": nome, "preco": "10", "categoria": "Camisetas"} for nome in ("A", "B", "Ruim", "C"))
+    ))
+    assert report["importados"] == 3
+    assert [e["linha"] for e in report["detalhes_erros"]] == [4]
+
+
+def test_busy_database_retries_without_splitting(db, monkeypatch):
+    monkeypatch.setattr(importer, "WRITE_RETRY_DELAY", 0)
+    add_products = db.add_products
+    calls = []
+
+    def busy_add_products(produtos, raise_errors=False):
+        calls.append(len(produtos))
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return add_products(produtos, raise_errors=raise_errors)
+
+    monkeypatch.setattr(db, "add_products", busy_add_products)
+    report = CatalogImporter(db).run(_records(
+        *({"nome": nome, "preco": "10", "categoria": "Camisetas"} for nome in ("A", "B", "C"))
+    ))
+    assert calls == [3, 3]
+    assert report["importados"] == 3
+    assert report["erros"] == 0
+
+
+def test_busy_database_aborts_the_chunk_after_retries(db, monkeypatch):
+    monkeypatch.setattr(importer, "WRITE_RETRY_DELAY", 0)
+    calls = []
+
+    def busy_add_products(produtos, raise_errors=False):
+        calls.append(len(produtos))
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(db, "add_products", busy_add_products)
+    report = CatalogImporter(db).run(_records(
+        *({"nome": nome, "preco": "10", "categoria": "Camisetas"} for nome in ("A", "B"))
+    ))
+    assert calls == [2] * (importer.WRITE_RETRIES + 1)
+    assert report["importados"] == 0
+    assert report["erros"] == 2
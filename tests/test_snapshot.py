@@ -0,0 +1,74 @@
+# tests/test_snapshot.py
+import pytest
+
+from db import FTS_BULK_MIN_ROWS, Database
+from metrics import Registry
+
+FILTERS = [
+    {},
+    {"limit": 7},
+    {"after": ("Produto 0100", 0), "limit": 20},
+    {"categoria_id": 1},
+    {"categoria_id": 2, "after": ("Produto 0300", 0), "limit": 10},
+    {"tamanho": "M"},
+    {"preco_min": 20, "preco_max": 40},
+    {"preco_min": 95},
+    {"categoria_id": 3, "tamanho": "P", "preco_max": 50},
+]
+
+
+@pytest.fixture
+def dbs(tmp_path):
+    path = str(tmp_path / "teste.db")
+    snap = Database(path, snapshot=True, registry=Registry())
+    sql = Database(path, query_cache=False, registry=Registry())
+    yield snap, sql
+    snap.close()
+    sql.close()
+
+
+def _assert_same(snap, sql):
+    for filters in FILTERS:
+        expected = [dict(row) for row in sql.get_products(**filters)]
+        assert [dict(row) for row in snap.get_products(**filters)] == expected, filters
+
+
+def _populate(db, n=FTS_BULK_MIN_ROWS + 100):
+    categorias = [db.add_category(nome) for nome in ("Camisetas", "Calças", "Bonés")]
+    produtos = [(f"Produto {i:04d}", ("P", "M", "G", None)[i % 4], float(i % 100), categorias[i % 3])
+                for i in range(n)]
+    return categorias, [r["id"] for r in db.add_products(produtos)]
+
+
+def test_snapshot_matches_sql_after_writes(dbs):
+    snap, sql = dbs
+    categorias, ids = _populate(snap)
+    _assert_same(snap, sql)
+    assert snap.snapshot.full_loads == 1
+
+    snap.update_products([(id, f"Alterado {id}", "G", 42.0, categorias[1]) for id in ids[:50]])
+    _assert_same(snap, sql)
+
+    snap.delete_products(ids[50:80])
+    _assert_same(snap, sql)
+
+    assert snap.move_products(categorias[0], categorias[2]) > 0
+    _assert_same(snap, sql)
+
+    snap.reprice_products([{"categoria_id": categorias[2], "percentual": 10},
+                           {"tamanho": "M", "valor": -1}])
+    _assert_same(snap, sql)
+
+    snap.update_category(categorias[1], "Calças Jeans")
+    _assert_same(snap, sql)
+    assert snap.snapshot.incremental_refreshes >= 5
+
+
+def test_snapshot_sees_writes_from_another_connection(dbs):
+    snap, sql = dbs
+    categorias, ids = _populate(sql, n=50)
+    _assert_same(snap, sql)
+
+    sql.add_products([("Novo", "M", 33.0, categorias[0])])
+    sql.delete_product(ids[0])
+    _assert_same(snap, sql)
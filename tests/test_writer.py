@@ -0,0 +1,68 @@
+# tests/test_writer.py
+import sqlite3
+import threading
+
+import pytest
+
+from db import Database
+from metrics import Registry
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "teste.db"), group_commit=True, registry=Registry())
+    yield database
+    database.close()
+
+
+def _block_writer(db):
+    """Ocupa a thread do escritor até o Event retornado ser liberado."""
+    started, release = threading.Event(), threading.Event()
+    op = db._op_add_category
+
+    def blocking_add_category(cursor, nome):
+        started.set()
+        release.wait(5)
+        return op(cursor, nome)
+
+    db._op_add_category = blocking_add_category
+    future = db.writer.submit("add_category", ("Primeira",))
+    assert started.wait(5)
+    db._op_add_category = op
+    return future, release
+
+
+def test_cancelled_write_is_dropped_and_writer_keeps_going(db):
+    first, release = _block_writer(db)
+    cancelled = db.writer.submit("add_category", ("Cancelada",))
+    assert cancelled.cancel()
+    release.set()
+
+    assert first.result(timeout=5) is not None
+    assert db.writer.submit("add_category", ("Depois",)).result(timeout=5) is not None
+    assert db.writer._thread.is_alive()
+    nomes = {c["nome"] for c in db.get_categories()}
+    assert nomes == {"Primeira", "Depois"}
+
+
+def test_unexpected_error_does_not_kill_writer(db):
+    begin = db._begin_write
+
+    def broken_begin(cursor):
+        db._begin_write = begin
+        raise RuntimeError("falha inesperada")
+
+    db._begin_write = broken_begin
+    with pytest.raises(RuntimeError):
+        db.writer.submit("add_category", ("Falha",)).result(timeout=5)
+    assert db.writer.submit("add_category", ("Depois",)).result(timeout=5) is not None
+
+
+def test_raise_errors_delivers_the_sqlite_error(db):
+    def broken_add_category(cursor, nome):
+        raise sqlite3.IntegrityError("falha de dados")
+
+    db._op_add_category = broken_add_category
+    assert db.writer.submit("add_category", ("Falha",)).result(timeout=5) is None
+    with pytest.raises(sqlite3.IntegrityError):
+        db.writer.submit("add_category", ("Falha",), raise_errors=True).result(timeout=5)
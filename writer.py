@@ -0,0 +1,189 @@
+# writer.py
+# Escritor único com group commit, ligado com Database(group_commit=True).
+#
+# O SQLite aceita um escritor por vez: com várias threads (ou workers do
+# uvicorn) escrevendo, cada commit disputa a trava do arquivo e as que
+# perdem esperam o busy_timeout ou falham com "database is locked". Aqui
+# todas as escritas do processo entram numa fila e uma única thread as
+# executa. As que chegam juntas viram uma só transação (um commit para o
+# grupo); cada escrita roda num SAVEPOINT, então o erro de uma não desfaz as
+# outras, e quem chamou recebe o resultado da sua própria escrita por um
+# Future.
+import concurrent.futures
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("loja.writer")
+
+_STOP = object()
+
+# Buckets do histograma de tamanho dos grupos
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+class GroupCommitWriter:
+    """Executa as escritas de um Database numa thread só, em grupos."""
+
+    def __init__(self, db, window_ms=0.0, max_batch=256, registry=None):
+        """
+        db: o Database (as escritas são os métodos _op_<nome> dele).
+        window_ms: espera por mais escritas depois da primeira do grupo.
+        max_batch: máximo de escritas por transação.
+        """
+        self.db = db
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._conn = None # conexão própria, só usada pela thread do escritor
+
+        self._batch_size = None
+        if registry is not None:
+            self._batch_size = registry.histogram(
+                "loja_db_write_batch_size", "Escritas por transação do group commit.", buckets=BATCH_BUCKETS)
+
+    def submit(self, name, args=(), raise_errors=False):
+        """
+        Enfileira a escrita 'name' (ver db.WRITE_OPERATIONS); retorna um Future
+        com o resultado. raise_errors: o Future recebe o sqlite3.Error em vez
+        do valor de falha da escrita.
+        """
+        # uma thread morta também é trocada, para nenhuma escrita ficar esperando para sempre
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="loja-writer", daemon=True)
+                    self._thread.start()
+        future = concurrent.futures.Future()
+        self._queue.put((name, args, future, raise_errors))
+        return future
+
+    def execute(self, name, args=(), raise_errors=False):
+        """Enfileira a escrita e espera o resultado."""
+        return self.submit(name, args, raise_errors).result()
+
+    def close(self):
+        """Termina as escritas pendentes e encerra a thread."""
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _next_batch(self):
+        """
+        Espera a primeira escrita e junta as que chegarem dentro da janela.
+        Escritas canceladas enquanto estavam na fila (ex.: o cliente
+        desconectou) são descartadas; as que entram no grupo não podem mais
+        ser canceladas.
+        """
+        batch = []
+        deadline = None
+        while len(batch) < self.max_batch:
+            if deadline is None:
+                item = self._queue.get()
+            else:
+                try:
+                    timeout = deadline - time.monotonic()
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if item is _STOP:
+                return batch, True
+            if item[2].set_running_or_notify_cancel():
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.window
+        return batch, False
+
+    def _run(self):
+        while True:
+            batch, stop = self._next_batch()
+            if batch:
+                try:
+                    self._commit(batch)
+                except Exception as e:
+                    # um erro inesperado não pode derrubar a thread: as
+                    # escritas seguintes ficariam esperando para sempre
+                    logger.exception("Erro inesperado no escritor")
+                    self._fail(batch, e)
+            if stop:
+                return
+
+    def _fail(self, batch, error):
+        """Entrega 'error' às escritas do grupo que ainda não têm resultado e descarta a conexão."""
+        for name, args, future, raise_errors in batch:
+            if not future.done():
+                future.set_exception(error)
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _commit(self, batch):
+        """Executa um grupo de escritas numa transação e entrega os resultados."""
+        if self._conn is None:
+            self._conn = self.db._new_connection()
+        conn = self._conn
+        cursor = conn.cursor()
+        if self._batch_size is not None:
+            self._batch_size.observe(len(batch))
+
+        try:
+            self.db._begin_write(cursor)
+        except sqlite3.Error as e:
+            for item in batch:
+                self._deliver_error(item, e)
+            return
+
+        outcomes = [] # (future, sucesso, resultado ou exceção)
+        try:
+            for name, args, future, raise_errors in batch:
+                cursor.execute("SAVEPOINT escrita")
+                try:
+                    result = getattr(self.db, "_op_" + name)(cursor, *args)
+                except Exception as e:
+                    # desfaz só esta escrita; as outras do grupo continuam
+                    cursor.execute("ROLLBACK TO escrita")
+                    cursor.execute("RELEASE escrita")
+                    if isinstance(e, sqlite3.Error):
+                        value = self.db._write_error(name, e)
+                        outcomes.append((future, not raise_errors, e if raise_errors else value))
+                    else:
+                        outcomes.append((future, False, e))
+                    continue
+                cursor.execute("RELEASE escrita")
+                outcomes.append((future, True, result))
+            conn.commit()
+        except sqlite3.Error as e:
+            # falha da transação inteira (ex.: disco cheio): nada foi gravado
+            if conn.in_transaction:
+                conn.rollback()
+            for item in batch:
+                self._deliver_error(item, e)
+            return
+
+        self.db._invalidate_cache()
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def _deliver_error(self, item, error):
+        """Entrega o erro de banco de uma escrita: o valor de falha dela ou a exceção."""
+        name, args, future, raise_errors = item
+        value = self.db._write_error(name, error)
+        if raise_errors:
+            future.set_exception(error)
+        else:
+            future.set_result(value)